@@ -131,7 +131,7 @@ import {
  // -----------------------------
  
  
-  //FIX ME: NEED EXAMS_CLEANUP ENDPOINT
+  // Locations/Rooms CSVs are cleaned and hot-swapped in by /exams_cleanup
   if (fileType === "Locations/Rooms") {
       // Call exams_cleanup for Locations/Rooms
       await fetch("https://sinai-nexus-backend.onrender.com/exams_cleanup", {
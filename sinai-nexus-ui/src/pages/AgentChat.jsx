@@ -157,24 +157,61 @@ function AgentChat({ auth, hideNavbar = false }) {
   // -------------------------------
   // BACKEND CALL
   // -------------------------------
-  const sendToBackend = async (question, activeMode) => {
-    try {
-      const endpoint =
+  // The /stream endpoints send Server-Sent Events:
+  //   data: {"delta": "..."} ... then data: {"done": true}
+  // onDelta(textSoFar) is called as each piece arrives.
+  // Falls back to the plain JSON endpoint if streaming fails
+  // before any text has arrived.
+  const sendToBackend = async (question, activeMode, onDelta) => {
+    const endpoint =
+      activeMode === "schedule"
+        ? "https://sinai-nexus-backend.onrender.com/agent-chat"
+        : "https://sinai-nexus-backend.onrender.com/rag-chat";
+
+    const request = () => ({
+      method: "POST",
+      headers:
         activeMode === "schedule"
-          ? "https://sinai-nexus-backend.onrender.com/agent-chat"
-          : "https://sinai-nexus-backend.onrender.com/rag-chat";
-
-      const body =
+          ? { "Content-Type": "application/json" }
+          : { "Content-Type": "application/x-www-form-urlencoded" },
+      body:
         activeMode === "schedule"
           ? JSON.stringify({ question })
-          : new URLSearchParams({ query: question });
+          : new URLSearchParams({ query: question }),
+    });
 
-      const headers =
-        activeMode === "schedule"
-          ? { "Content-Type": "application/json" }
-          : { "Content-Type": "application/x-www-form-urlencoded" };
+    let answer = "";
+    try {
+      const res = await fetch(`${endpoint}/stream`, request());
+      if (!res.ok || !res.body) throw new Error("Streaming unavailable");
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const event of events) {
+          if (!event.startsWith("data: ")) continue;
+          const data = JSON.parse(event.slice(6));
+          if (data.delta) {
+            answer += data.delta;
+            onDelta?.(answer);
+          }
+        }
+      }
+      return answer || "No response available.";
+    } catch {
+      if (answer) return answer;
+    }
 
-      const res = await fetch(endpoint, { method: "POST", headers, body });
+    try {
+      const res = await fetch(endpoint, request());
       const data = await res.json();
       return data.answer || "No response available.";
     } catch {
@@ -292,19 +329,22 @@ function AgentChat({ auth, hideNavbar = false }) {
 
     setInput("");
 
-    const reply = await sendToBackend(question, activeMode);
-    const botReply = { sender: "bot", text: reply };
+    // Replace the "Thinking..." bubble, then keep updating it as
+    // the streamed answer grows
+    const showReply = (text) =>
+      setChats((prev) =>
+        prev.map((chat) =>
+          chat.id === currentChat.id
+            ? {
+                ...chat,
+                messages: [...chat.messages.slice(0, -1), { sender: "bot", text }],
+              }
+            : chat
+        )
+      );
 
-    setChats((prev) =>
-      prev.map((chat) =>
-        chat.id === currentChat.id
-          ? {
-              ...chat,
-              messages: [...chat.messages.slice(0, -1), botReply],
-            }
-          : chat
-      )
-    );
+    const reply = await sendToBackend(question, activeMode, showReply);
+    showReply(reply);
   };
 
   // -------------------------------
@@ -0,0 +1,106 @@
+# -------------------------------------------------------------
+# chunking_benchmark.py
+# -------------------------------------------------------------
+# Purpose:
+#   Compare the chunkers in src/chunkers.py on real documents:
+#   how many chunks (= embedding calls and rows) each produces,
+#   and how often retrieval finds the chunk holding the answer.
+#
+# How:
+#   - Sentences of 8+ words are sampled from each document. The
+#     query is the sentence with ~30% of its words dropped; a hit
+#     means a top-k chunk contains the WHOLE sentence, i.e. the
+#     answer arrives in one piece.
+#   - Retrieval uses TF-IDF cosine similarity, so the benchmark
+#     runs offline with no embedding calls. It ranks chunkers,
+#     it doesn't predict absolute MiniLM numbers.
+#
+# Usage (from sinai_nexus_backend/):
+#   python benchmarks/chunking_benchmark.py [files...]
+#   (defaults to every PDF in uploads/)
+# -------------------------------------------------------------
+
+import glob
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.chunkers import CHUNKERS, count_tokens
+from src.ingest import iter_text
+
+QUERIES_PER_DOC = 25
+TOP_K = (1, 3, 7)
+SEED = 13
+
+
+def _squash(text):
+    """Whitespace-free lower case: pdfplumber glues words inconsistently."""
+    return re.sub(r"\s+", "", text).lower()
+
+
+def _sample_queries(blocks, rng):
+    text = re.sub(r"\s+", " ", " ".join(text for text, _ in blocks))
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", text) if len(s.split()) >= 8]
+    rng.shuffle(sentences)
+    queries = []
+    for sentence in sentences[:QUERIES_PER_DOC]:
+        words = sentence.split()
+        kept = [w for w in words if rng.random() > 0.3] or words
+        queries.append((" ".join(kept), _squash(sentence)))
+    return queries
+
+
+def run(paths):
+    documents = []
+    for path in paths:
+        try:
+            blocks = list(iter_text(path, path))
+        except Exception as e:
+            print(f"skipping {path}: {e}")
+            continue
+        if blocks:
+            documents.append((path, blocks))
+    if not documents:
+        print("No readable documents.")
+        return
+
+    rng = random.Random(SEED)
+    queries = [q for _, blocks in documents for q in _sample_queries(blocks, rng)]
+    print(f"{len(documents)} documents, {len(queries)} queries\n")
+
+    header = f"{'chunker':<12}{'chunks':>8}{'avg tokens':>12}" + "".join(
+        f"{f'hit@{k}':>9}" for k in TOP_K
+    )
+    print(header)
+    print("-" * len(header))
+    for name, chunker in CHUNKERS.items():
+        chunks = [c["content"] for _, blocks in documents for c in chunker(iter(blocks))]
+        squashed = [_squash(c) for c in chunks]
+
+        vectorizer = TfidfVectorizer().fit(chunks)
+        chunk_vectors = vectorizer.transform(chunks)
+        query_vectors = vectorizer.transform([q for q, _ in queries])
+        scores = (query_vectors @ chunk_vectors.T).toarray()
+        ranked = np.argsort(-scores, axis=1, kind="stable")
+
+        hits = {k: 0 for k in TOP_K}
+        for (_, answer), order in zip(queries, ranked):
+            found = [i for i in order[: max(TOP_K)] if answer in squashed[i]]
+            first = order.tolist().index(found[0]) if found else None
+            for k in TOP_K:
+                hits[k] += first is not None and first < k
+
+        avg_tokens = sum(count_tokens(c) for c in chunks) / len(chunks)
+        print(f"{name:<12}{len(chunks):>8}{avg_tokens:>12.0f}" + "".join(
+            f"{hits[k] / len(queries):>9.2f}" for k in TOP_K
+        ))
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:] or sorted(glob.glob("uploads/*.pdf")))
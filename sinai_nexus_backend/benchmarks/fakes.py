@@ -0,0 +1,352 @@
+# -------------------------------------------------------------
+# fakes.py
+# -------------------------------------------------------------
+# Purpose:
+#   Deterministic, in-process stand-ins for the three network
+#   clients, so the hot paths can be timed offline:
+#
+#   FakeGenAI         — google.generativeai: scheduling prompts
+#                       get the parse from a fixed table (single
+#                       and batched prompts), anything else a
+#                       canned answer; stream=True yields words
+#   FakeInferenceClient — huggingface_hub.InferenceClient:
+#                       feature_extraction() returns hashed
+#                       bag-of-words vectors (same text → same
+#                       vector, shared words → nearby vectors)
+#   FakeSupabase      — supabase Client: storage downloads read
+#                       local files; the `documents` table and the
+#                       match_documents RPCs run on in-memory rows
+#
+#   Each fake can add a fixed delay per call (latency_ms) to
+#   model network time; the default 0 measures our own code only.
+#
+#   install() puts them where the lazy getters look (_genai,
+#   _hf_client, _supabase), so nothing real is ever imported.
+# -------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from src.embeddings import EMBEDDING_DIM
+
+_WORD = re.compile(r"\w+")
+
+
+def _sleep(latency_ms):
+    if latency_ms:
+        time.sleep(latency_ms / 1000.0)
+
+
+# ============================================================
+# Gemini
+# ============================================================
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        # stream=True: one chunk per word, like token streaming
+        for piece in re.findall(r"\S+\s*", self.text):
+            yield _Response(piece)
+
+
+class _FakeModel:
+    def __init__(self, genai):
+        self._genai = genai
+
+    def generate_content(self, prompt, stream=False, request_options=None, **kwargs):
+        self._genai.calls += 1
+        _sleep(self._genai.latency_ms)
+        return _Response(self._genai.reply(prompt))
+
+
+class FakeGenAI:
+    """Module-shaped stand-in for google.generativeai."""
+
+    RAG_ANSWER = (
+        "Based on the provided notes and documents, follow the protocol "
+        "described in the context above and confirm with the department."
+    )
+
+    def __init__(self, parses=None, latency_ms=0):
+        self.parses = {q.lower(): p for q, p in (parses or {}).items()}
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def configure(self, **kwargs):
+        pass
+
+    def GenerativeModel(self, name):
+        return _FakeModel(self)
+
+    def _parse(self, question):
+        return self.parses.get(question.lower(), {"intent": None, "exam": None, "site": None})
+
+    def reply(self, prompt):
+        numbered = re.findall(r'^\s*(\d+)\. "(.*)"\s*$', prompt, re.M)
+        if numbered and '"n"' in prompt:
+            return json.dumps([{"n": int(n), **self._parse(q)} for n, q in numbered])
+        single = re.search(r'The user asked:\s*"(.*?)"', prompt, re.S)
+        if single:
+            return json.dumps(self._parse(single.group(1)))
+        return self.RAG_ANSWER
+
+
+# ============================================================
+# HuggingFace
+# ============================================================
+class FakeInferenceClient:
+    """feature_extraction() as hashed bag-of-words, L2-normalized."""
+
+    def __init__(self, dim=EMBEDDING_DIM, latency_ms=0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._columns = {}
+
+    def _column(self, word):
+        column = self._columns.get(word)
+        if column is None:
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            column = self._columns[word] = int.from_bytes(digest, "little") % self.dim
+        return column
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            vector[self._column(word)] += 1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        else:
+            vector[0] = 1.0
+        return vector
+
+    def feature_extraction(self, text, model=None, **kwargs):
+        self.calls += 1
+        _sleep(self.latency_ms)
+        texts = [text] if isinstance(text, str) else list(text)
+        out = np.stack([self._vector(t) for t in texts])
+        return out[0] if isinstance(text, str) else out
+
+
+# ============================================================
+# Supabase
+# ============================================================
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Bucket:
+    def __init__(self, files):
+        self._files = files
+
+    def download(self, path):
+        local = self._files.get(path)
+        if local is None:
+            raise Exception(f"Object not found: {path}")
+        with open(local, "rb") as f:
+            return f.read()
+
+
+class _Storage:
+    def __init__(self, files):
+        self._files = files
+
+    def from_(self, bucket):
+        return _Bucket(self._files.get(bucket, {}))
+
+
+class _Query:
+    """The chained select/insert/delete builder, on a list of dicts."""
+
+    def __init__(self, table, op="select", payload=None):
+        self._table = table
+        self._op = op
+        self._payload = payload
+        self._filters = []
+        self._columns = None
+        self._order = None
+        self._range = None
+
+    def select(self, columns="*"):
+        if columns != "*":
+            self._columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self._op, self._payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def _matches(self, row):
+        return all(f(row) for f in self._filters)
+
+    def execute(self):
+        client = self._table.client
+        _sleep(client.latency_ms)
+        with client.lock:
+            client.calls += 1
+            rows = self._table.rows
+            if self._op == "insert":
+                added = []
+                for row in self._payload:
+                    stored = {**row, "id": self._table.next_id}
+                    stored["embedding"] = np.asarray(row["embedding"], dtype=np.float32)
+                    self._table.next_id += 1
+                    rows.append(stored)
+                    added.append(stored)
+                return _Result([{k: v for k, v in r.items() if k != "embedding"} for r in added])
+            if self._op == "delete":
+                removed = [row for row in rows if self._matches(row)]
+                self._table.rows = [row for row in rows if not self._matches(row)]
+                return _Result([{k: v for k, v in r.items() if k != "embedding"} for r in removed])
+
+            found = [row for row in rows if self._matches(row)]
+        if self._order:
+            column, desc = self._order
+            found.sort(key=lambda row: row[column], reverse=desc)
+        if self._range:
+            found = found[self._range[0] : self._range[1] + 1]
+        if self._columns:
+            found = [{c: row.get(c) for c in self._columns} for row in found]
+        return _Result(found)
+
+
+class _Table:
+    def __init__(self, client):
+        self.client = client
+        self.rows = []
+        self.next_id = 1
+
+    # supabase-py: client.table("documents").select(...) / .insert(...) / .delete()
+    def select(self, columns="*"):
+        return _Query(self).select(columns)
+
+    def insert(self, rows):
+        return _Query(self).insert(rows)
+
+    def delete(self):
+        return _Query(self).delete()
+
+
+class _Rpc:
+    def __init__(self, client, name, params):
+        self._client = client
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        client = self._client
+        _sleep(client.latency_ms)
+        table = client.table("documents")
+        with client.lock:
+            client.calls += 1
+            rows = list(table.rows)
+        params = self._params
+        if self._name == "match_documents_by_priority":
+            low, high = params.get("min_priority"), params.get("max_priority")
+            rows = [
+                row for row in rows
+                if (low is None or row["priority"] >= low)
+                and (high is None or row["priority"] <= high)
+            ]
+        elif self._name != "match_documents":
+            raise Exception(f"Unknown RPC {self._name}")
+        if not rows:
+            return _Result([])
+
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+        matrix = np.stack([row["embedding"] for row in rows])
+        matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+        distance = 1.0 - matrix @ query
+        top = np.argsort(distance, kind="stable")[: params["match_count"]]
+        return _Result([
+            {
+                "id": rows[i]["id"],
+                "content": rows[i]["content"],
+                "priority": rows[i]["priority"],
+                "file_path": rows[i]["file_path"],
+                "distance": float(distance[i]),
+            }
+            for i in top
+        ])
+
+
+class FakeSupabase:
+    """
+    Client-shaped stand-in. files maps bucket → {object path: local
+    file}; tables live in memory for the life of the object.
+    """
+
+    def __init__(self, files=None, latency_ms=0):
+        self.storage = _Storage(files or {})
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self.lock = threading.Lock()
+        self._tables = {}
+
+    def table(self, name):
+        with self.lock:
+            if name not in self._tables:
+                self._tables[name] = _Table(self)
+            return self._tables[name]
+
+    def reset_table(self, name):
+        with self.lock:
+            self._tables.pop(name, None)
+
+    def rpc(self, name, params):
+        return _Rpc(self, name, params)
+
+
+# ============================================================
+# Installation
+# ============================================================
+def install(parses=None, latency_ms=0, bundled_parquet="data/new_scheduling_clean.parquet"):
+    """
+    Swap the fakes in behind get_genai(), get_hf_client() and
+    get_supabase(). Returns (genai, hf, supabase).
+    """
+    import src.data_loader as data_loader
+    import src.embeddings as embeddings
+    import src.query_interpreter as query_interpreter
+
+    genai = FakeGenAI(parses, latency_ms=latency_ms)
+    hf = FakeInferenceClient(latency_ms=latency_ms)
+    supabase = FakeSupabase(
+        files={data_loader.bucket: {data_loader.path: os.path.abspath(bundled_parquet)}},
+        latency_ms=latency_ms,
+    )
+    query_interpreter._genai = genai
+    embeddings._hf_client = hf
+    data_loader._supabase = supabase
+    return genai, hf, supabase
@@ -0,0 +1,452 @@
+# -------------------------------------------------------------
+# run_benchmarks.py
+# -------------------------------------------------------------
+# Purpose:
+#   Time the scheduling and RAG hot paths offline, and keep
+#   baselines so a slowdown shows up between commits.
+#
+# How:
+#   - Gemini, the HF Inference API and Supabase are replaced by
+#     the deterministic fakes in benchmarks/fakes.py; everything
+#     else is the real code. The scheduling data is the bundled
+#     data/new_scheduling_clean.parquet, the documents are the
+#     samples in uploads/ (identical files counted once).
+#   - Each stage runs a fixed workload --repeat times (after one
+#     warm-up round); every call is one latency sample. Reported:
+#     calls, mean, p50, p95, p99 and max in milliseconds.
+#   - Memory: each stage is run once more under tracemalloc and
+#     its peak Python allocation is reported (peak KiB), plus
+#     the process's max RSS at the end.
+#   - Stages ending in ".cold" clear the intent/answer caches
+#     before every call; ".warm" ones hit them.
+#
+#   Baselines are JSON files in benchmarks/baselines/. With
+#   --compare, a stage whose p50 or p95 grew by more than
+#   --threshold (and by more than MIN_DELTA_MS), or whose peak
+#   memory grew by more than --threshold, is flagged REGRESSION
+#   and the script exits with status 1. Compare runs made on
+#   the same machine with the same --repeat/--latency-ms.
+#
+# Usage (from sinai_nexus_backend/):
+#   python benchmarks/run_benchmarks.py [--repeat N] [--stages match,ingest]
+#   python benchmarks/run_benchmarks.py --save before
+#   python benchmarks/run_benchmarks.py --compare before
+#   --latency-ms 50 adds that much simulated network time to
+#   every fake Gemini/HF/Supabase call.
+# -------------------------------------------------------------
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Offline configuration, before any src module reads it
+_WORKDIR = tempfile.mkdtemp(prefix="nexus-bench-")
+os.environ.update({
+    "SCHEDULING_REFRESH": "0",
+    "DATASET_POLL_SECONDS": "0",
+    "SCHEDULING_CACHE_DIR": os.path.join(_WORKDIR, "cache"),   # → bundled parquet
+    "OVERRIDES_DB": os.path.join(_WORKDIR, "overrides.sqlite"),
+    "INTENT_CACHE_DB": "",
+    "RETRIEVAL_BACKEND": "supabase",
+    "EMBEDDING_BACKEND": "remote",
+    "EMBED_MAX_RETRIES": "1",
+})
+
+import numpy as np
+
+from benchmarks import fakes
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+UPLOADS = "uploads"
+MIN_DELTA_MS = 0.25   # ignore changes smaller than this (timer noise)
+BENCH_PATH_PREFIX = "bench/"
+
+# -------------------------------------------------------------
+# Workload
+# -------------------------------------------------------------
+EXAM_QUERIES = [
+    "ct head wo", "CT HEAD WO IV CONTRAST", "mri brain", "MRI brain w and wo",
+    "xr chest", "us abdomen", "ct chest w", "mammo", "pet ct", "dexa",
+    "mri knee left", "ct abd pelvis w iv", "nonsense zzz",
+]
+SITE_QUERIES = [
+    "1176 fifth ave", "1470 madison", "10 union sq", "MSH RAD CT", "msbi",
+    "MSQ OP RAD CAT SCAN", "1470 MADISON AVE RAD MRI", "HESS",
+    "1176 5TH AVE RAD CT", "nowhere",
+]
+HANDLER_PAIRS = [
+    ("ct head wo", "1176 fifth ave"), ("mri brain", "1470 madison"),
+    ("xr chest", "10 union sq"), ("ct chest w", "MSH RAD CT"),
+    ("us abdomen", "msbi"), ("mammo", "HESS"),
+]
+
+# (question, what Gemini would answer). Formulaic questions are
+# parsed by the local classifier; the rest go to (fake) Gemini.
+QUESTIONS = [
+    ("where is ct head wo done", {"intent": "locations_for_exam", "exam": "ct head wo", "site": None}),
+    ("how long is mri brain", {"intent": "exam_duration", "exam": "mri brain", "site": None}),
+    ("is xr chest done at 10 union sq", {"intent": "exam_at_site", "exam": "xr chest", "site": "10 union sq"}),
+    ("which rooms at 1470 madison do mri brain", {"intent": "rooms_for_exam_at_site", "exam": "mri brain", "site": "1470 madison"}),
+    ("which rooms perform ct chest w", {"intent": "rooms_for_exam", "exam": "ct chest w", "site": None}),
+    ("what exams are done at MSH RAD CT", {"intent": "exams_at_site", "exam": None, "site": "MSH RAD CT"}),
+    ("my patient needs a head ct without contrast, can 1176 fifth ave fit them in?",
+     {"intent": "exam_at_site", "exam": "CT HEAD WO IV CONTRAST", "site": "1176 fifth ave"}),
+    ("roughly how many minutes should we block for a breast mri",
+     {"intent": "exam_duration", "exam": "mri breast", "site": None}),
+    ("anywhere downtown doing dexa scans?",
+     {"intent": "locations_for_exam", "exam": "dexa", "site": None}),
+    ("list everything the HESS building offers",
+     {"intent": "exams_at_site", "exam": None, "site": "HESS"}),
+    ("which scanners handle pet ct", {"intent": "rooms_for_exam", "exam": "pet ct", "site": None}),
+    ("tell me about the weather", {"intent": None, "exam": None, "site": None}),
+]
+
+RAG_QUERIES = [
+    "Are copper IUDs safe for MRI?",
+    "What should I check before a breast MRI?",
+    "Which implants are MRI conditional?",
+    "What did the course evaluation say about the instructors?",
+    "What experience is listed on the resume?",
+    "What is due for assignment 3?",
+]
+
+
+# -------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------
+@contextlib.contextmanager
+def _quiet():
+    """The code under test prints diagnostics; drop them while timing."""
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        yield
+
+
+def _sample_documents():
+    """[(path, filename, is_json)] for uploads/, one per distinct content."""
+    seen, docs = set(), []
+    for path in sorted(glob.glob(os.path.join(UPLOADS, "*"))):
+        name = os.path.basename(path)
+        if name.startswith((".", "__")) or not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if not data or digest in seen:
+            continue
+        if name.lower().endswith((".pdf", ".docx", ".txt", ".md")):
+            is_json = False
+        else:
+            try:
+                is_json = "content" in json.loads(data)
+            except ValueError:
+                continue
+            if not is_json:
+                continue
+        seen.add(digest)
+        docs.append((path, name, is_json))
+    return docs
+
+
+def _summary(samples):
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "calls": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+# -------------------------------------------------------------
+# Stages
+# -------------------------------------------------------------
+class Stage:
+    """A named list of calls; before(), if given, runs untimed before each call."""
+
+    def __init__(self, name, calls, before=None):
+        self.name = name
+        self.calls = calls
+        self.before = before
+
+    def run_once(self, samples=None):
+        for call in self.calls:
+            if self.before:
+                self.before()
+            start = time.perf_counter()
+            call()
+            if samples is not None:
+                samples.append(time.perf_counter() - start)
+
+
+def _clear_scheduling_caches():
+    from src import answer_cache
+    from src.query_interpreter import INTENT_CACHE
+
+    answer_cache.ANSWERS.clear()
+    answer_cache.RESOLUTIONS.clear()
+    INTENT_CACHE.clear()
+
+
+def build_stages(supabase, selected=()):
+    import src.data_loader as data_loader
+    from src import query_handlers as qh
+    from src import rag_cache
+    from src.chunkers import get_chunker
+    from src.embeddings import embed_text_list
+    from src.fuzzy_matchers import best_exam_match, best_site_match
+    from src.ingest import ingest_file, iter_text
+    from src.query_router import answer_scheduling_batch, answer_scheduling_query
+    from src.retrieval import get_document_store
+    from src.retrieval_policy import POLICY
+
+    stages = {}
+
+    def wanted(*groups):
+        return not selected or any(g in selected for g in groups)
+
+    def add(group, stage):
+        if wanted(group):
+            stages.setdefault(group, []).append(stage)
+
+    # Scheduling -------------------------------------------------
+    if wanted("dataset", "match", "handlers", "router"):
+        add("dataset", Stage("dataset.load", [
+            lambda: data_loader.set_dataset(*data_loader.load_local_tables())
+        ]))
+        data_loader.ensure_loaded()
+
+    add("match", Stage("match.best_exam_match",
+                       [lambda q=q: best_exam_match(q) for q in EXAM_QUERIES]))
+    add("match", Stage("match.best_site_match",
+                       [lambda q=q: best_site_match(q) for q in SITE_QUERIES]))
+
+    exams = [exam for exam, _ in HANDLER_PAIRS]
+    sites = [site for _, site in HANDLER_PAIRS]
+    add("handlers", Stage("handlers.exam_at_site",
+                          [lambda e=e, s=s: qh.exam_at_site(e, s) for e, s in HANDLER_PAIRS]))
+    add("handlers", Stage("handlers.locations_for_exam",
+                          [lambda e=e: qh.locations_for_exam(e) for e in exams]))
+    add("handlers", Stage("handlers.exams_at_site",
+                          [lambda s=s: qh.exams_at_site(s) for s in sites]))
+    add("handlers", Stage("handlers.exam_duration",
+                          [lambda e=e: qh.exam_duration(e) for e in exams]))
+    add("handlers", Stage("handlers.rooms_for_exam_at_site",
+                          [lambda e=e, s=s: qh.rooms_for_exam_at_site(e, s) for e, s in HANDLER_PAIRS]))
+    add("handlers", Stage("handlers.rooms_for_exam",
+                          [lambda e=e: qh.rooms_for_exam(e) for e in exams]))
+
+    questions = [q for q, _ in QUESTIONS]
+    ask = [lambda q=q: answer_scheduling_query(q) for q in questions]
+    add("router", Stage("router.answer_scheduling_query.cold", ask, before=_clear_scheduling_caches))
+    add("router", Stage("router.answer_scheduling_query.warm", ask))
+    add("router", Stage(
+        "router.answer_scheduling_batch.cold",
+        [lambda: answer_scheduling_batch([{"question": q} for q in questions])],
+        before=_clear_scheduling_caches,
+    ))
+
+    if not wanted("ingest", "rag"):
+        return stages
+
+    # Upload: parse → chunk → embed → insert ---------------------
+    docs, blocks = [], {}
+    for path, name, is_json in _sample_documents():
+        if not is_json:
+            try:
+                with _quiet():
+                    blocks[path] = list(iter_text(path, name))
+            except Exception as e:
+                # e.g. unstructured fetching a model it doesn't have offline
+                print(f"⚠️ skipping {name}: {type(e).__name__}: {str(e)[:120]}", file=sys.stderr)
+                continue
+        docs.append((path, name, is_json))
+    chunks = {path: [c["content"] for c in get_chunker()(iter(blocks[path]))] for path in blocks}
+
+    def ingest(doc):
+        path, name, is_json = doc
+        return ingest_file(path, name, 1 if is_json else 3, BENCH_PATH_PREFIX + name, is_json=is_json)
+
+    add("ingest", Stage("ingest.parse",
+                        [lambda p=p, n=n: list(iter_text(p, n)) for p, n, j in docs if not j]))
+    add("ingest", Stage("ingest.chunk",
+                        [lambda p=p: list(get_chunker()(iter(blocks[p]))) for p in blocks]))
+    add("ingest", Stage("ingest.embed",
+                        [lambda p=p: embed_text_list(chunks[p]) for p in chunks]))
+    add("ingest", Stage("ingest.ingest_file.new", [lambda d=d: ingest(d) for d in docs],
+                        before=lambda: supabase.reset_table("documents")))
+    # Same bytes again: every chunk is already stored, nothing is embedded
+    add("ingest", Stage("ingest.ingest_file.unchanged", [lambda d=d: ingest(d) for d in docs]))
+
+    # RAG retrieval: the part of /rag-chat before Gemini ---------
+    def populate():
+        supabase.reset_table("documents")
+        with _quiet():
+            for doc in docs:
+                ingest(doc)
+
+    def clear_rag_caches():
+        rag_cache.QUERY_EMBEDDINGS.clear()
+        rag_cache.RETRIEVALS.clear()
+
+    def retrieve(query):
+        key = rag_cache.embedding_key(query)
+        embedding = rag_cache.QUERY_EMBEDDINGS.get(key)
+        if embedding is None:
+            embedding = embed_text_list([query])[0]
+            rag_cache.QUERY_EMBEDDINGS.put(key, embedding)
+        retrieval_key = rag_cache.retrieval_key(embedding)
+        found = rag_cache.RETRIEVALS.get(retrieval_key)
+        if found is None:
+            found = POLICY.retrieve(get_document_store(), embedding, query)
+            rag_cache.RETRIEVALS.put(retrieval_key, found)
+        return found
+
+    if wanted("rag"):
+        populate()
+    ask_rag = [lambda q=q: retrieve(q) for q in RAG_QUERIES]
+    add("rag", Stage("rag.retrieve.cold", ask_rag, before=clear_rag_caches))
+    add("rag", Stage("rag.retrieve.warm", ask_rag))
+    return stages
+
+
+# -------------------------------------------------------------
+# Running
+# -------------------------------------------------------------
+def run(selected, repeat, latency_ms=0):
+    genai, hf, supabase = fakes.install(parses=dict(QUESTIONS), latency_ms=latency_ms)
+    # Imported after the fakes: nothing below may reach the network
+    groups = build_stages(supabase, selected)
+
+    results = {}
+    for stages in groups.values():
+        for stage in stages:
+            samples = []
+            with _quiet():
+                stage.run_once()                # warm-up (imports, first-use setup)
+                for _ in range(repeat):
+                    stage.run_once(samples)
+                tracemalloc.start()
+                stage.run_once()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            results[stage.name] = {**_summary(samples), "peak_kib": peak / 1024.0}
+            _print_row(stage.name, results[stage.name])
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "repeat": repeat,
+        "latency_ms": genai.latency_ms,
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "fake_calls": {"gemini": genai.calls, "hf": hf.calls, "supabase": supabase.calls},
+        "stages": results,
+    }
+
+
+HEADER = f"{'stage':42} {'calls':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'peak KiB':>10}"
+
+
+def _print_row(name, r):
+    print(
+        f"{name:42} {r['calls']:>6} {r['mean_ms']:>9.3f} {r['p50_ms']:>9.3f} "
+        f"{r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['max_ms']:>9.3f} {r['peak_kib']:>10.1f}"
+    )
+
+
+def compare(report, baseline, threshold):
+    """Print per-stage changes against a baseline; returns the regressed stage names."""
+    print(f"\nvs baseline {baseline.get('git') or '?'} ({baseline.get('created_at')}):")
+    print(f"{'stage':42} {'p50':>9} {'Δ':>8} {'p95':>9} {'Δ':>8} {'peak':>8}")
+    regressions = []
+    for name, now in report["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            print(f"{name:42} (new stage)")
+            continue
+        flags = []
+        deltas = []
+        for key in ("p50_ms", "p95_ms"):
+            change = (now[key] - before[key]) / before[key] if before[key] else 0.0
+            deltas.append(change)
+            if change > threshold and now[key] - before[key] > MIN_DELTA_MS:
+                flags.append(key[:3])
+        memory = (now["peak_kib"] - before["peak_kib"]) / before["peak_kib"] if before["peak_kib"] else 0.0
+        if memory > threshold and now["peak_kib"] - before["peak_kib"] > 64:
+            flags.append("memory")
+        if flags:
+            regressions.append(name)
+        print(
+            f"{name:42} {now['p50_ms']:>9.3f} {deltas[0]:>+8.0%} {now['p95_ms']:>9.3f} "
+            f"{deltas[1]:>+8.0%} {memory:>+8.0%}"
+            + (f"  REGRESSION ({', '.join(flags)})" if flags else "")
+        )
+    skipped = [name for name in baseline["stages"] if name not in report["stages"]]
+    if skipped:
+        print(f"({len(skipped)} baseline stages not run)")
+    return regressions
+
+
+def _baseline_path(name):
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scheduling/RAG benchmarks")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--stages", default="",
+                        help="comma-separated groups: dataset, match, handlers, router, ingest, rag")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--save", metavar="NAME", help="write the results to baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baselines/NAME.json")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative growth that counts as a regression (default 0.25)")
+    args = parser.parse_args()
+
+    selected = {s.strip() for s in args.stages.split(",") if s.strip()}
+    print(HEADER)
+    report = run(selected, args.repeat, args.latency_ms)
+    print(f"\nmax RSS {report['max_rss_mib']:.0f} MiB; fake calls {report['fake_calls']}")
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(_baseline_path(args.save), "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline {_baseline_path(args.save)}")
+
+    if args.compare:
+        with open(_baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+        if baseline.get("repeat") != report["repeat"] or baseline.get("latency_ms") != report["latency_ms"]:
+            print("⚠️ baseline used different --repeat/--latency-ms; numbers may not be comparable")
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
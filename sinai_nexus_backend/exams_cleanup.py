@@ -7,7 +7,8 @@
 # -------------------------------------------------------------
 # Purpose:
 #   Clean and normalize the NEWLY FORMATTED scheduling CSV file
-#   into a flat table that your scheduling backend can query.
+#   into a small set of tables that your scheduling backend can
+#   query (see src/schedule_tables.py).
 #
 # Old columns (previous file):
 #   EAP Name, Visit Type Name, Visit Type Length, DEP Name, Room Name
@@ -21,131 +22,152 @@
 #   DEP Name       ← Department Name
 #   Room Name      ← Resource Name
 #
-# Output:
-#   scheduling_clean.parquet — same shape as before, so your existing
-#   scheduling_search.py code works WITHOUT modification.
+# Output (Locations_Rooms/normalized/ in the bucket):
+#   procedures.parquet             one row per CSV row (exam, visit type, length)
+#   departments.parquet            one row per distinct site
+#   resources.parquet              one row per distinct room
+#   procedure_departments.parquet  the sites each procedure lists
+#   procedure_resources.parquet    the rooms each procedure lists
+#   manifest.json                  sha256 per table + overall version
+#
+#   We no longer explode sites × rooms into one long table: that
+#   multiplied the row count and paired every site with every
+#   room of a procedure, including pairs that don't exist.
+#
+# Run it as a script (python exams_cleanup.py) to publish the
+# default CSV, or call run_cleanup(path) — POST /exams_cleanup
+# does that for a freshly uploaded export and installs the result
+# without a restart.
 #
 # Steps:
 #   1. Read the CSV
 #   2. Split multi-line Department Name and Resource Name fields
-#   3. Explode into long form (1 exam × 1 site × 1 room per row)
-#   4. Keep only the columns your backend needs
-#   5. Save as Parquet (fast to load, reliable format)
+#   3. Normalize into procedure / department / resource tables
+#   4. Save each table as Parquet (fast to load, reliable format)
+#   5. Upload the tables, then the manifest (the backend only
+#      switches versions once the new manifest is visible)
 # -------------------------------------------------------------
-from supabase import create_client
 import pandas as pd
-from io import StringIO, BytesIO
+from io import StringIO
 from dotenv import load_dotenv
-import os
+import json
+
+from src.data_loader import get_supabase
+from src.schedule_tables import (
+    MANIFEST_NAME,
+    build_manifest,
+    normalize_export,
+    tables_to_parquet,
+)
 
 load_dotenv()  
 
-# -------------------------------------------------------------
-# Step 1 — Load the CSV file
-# -------------------------------------------------------------
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-
 bucket_name = "epic-scheduling"      # change if your bucket name is different
 file_path = "Locations_Rooms/scheduling.csv"         # path inside the bucket
-
-response = supabase.storage.from_(bucket_name).download(file_path)
-
-
-if not response:
-    raise Exception("Could not download file from Supabase")
-
-csv_string = response.decode("latin-1")   #convert bytes to text
-df = pd.read_csv(StringIO(csv_string))  #read into pandas
-
+normalized_prefix = "Locations_Rooms/normalized"
 
 
 # -------------------------------------------------------------
-# Step 2 — Rename columns to match the *old expected names*
-# -------------------------------------------------------------
-df = df.rename(columns={
-    "Procedure Name": "EAP Name",            # exam/procedure name
-    "Visit Type Name": "Visit Type Name",
-    "Visit Type Length": "Visit Type Length",
-    "Department Name": "DEP Name",           # site/department name
-    "Resource Name": "Room Name"             # room
-})
-
-
-# -------------------------------------------------------------
-# Step 3 — Convert multi-line cells into Python lists
-# -------------------------------------------------------------
-# The CSV stores multiple department names in one cell separated by newlines.
-# Example:
-#   "1470 MADISON AVE RAD CT\n1176 5TH AVE RAD CT\nMSBI RAD CT"
-#
-# We split these on "\n" so each becomes a list like:
-#   ["1470 MADISON AVE RAD CT", "1176 5TH AVE RAD CT", "MSBI RAD CT"]
-
-df["DEP Name"] = df["DEP Name"].astype(str).str.split("\n")
-df["Room Name"] = df["Room Name"].astype(str).str.split("\n")
-
-
-# -------------------------------------------------------------
-# Step 4 — Explode the lists so each row is:
-#     EAP Name | Visit Length | ONE DEP Name | ONE Room Name
-# -------------------------------------------------------------
-df = df.explode("DEP Name").explode("Room Name").reset_index(drop=True)
-
-
-# -------------------------------------------------------------
-# Step 5 — Strip whitespace around department and room names
-# -------------------------------------------------------------
-df["DEP Name"] = df["DEP Name"].str.strip()
-df["Room Name"] = df["Room Name"].str.strip()
-
-
-# -------------------------------------------------------------
-# Step 6 — (Optional) Filter Manhattan sites only
-# -------------------------------------------------------------
-manhattan_sites = [
-    "10 UNION SQ E RAD CT",
-    "1176 5TH AVE RAD CT",
-    "1470 MADISON AVE RAD CT"
-]
-
-# df = df[df["DEP Name"].isin(manhattan_sites)]
-
-
-# -------------------------------------------------------------
-# Step 7 — Keep only the columns your backend uses
-# -------------------------------------------------------------
-df = df[[
-    "EAP Name",           # exam name
-    "Visit Type Name",    # (kept for future use)
-    "Visit Type Length",  # duration
-    "DEP Name",           # site
-    "Room Name"           # room
-]]
-
-
-# -------------------------------------------------------------
-# Step 8 — Save as Parquet (fast to load for backend)
-# -------------------------------------------------------------
-buffer = BytesIO()
-df.to_parquet(buffer, index=False)
-buffer.seek(0)
-
-print("✅ Parquet generated in memory")
-
-
-# -------------------------------------------------------------
-# Step 9 — Upload Parquet directly to Supabase Storage
+# Step 1 — Load the CSV file
 # -------------------------------------------------------------
-parquet_path = "Locations_Rooms/new_scheduling_clean.parquet"
-
-upload_response = supabase.storage.from_(bucket_name).upload(
-    parquet_path,
-    buffer.getvalue(),
-    file_options={"content-type": "application/vnd.apache.parquet"}
-)
-
-print("🎉 Uploaded parquet to Supabase:")
-print(upload_response)
\ No newline at end of file
+def download_export(path=file_path):
+    """The raw export CSV from the bucket, as a DataFrame."""
+    response = get_supabase().storage.from_(bucket_name).download(path)
+
+    if not response:
+        raise Exception("Could not download file from Supabase")
+
+    csv_string = response.decode("latin-1")   #convert bytes to text
+    return pd.read_csv(StringIO(csv_string))  #read into pandas
+
+
+def clean_export(df):
+    """Steps 2–4: raw export DataFrame → normalized tables."""
+    # ---------------------------------------------------------
+    # Step 2 — Rename columns to match the *old expected names*
+    # ---------------------------------------------------------
+    df = df.rename(columns={
+        "Procedure Name": "EAP Name",            # exam/procedure name
+        "Visit Type Name": "Visit Type Name",
+        "Visit Type Length": "Visit Type Length",
+        "Department Name": "DEP Name",           # site/department name
+        "Resource Name": "Room Name"             # room
+    })
+
+    # ---------------------------------------------------------
+    # Step 3 — Convert multi-line cells into Python lists
+    # ---------------------------------------------------------
+    # The CSV stores multiple department names in one cell separated by newlines.
+    # Example:
+    #   "1470 MADISON AVE RAD CT\n1176 5TH AVE RAD CT\nMSBI RAD CT"
+    #
+    # We split these on "\n" so each becomes a list like:
+    #   ["1470 MADISON AVE RAD CT", "1176 5TH AVE RAD CT", "MSBI RAD CT"]
+
+    df["DEP Name"] = df["DEP Name"].astype(str).str.split("\n")
+    df["Room Name"] = df["Room Name"].astype(str).str.split("\n")
+
+    # ---------------------------------------------------------
+    # Step 4 — Normalize into procedure / department / resource tables
+    # ---------------------------------------------------------
+    # Each department and room name gets an integer id, and the link
+    # tables record which ids each procedure lists (names are stripped
+    # and empty cells dropped inside normalize_export).
+
+    tables = normalize_export(df[[
+        "EAP Name",           # exam name
+        "Visit Type Name",    # (kept for future use)
+        "Visit Type Length",  # duration
+        "DEP Name",           # sites (list)
+        "Room Name"           # rooms (list)
+    ]])
+
+    return tables
+
+
+def publish_tables(tables):
+    """Steps 5–6: upload the tables, then the manifest. Returns (blobs, manifest)."""
+    # ---------------------------------------------------------
+    # Step 5 — Save each table as Parquet (fast to load for backend)
+    # ---------------------------------------------------------
+    blobs = tables_to_parquet(tables)
+    manifest = build_manifest(blobs)
+
+    print("✅ Normalized parquet tables generated in memory:")
+    for name, blob in blobs.items():
+        print(f"   {name}: {len(tables[name])} rows, {len(blob)} bytes")
+
+    # ---------------------------------------------------------
+    # Step 6 — Upload the tables directly to Supabase Storage
+    # ---------------------------------------------------------
+    storage = get_supabase().storage.from_(bucket_name)
+    for name, blob in blobs.items():
+        upload_response = storage.upload(
+            f"{normalized_prefix}/{name}.parquet",
+            blob,
+            file_options={
+                "content-type": "application/vnd.apache.parquet",
+                "upsert": "true",
+            }
+        )
+        print(f"🎉 Uploaded {name}.parquet to Supabase:")
+        print(upload_response)
+
+    # Manifest goes last so backends never see a version whose tables
+    # are not all uploaded yet
+    storage.upload(
+        f"{normalized_prefix}/{MANIFEST_NAME}",
+        json.dumps(manifest, indent=2).encode(),
+        file_options={"content-type": "application/json", "upsert": "true"}
+    )
+    print(f"🎉 Published scheduling data version {manifest['version'][:12]}")
+    return blobs, manifest
+
+
+def run_cleanup(path=file_path):
+    """Download, clean and publish one export; returns (blobs, manifest)."""
+    return publish_tables(clean_export(download_export(path)))
+
+
+if __name__ == "__main__":
+    run_cleanup()
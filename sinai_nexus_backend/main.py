@@ -1,72 +1,65 @@
-import os
 import json
-import numpy as np
-import google.generativeai as genai
-import pdfplumber
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 from fastapi import FastAPI, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
-from unstructured.partition.auto import partition
-from uuid import uuid4
-from huggingface_hub import InferenceClient            # ✅ ADDED
-
-from supabase import create_client
-from src.query_router import answer_scheduling_query
-
+import exams_cleanup
+from routes import schedule
+from src import data_loader
+from src import answer_cache, concurrency, ingest, local_classifier, rag_cache, telemetry
+from src.jobs import get_job_queue
+from src.retrieval import get_document_store
+from src.retrieval_policy import POLICY
+from src.concurrency import LIMITERS, UpstreamBusy, run_scheduling, stream_scheduling
+from src.embeddings import embed_text_list
+from src.query_interpreter import get_genai, INTENT_CACHE
+from src.query_router import answer_scheduling_batch, answer_scheduling_query, stream_scheduling_answer
+from src.telemetry import LLM_CALLS, span
 
 # ------------------------------
-# ENV + Supabase Client
+# Startup
 # ------------------------------
+# Nothing slow happens at import: API clients are created on first
+# use, the document parsers are imported inside /upload, and the
+# scheduling dataset warms up in a background thread once the
+# server is accepting connections (see lifespan below).
+#
+# No endpoint blocks the event loop: every blocking Gemini / HF /
+# Supabase call goes through its LIMITERS entry (bounded
+# concurrency + queue timeout, see src/concurrency.py), and
+# CPU-bound work runs in a thread pool.
+#
+# Every request is traced stage by stage (src/telemetry.py):
+# GET /metrics serves the timings and counters in Prometheus
+# format, and slow requests are logged with their breakdown.
 load_dotenv()
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_SERVICE_KEY")
-supabase = create_client(url, key)
-
-HF_TOKEN = os.getenv("HF_TOKEN")   # ✅ ADDED
-hf_client = InferenceClient(provider="hf-inference", api_key=HF_TOKEN)  # ✅ ADDED
-
-
-# ------------------------------
-# Gemini Setup
-# ------------------------------
-if os.getenv("GOOGLE_API_KEY"):
-   genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-else:
-   genai.configure()
-
-
-# ------------------------------
-# HuggingFace Embedding Wrapper
-# ------------------------------
-# ------------------------------
-# HuggingFace Embedding Wrapper
-# ------------------------------
-def embed_text_list(text_list):
-    """Return embeddings from HuggingFace Inference API."""
-    embeddings = []
-
-    for chunk in text_list:
-        try:
-            out = hf_client.feature_extraction(
-                inputs=chunk,
-                model="sentence-transformers/all-MiniLM-L6-v2"
-            )
-            embeddings.append(out)
-        except Exception as e:
-            print("Embedding error:", e)
-            embeddings.append([0.0] * 384)  # fallback
-
-    return embeddings
-
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("nexus").setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
 
 
 # ------------------------------
 # FastAPI App
 # ------------------------------
-app = FastAPI(title="Sinai Nexus Backend (Supabase RAG)")
+@asynccontextmanager
+async def lifespan(app):
+    # Don't block startup on the dataset: load it in the background
+    data_loader.start_warmup()
+    # Optionally watch the bucket for newly published versions
+    data_loader.start_polling()
+    # Pick up uploads that were still being ingested at shutdown
+    get_job_queue().start()
+    yield
+
+
+app = FastAPI(title="Sinai Nexus Backend (Supabase RAG)", lifespan=lifespan)
 app.add_middleware(
    CORSMiddleware,
    allow_origins=["*"],
@@ -74,24 +67,112 @@ app.add_middleware(
    allow_methods=["*"],
    allow_headers=["*"],
 )
+app.add_middleware(telemetry.TelemetryMiddleware)
+
+app.include_router(schedule.router)
 
 class AgentChatRequest(BaseModel):
    question: str
 
+class BatchItem(BaseModel):
+   question: Optional[str] = None
+   intent: Optional[str] = None
+   exam: Optional[str] = None
+   site: Optional[str] = None
+
+class AgentChatBatchRequest(BaseModel):
+   questions: List[str] = []
+   items: List[BatchItem] = []
+
+AGENT_BATCH_MAX = int(os.getenv("AGENT_BATCH_MAX", "200"))
+
+
+# ------------------------------
+# Streaming (Server-Sent Events)
+# ------------------------------
+# The /stream variants send the answer as it is produced:
+#   data: {"delta": "..."}    (any number of times)
+#   data: {"done": true}      (always last)
+# Errors arrive as ordinary delta text, exactly what the JSON
+# endpoint would have answered.
+def _sse(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _event_stream(deltas):
+    async def events():
+        async for delta in deltas:
+            if delta:
+                yield _sse({"delta": delta})
+        yield _sse({"done": True})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies (Render, nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 # ============================================================
 # 1️⃣ SCHEDULING AGENT
 # ============================================================
 @app.post("/agent-chat")
-def agent_chat(payload: AgentChatRequest):
+async def agent_chat(payload: AgentChatRequest):
     """Deterministic scheduling Q&A"""
     try:
-        answer = answer_scheduling_query(payload.question)
+        answer = await run_scheduling(answer_scheduling_query, payload.question)
         return {"answer": answer}
+    except UpstreamBusy as e:
+        return {"answer": f"Sorry, the assistant is busy right now ({e})."}
     except Exception as e:
         return {"answer": f"Error: {str(e)}"}
 
 
+@app.post("/agent-chat/batch")
+async def agent_chat_batch(payload: AgentChatBatchRequest):
+    """
+    Many scheduling questions in one request: natural-language
+    "questions" and/or structured "items" ({intent, exam, site},
+    or {question}). Answers come back in the same order, questions
+    first. At most one Gemini call is made for the whole batch.
+    """
+    items = [{"question": q} for q in payload.questions]
+    items += [item.model_dump() for item in payload.items]
+    if not items:
+        return {"answers": []}
+    if len(items) > AGENT_BATCH_MAX:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"At most {AGENT_BATCH_MAX} items per batch"},
+        )
+    try:
+        answers = await run_scheduling(answer_scheduling_batch, items)
+    except UpstreamBusy as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": f"Sorry, the assistant is busy right now ({e})."},
+        )
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"Error: {str(e)}"})
+    return {"answers": answers}
+
+
+@app.post("/agent-chat/stream")
+async def agent_chat_stream(payload: AgentChatRequest):
+    """/agent-chat over SSE: the answer's header line first, then the list."""
+    async def deltas():
+        try:
+            async for piece in stream_scheduling(stream_scheduling_answer, payload.question):
+                yield piece
+        except UpstreamBusy as e:
+            yield f"Sorry, the assistant is busy right now ({e})."
+        except Exception as e:
+            yield f"Error: {str(e)}"
+
+    return _event_stream(deltas())
+
+
 # ============================================================
 # 2️⃣ UPLOAD → PARSE → CHUNK → EMBED → SUPABASE
 # ============================================================
@@ -103,65 +184,54 @@ async def upload_file(
 ):
     """
     Upload → Parse → Chunk → Embed → Insert into Supabase.
+
+    Only the spooling happens here: the rest runs as a background
+    job (see src/jobs.py). Poll GET /jobs/{job_id} for progress.
+    Unchanged content is not re-indexed, and a changed file only
+    embeds its new chunks (see src/ingest.py).
     """
 
-    os.makedirs("uploads", exist_ok=True)
-    local_path = f"uploads/{uuid4()}_{file.filename}"
-
-    with open(local_path, "wb") as f:
-        f.write(await file.read())
-
-    # JSON notes
-    if file.content_type == "application/json":
-        priority = 1
-        with open(local_path, "r") as f:
-            data = json.load(f)
-        text = data.get("content", "")
-        chunks = [text] if text else []
-
-    else:
-        # PDF
-        if file.filename.lower().endswith(".pdf"):
-            elements = []
-            with pdfplumber.open(local_path) as pdf:
-                for page in pdf.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        elements.append(extracted)
-            text = "\n".join(elements)
-
-        else:
-            elements = partition(filename=local_path, strategy="text")
-            text = "\n".join([el.text for el in elements if el.text])
-
-        chunk_size = 600
-        overlap = 80
-        chunks = [
-            text[i : i + chunk_size]
-            for i in range(0, len(text), chunk_size - overlap)
-        ]
+    local_path, content_hash = await ingest.spool_upload(file)
 
-    # -------------------------------
-    # ✅ USE HF INFERENCE FOR EMBEDDING
-    # -------------------------------
-    embeddings = embed_text_list(chunks)
+    job_id, status = await run_in_threadpool(
+        get_job_queue().enqueue,
+        local_path,
+        file.filename,
+        priority,
+        path,
+        is_json=file.content_type == "application/json",
+        content_hash=content_hash,
+    )
 
-    rows = []
-    for chunk, emb in zip(chunks, embeddings):
-        rows.append({
-            "content": chunk,
-            "embedding": emb,   # HF returns a usable list
-            "priority": priority,
-            "file_path": path
-        })
+    return {
+        "message": "Already indexed" if status == "done" else "Upload queued for indexing",
+        "job_id": job_id,
+        "status": status,
+        "stored_path": path
+    }
 
-    if rows:
-        supabase.table("documents").insert(rows).execute()
 
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """Status and progress of an ingestion job."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job id"})
+
+    progress = job["progress"]
+    failed = progress.get("failed_chunk_indexes", [])
     return {
-        "message": f"Inserted {len(chunks)} chunks into Supabase",
-        "chunks_added": len(chunks),
-        "stored_path": path
+        "job_id": job["id"],
+        "status": job["status"],
+        "stored_path": job["file_path"],
+        "pages_parsed": progress.get("pages_parsed", 0),
+        "chunks_embedded": progress.get("chunks_embedded", 0),
+        "rows_inserted": progress.get("rows_inserted", 0),
+        "chunks_unchanged": progress.get("chunks_unchanged", 0),
+        "rows_deleted": progress.get("rows_deleted", 0),
+        "chunks_failed": len(failed),
+        "failed_chunk_indexes": failed,
+        "error": job["error"],
     }
 
 
@@ -173,58 +243,58 @@ class DeleteRequest(BaseModel):
 
 @app.post("/delete_file")
 async def delete_file(req: DeleteRequest):
-    response = (
-        supabase.table("documents")
-        .delete()
-        .eq("file_path", req.file_path)
-        .execute()
-    )
+    deleted = await run_in_threadpool(get_document_store().delete_path, req.file_path)
+    if deleted:
+        rag_cache.bump_corpus_version()
+    await run_in_threadpool(get_job_queue().forget, req.file_path)
 
     return {
-        "message": f"Deleted {len(response.data)} chunks",
+        "message": f"Deleted {len(deleted)} chunks",
         "file_path_received": req.file_path,
-        "deleted_rows": response.data,
+        "deleted_rows": deleted,
     }
 
 
 # ============================================================
 # 4️⃣ RAG CHAT
 # ============================================================
-@app.post("/rag-chat")
-async def rag_chat(query: str = Form(...)):
-
+async def _rag_prompt(query):
+    """
+    Retrieval half of /rag-chat. Returns (answer, None) when the
+    answer is already known, else (None, prompt) for Gemini.
+    """
     # -------------------------------
     # ✅ HF Inference embed for query
     # -------------------------------
-    q_embed = embed_text_list([query])[0]
-
-    result = supabase.rpc(
-        "match_documents",
-        {
-            "query_embedding": q_embed,
-            "match_count": 20
-        }
-    ).execute()
-
-    items = result.data or []
-
-    scored = []
-    for row in items:
-        dist = row.get("distance", 1.0)
-        pr = row.get("priority", 3)
-        score = dist * (1.0 + (pr - 1) * 0.5)
-        scored.append((score, row))
-
-    scored.sort(key=lambda x: x[0])
-
-    notes = [row for score, row in scored if row["priority"] == 1][:3]
-    docs  = [row for score, row in scored if row["priority"] > 1][:4]
+    # Repeat questions are served from rag_cache: no embedding call,
+    # no vector search.
+    try:
+        embed_key = rag_cache.embedding_key(query)
+        q_embed = rag_cache.QUERY_EMBEDDINGS.get(embed_key)
+        if q_embed is None:
+            with span("rag.embed"):
+                q_embed = (await run_in_threadpool(embed_text_list, [query]))[0]
+            if q_embed is None:
+                return "Sorry, I couldn't process that question right now. Please try again.", None
+            rag_cache.QUERY_EMBEDDINGS.put(embed_key, q_embed)
+
+        # Key on the version seen BEFORE searching, so an upload that
+        # lands mid-search can't get stale chunks cached under the new one
+        retrieval_key = rag_cache.retrieval_key(q_embed)
+        top_chunks = rag_cache.RETRIEVALS.get(retrieval_key)
+        if top_chunks is None:
+            with span("rag.retrieve"):
+                top_chunks = await run_in_threadpool(
+                    POLICY.retrieve, get_document_store(), q_embed, query
+                )
+            rag_cache.RETRIEVALS.put(retrieval_key, top_chunks)
+    except UpstreamBusy as e:
+        return f"Sorry, the assistant is busy right now ({e}).", None
 
-    top_chunks = [r["content"] for r in notes] + [r["content"] for r in docs]
     context = "\n\n".join(top_chunks)
 
     if query.lower() in context.lower():
-        return {"answer": context}
+        return context, None
 
     prompt = f"""
 You are a Mount Sinai Radiology assistant.
@@ -241,13 +311,123 @@ Context:
 Question:
 {query}
 """
+    return None, prompt
+
+
+@app.post("/rag-chat")
+async def rag_chat(query: str = Form(...)):
+    answer, prompt = await _rag_prompt(query)
+    if answer is not None:
+        return {"answer": answer}
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
+    model = get_genai().GenerativeModel("gemini-2.5-flash")
+    gemini = LIMITERS["gemini"]
+    LLM_CALLS.inc(purpose="rag")
+    try:
+        with span("rag.generate"):
+            response = await gemini.run(
+                model.generate_content, prompt,
+                request_options={"timeout": gemini.call_timeout},
+            )
+    except UpstreamBusy as e:
+        return {"answer": f"Sorry, the assistant is busy right now ({e})."}
 
     return {"answer": response.text.strip()}
 
 
+def _gemini_text_stream(prompt, timeout):
+    """Blocking: Gemini's answer as text pieces, as they are generated."""
+    model = get_genai().GenerativeModel("gemini-2.5-flash")
+    response = model.generate_content(
+        prompt, stream=True, request_options={"timeout": timeout}
+    )
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue   # a chunk with no text part (e.g. only safety ratings)
+        if text:
+            yield text
+
+
+@app.post("/rag-chat/stream")
+async def rag_chat_stream(query: str = Form(...)):
+    """/rag-chat over SSE: Gemini's tokens are forwarded as they arrive."""
+    async def deltas():
+        gemini = LIMITERS["gemini"]
+        started = False
+        try:
+            answer, prompt = await _rag_prompt(query)
+            if answer is not None:
+                yield answer
+                return
+            LLM_CALLS.inc(purpose="rag_stream")
+            with span("rag.generate"):
+                async for text in gemini.stream(_gemini_text_stream, prompt, gemini.call_timeout):
+                    # Match the JSON endpoint's .strip() at the start of the answer
+                    if not started:
+                        text = text.lstrip()
+                        started = bool(text)
+                    yield text
+        except UpstreamBusy as e:
+            yield f"Sorry, the assistant is busy right now ({e})."
+        except Exception as e:
+            yield f"Error: {str(e)}"
+
+    return _event_stream(deltas())
+
+
+# ============================================================
+# 5️⃣ SCHEDULING DATASET (hot reload)
+# ============================================================
+class ExamsCleanupRequest(BaseModel):
+   file_path: str
+
+@app.post("/exams_cleanup")
+def run_exams_cleanup(req: ExamsCleanupRequest):
+    """
+    Clean a freshly uploaded Epic export (see exams_cleanup.py),
+    publish it, and swap it in without a restart. Runs in the
+    background; poll GET /dataset for the outcome.
+    """
+    # The admin UI sends "<bucket>/<path inside the bucket>"
+    path = req.file_path
+    prefix = f"{exams_cleanup.bucket_name}/"
+    if path.startswith(prefix):
+        path = path[len(prefix):]
+
+    started = data_loader.start_reload(lambda: exams_cleanup.run_cleanup(path), path)
+    if not started:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "A dataset reload is already running", "reload": data_loader.RELOAD_STATUS},
+        )
+    return JSONResponse(status_code=202, content={"message": "Dataset reload started", "file_path": path})
+
+@app.post("/dataset/reload")
+def reload_dataset():
+    """Load the latest version published in the bucket, if it is newer."""
+    started = data_loader.start_reload(
+        lambda: data_loader.download_tables(known_version=data_loader.dataset_version()),
+        "bucket",
+    )
+    if not started:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "A dataset reload is already running", "reload": data_loader.RELOAD_STATUS},
+        )
+    return JSONResponse(status_code=202, content={"message": "Dataset reload started"})
+
+@app.get("/dataset")
+def dataset_status():
+    """The loaded scheduling snapshot and the last reload's outcome."""
+    snapshot = data_loader.SNAPSHOT
+    return {
+        "snapshot": snapshot.describe() if snapshot is not None else None,
+        "reload": data_loader.RELOAD_STATUS,
+    }
+
+
 # ============================================================
 # HEALTH
 # ============================================================
@@ -257,4 +437,71 @@ def home():
 
 @app.get("/healthz")
 def health():
-    return {"status": "ok"}
+    """Liveness is always "ok"; readiness says whether the dataset is loaded."""
+    return {
+        "status": "ok",
+        "ready": data_loader.is_ready(),
+        "dataset_version": data_loader.dataset_version(),
+    }
+
+@app.get("/cache-stats")
+def cache_stats():
+    """Hit/miss counters for the in-process caches."""
+    return {
+        "intent_cache": INTENT_CACHE.stats(),
+        "answer_cache": answer_cache.stats(),
+        "local_classifier": local_classifier.stats(),
+        "rag": rag_cache.stats(),
+        "ingest_jobs": get_job_queue().stats(),
+        "upstreams": concurrency.stats(),
+    }
+
+# Values other modules already count, read when /metrics is scraped
+_CACHES = [
+    INTENT_CACHE, answer_cache.ANSWERS, answer_cache.RESOLUTIONS,
+    rag_cache.QUERY_EMBEDDINGS, rag_cache.RETRIEVALS,
+]
+telemetry.register_collector(
+    "nexus_cache_hits_total", "counter", "Cache lookups answered from the cache",
+    lambda: [({"cache": c.name}, c.hits) for c in _CACHES],
+)
+telemetry.register_collector(
+    "nexus_cache_misses_total", "counter", "Cache lookups that had to compute the value",
+    lambda: [({"cache": c.name}, c.misses) for c in _CACHES],
+)
+telemetry.register_collector(
+    "nexus_cache_entries", "gauge", "Entries held in memory per cache",
+    lambda: [({"cache": c.name}, len(c)) for c in _CACHES],
+)
+telemetry.register_collector(
+    "nexus_intent_parses_total", "counter", "Scheduling questions parsed locally vs by Gemini",
+    lambda: [({"source": source}, n) for source, n in local_classifier.STATS.items()],
+)
+telemetry.register_collector(
+    "nexus_upstream_in_flight", "gauge", "Calls running per upstream",
+    lambda: [({"upstream": name}, l.in_flight) for name, l in LIMITERS.items()],
+)
+telemetry.register_collector(
+    "nexus_upstream_waiting", "gauge", "Calls queued for a free slot per upstream",
+    lambda: [({"upstream": name}, l.waiting) for name, l in LIMITERS.items()],
+)
+telemetry.register_collector(
+    "nexus_upstream_rejected_total", "counter", "Calls refused with UpstreamBusy per upstream",
+    lambda: [({"upstream": name}, l.rejected) for name, l in LIMITERS.items()],
+)
+telemetry.register_collector(
+    "nexus_dataset_ready", "gauge", "1 once the scheduling dataset is loaded",
+    lambda: [({}, int(data_loader.is_ready()))],
+)
+
+@app.get("/metrics")
+def metrics():
+    """Request/stage latency histograms and counters, Prometheus text format."""
+    return Response(telemetry.render(), media_type=telemetry.CONTENT_TYPE)
+
+@app.get("/readyz")
+def ready():
+    """503 until the scheduling dataset is in memory (for readiness probes)."""
+    if not data_loader.is_ready():
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True, "dataset_version": data_loader.dataset_version()}
@@ -0,0 +1,213 @@
+# -------------------------------------------------------------
+# routes/schedule.py
+# -------------------------------------------------------------
+# Purpose:
+#   Typed REST access to the scheduling lookups, for callers that
+#   already know the exam and site (internal tools, dropdowns):
+#   no LLM, query-string parameters in, JSON out.
+#
+#     GET /schedule/exam-at-site?exam=&site=
+#     GET /schedule/locations?exam=           (paginated)
+#     GET /schedule/exams?site=               (paginated)
+#     GET /schedule/duration?exam=
+#     GET /schedule/rooms?exam=[&site=]       (paginated)
+#     GET /schedule/sites                     (paginated)
+#
+#   exam / site may be loose wording; each response also reports
+#   the official names they matched. Lookups share answer_cache.py
+#   with /agent-chat.
+#
+#   Caching: every response carries an ETag derived from the
+#   dataset version, the overrides version and the request. A
+#   request with a matching If-None-Match gets 304 Not Modified
+#   without running the lookup; any dataset or override change
+#   changes every ETag. Each request takes the DatasetSnapshot once:
+#   the ETag, the lookup and the body's dataset_version all come
+#   from it, so a hot reload mid-request can't pair an old ETag
+#   with newer items.
+# -------------------------------------------------------------
+
+import hashlib
+from typing import List, Optional
+
+from fastapi import APIRouter, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+
+import src.data_loader as data_loader
+from src.answer_cache import lookup_many
+from src.overrides import get_overrides
+
+router = APIRouter(prefix="/schedule", tags=["schedule"])
+
+MAX_PAGE = 1000
+
+
+class Availability(BaseModel):
+    exam: str
+    site: str
+    matched_exam: Optional[str]
+    matched_site: Optional[str]
+    available: bool
+    disabled_reason: Optional[str] = None
+    dataset_version: Optional[str]
+
+
+class Duration(BaseModel):
+    exam: str
+    matched_exam: Optional[str]
+    minutes: Optional[str]   # "20" or "20, 40" when visit types differ
+    dataset_version: Optional[str]
+
+
+class Page(BaseModel):
+    exam: Optional[str] = None
+    site: Optional[str] = None
+    matched_exam: Optional[str] = None
+    matched_site: Optional[str] = None
+    items: List[str]
+    total: int
+    offset: int
+    limit: int
+    dataset_version: Optional[str]
+
+
+# -------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------
+def _etag(request, dataset_version, overrides_version):
+    versions = f"{dataset_version}|{overrides_version}"
+    digest = hashlib.sha1(f"{versions}|{request.url.path}?{request.url.query}".encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def _not_modified(request, response):
+    """
+    Set the ETag; return (304 response if the client already has
+    it, else None; the snapshot the ETag was built from — use it
+    for the lookup and the body). Blocking (may wait for the
+    dataset to load): run it in the thread pool.
+    """
+    snapshot = data_loader.get_snapshot()
+    etag = _etag(request, snapshot.version, get_overrides().version())
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"   # always revalidate
+    client_tags = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in client_tags.split(",")] or client_tags.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"}), snapshot
+    return None, snapshot
+
+
+async def _lookup(snapshot, intent, exam=None, site=None):
+    """(result, matched exam, matched site) — blocking lookup off the event loop."""
+    result, exams, sites = (
+        await run_in_threadpool(lookup_many, [(intent, exam, site)], snapshot)
+    )[0]
+    return result, (exams[0] if exams else None), (sites[0] if sites else None)
+
+
+def _page(items, offset, limit, snapshot, **fields):
+    items = list(items or [])
+    return Page(
+        items=items[offset : offset + limit],
+        total=len(items),
+        offset=offset,
+        limit=limit,
+        dataset_version=snapshot.version,
+        **fields,
+    )
+
+
+# -------------------------------------------------------------
+# Endpoints
+# -------------------------------------------------------------
+@router.get("/exam-at-site", response_model=Availability)
+async def exam_at_site(request: Request, response: Response,
+                       exam: str = Query(..., min_length=1),
+                       site: str = Query(..., min_length=1)):
+    """Is the exam performed at the site (taking overrides into account)?"""
+    cached, snapshot = await run_in_threadpool(_not_modified, request, response)
+    if cached:
+        return cached
+    available, matched_exam, matched_site = await _lookup(snapshot, "exam_at_site", exam, site)
+    override = (
+        get_overrides().disabled(matched_exam, matched_site)
+        if matched_exam and matched_site else None
+    )
+    return Availability(
+        exam=exam, site=site,
+        matched_exam=matched_exam, matched_site=matched_site,
+        available=bool(available),
+        disabled_reason=override["reason"] if override else None,
+        dataset_version=snapshot.version,
+    )
+
+
+@router.get("/locations", response_model=Page)
+async def locations_for_exam(request: Request, response: Response,
+                             exam: str = Query(..., min_length=1),
+                             offset: int = Query(0, ge=0),
+                             limit: int = Query(100, ge=1, le=MAX_PAGE)):
+    """Sites that perform the exam."""
+    cached, snapshot = await run_in_threadpool(_not_modified, request, response)
+    if cached:
+        return cached
+    sites, matched_exam, _ = await _lookup(snapshot, "locations_for_exam", exam=exam)
+    return _page(sites, offset, limit, snapshot, exam=exam, matched_exam=matched_exam)
+
+
+@router.get("/exams", response_model=Page)
+async def exams_at_site(request: Request, response: Response,
+                        site: str = Query(..., min_length=1),
+                        offset: int = Query(0, ge=0),
+                        limit: int = Query(100, ge=1, le=MAX_PAGE)):
+    """Exams offered at the site."""
+    cached, snapshot = await run_in_threadpool(_not_modified, request, response)
+    if cached:
+        return cached
+    exams, _, matched_site = await _lookup(snapshot, "exams_at_site", site=site)
+    return _page(exams, offset, limit, snapshot, site=site, matched_site=matched_site)
+
+
+@router.get("/duration", response_model=Duration)
+async def exam_duration(request: Request, response: Response,
+                        exam: str = Query(..., min_length=1)):
+    """Visit length(s) of the exam, in minutes."""
+    cached, snapshot = await run_in_threadpool(_not_modified, request, response)
+    if cached:
+        return cached
+    minutes, matched_exam, _ = await _lookup(snapshot, "exam_duration", exam=exam)
+    return Duration(
+        exam=exam, matched_exam=matched_exam, minutes=minutes,
+        dataset_version=snapshot.version,
+    )
+
+
+@router.get("/rooms", response_model=Page)
+async def rooms_for_exam(request: Request, response: Response,
+                         exam: str = Query(..., min_length=1),
+                         site: Optional[str] = Query(None, min_length=1),
+                         offset: int = Query(0, ge=0),
+                         limit: int = Query(100, ge=1, le=MAX_PAGE)):
+    """Rooms that perform the exam — at one site if site is given."""
+    cached, snapshot = await run_in_threadpool(_not_modified, request, response)
+    if cached:
+        return cached
+    if site:
+        rooms, matched_exam, matched_site = await _lookup(snapshot, "rooms_for_exam_at_site", exam, site)
+    else:
+        rooms, matched_exam, matched_site = await _lookup(snapshot, "rooms_for_exam", exam=exam)
+    return _page(rooms, offset, limit, snapshot, exam=exam, site=site,
+                 matched_exam=matched_exam, matched_site=matched_site)
+
+
+@router.get("/sites", response_model=Page)
+async def all_sites(request: Request, response: Response,
+                    offset: int = Query(0, ge=0),
+                    limit: int = Query(100, ge=1, le=MAX_PAGE)):
+    """Every official site name, for pickers."""
+    cached, snapshot = await run_in_threadpool(_not_modified, request, response)
+    if cached:
+        return cached
+    names = list(snapshot.match_index.site_names)
+    return _page(names, offset, limit, snapshot)
@@ -0,0 +1,157 @@
+# -------------------------------------------------------------
+# answer_cache.py
+# -------------------------------------------------------------
+# Purpose:
+#   Let /agent-chat skip the index lookups for questions whose
+#   entities resolve to ones it has already answered.
+#
+#   Many phrasings ("ct head wo", "CT HEAD WO IV CONTRAST", ...)
+#   fuzzy-resolve to the same official names, so results are
+#   cached under the RESOLVED question:
+#
+#     (intent, matched exams, matched sites,
+#      dataset version, overrides version) → lookup result
+#
+#   Resolving the names is itself the expensive part of most
+#   lookups, so the fuzzy matches are memoized too:
+#
+#     (exam or site, text as given, dataset version) → names
+#
+#   The result (a bool, list or duration) is cached rather than
+#   the answer text, because the text repeats the user's own
+#   wording of the exam and site.
+#
+#   lookup_many() reads the DatasetSnapshot once (or takes the
+#   caller's) and resolves names, keys the cache and runs the
+#   handlers all against that one snapshot.
+#
+#   A new scheduling snapshot has a new version, and disabling,
+#   re-enabling or the expiry of an override changes the
+#   overrides version (see overrides.py), so older entries are
+#   never read again (they age out of the LRU).
+# -------------------------------------------------------------
+
+import os
+
+import src.data_loader as data_loader
+from src.caching import LRUCache
+from src.overrides import get_overrides
+from src.telemetry import span
+from src.query_handlers import (
+    exam_at_site_resolved,
+    locations_for_exam_resolved,
+    exams_at_site_resolved,
+    exam_duration_resolved,
+    rooms_for_exam_at_site_resolved,
+    rooms_for_exam_resolved,
+)
+
+ANSWERS = LRUCache(
+    maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "4096")),
+    ttl=None,
+    name="scheduling_answers",
+)
+
+# intent → (resolved handler, uses exam, uses site)
+HANDLERS = {
+    "exam_at_site": (exam_at_site_resolved, True, True),
+    "locations_for_exam": (locations_for_exam_resolved, True, False),
+    "exams_at_site": (exams_at_site_resolved, False, True),
+    "exam_duration": (exam_duration_resolved, True, False),
+    "rooms_for_exam_at_site": (rooms_for_exam_at_site_resolved, True, True),
+    "rooms_for_exam": (rooms_for_exam_resolved, True, False),
+}
+
+RESOLUTIONS = LRUCache(
+    maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "4096")),
+    ttl=None,
+    name="scheduling_name_matches",
+)
+
+_MISSING = object()
+
+
+def _resolve_many(kind, texts, snapshot):
+    """
+    {text: official names} for the user's exam/site texts, memoized
+    per dataset. Texts not seen before are scored in ONE rapidfuzz
+    call (same results as best_exam_match / best_site_match).
+    """
+    names = {}
+    todo = []
+    for text in dict.fromkeys(texts):
+        if not isinstance(text, str) or not text.strip():
+            names[text] = ()
+            continue
+        cached = RESOLUTIONS.get((kind, text, snapshot.version))
+        if cached is None:
+            todo.append(text)
+        else:
+            names[text] = cached
+    if todo:
+        index = snapshot.match_index
+        match = index.match_exams if kind == "exam" else index.match_sites
+        with span(f"match.{kind}s"):
+            matched = match(todo)
+        for text, matches in zip(todo, matched):
+            names[text] = tuple(name for name, score in matches)
+            RESOLUTIONS.put((kind, text, snapshot.version), names[text])
+    return names
+
+
+def _cached_result(intent, exams, sites, snapshot, overrides_version):
+    handler, uses_exam, uses_site = HANDLERS[intent]
+    key = (intent, exams, sites, snapshot.version, overrides_version)
+    result = ANSWERS.get(key, _MISSING)
+    if result is _MISSING:
+        args = ([list(exams)] if uses_exam else []) + ([list(sites)] if uses_site else [])
+        result = handler(*args, snapshot=snapshot)
+        ANSWERS.put(key, result)
+    return result
+
+
+def lookup(intent, exam=None, site=None):
+    """
+    The query handler's result for intent, from the cache when the
+    same resolved exam/site names were looked up before.
+    """
+    return lookup_many([(intent, exam, site)])[0][0]
+
+
+def lookup_many(queries, snapshot=None):
+    """
+    lookup() for a list of (intent, exam, site): all exam texts,
+    then all site texts, are resolved in one batch each. Returns
+    [(result, matched exams, matched sites), ...] in order.
+
+    Everything reads one DatasetSnapshot: the caller's, or the
+    current one, taken once up front.
+    """
+    if snapshot is None:
+        snapshot = data_loader.get_snapshot()
+    overrides_version = get_overrides().version()
+    exam_names = _resolve_many(
+        "exam", [exam for intent, exam, _ in queries if HANDLERS[intent][1]], snapshot
+    )
+    site_names = _resolve_many(
+        "site", [site for intent, _, site in queries if HANDLERS[intent][2]], snapshot
+    )
+
+    results = []
+    for intent, exam, site in queries:
+        _, uses_exam, uses_site = HANDLERS[intent]
+        exams = exam_names[exam] if uses_exam else ()
+        sites = site_names[site] if uses_site else ()
+        results.append((
+            _cached_result(intent, exams, sites, snapshot, overrides_version), exams, sites
+        ))
+    return results
+
+
+def stats():
+    return {
+        "dataset_version": data_loader.dataset_version(),
+        "overrides_version": get_overrides().version(),
+        "answers": ANSWERS.stats(),
+        "name_matches": RESOLUTIONS.stats(),
+    }
@@ -0,0 +1,153 @@
+# -------------------------------------------------------------
+# caching.py
+# -------------------------------------------------------------
+# Purpose:
+#   Small in-process caches shared by the backend.
+#
+#   LRUCache keeps up to `maxsize` entries, evicting the least
+#   recently used one, and optionally expires entries after `ttl`
+#   seconds. If `persist_path` is given, entries are also written
+#   to a SQLite file so they survive a restart; on a memory miss
+#   the SQLite copy is checked before reporting a miss.
+#
+#   Values must be JSON-serializable when persistence is used.
+# -------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from src.telemetry import log
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU + TTL cache with hit/miss counters."""
+
+    def __init__(self, maxsize=1024, ttl=None, persist_path=None, name="cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if persist_path:
+            self._init_db()
+
+    # ---------------------------------------------------------
+    # SQLite persistence
+    # ---------------------------------------------------------
+    def _connect(self):
+        return sqlite3.connect(self.persist_path, timeout=5)
+
+    def _init_db(self):
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " cache TEXT NOT NULL, key TEXT NOT NULL,"
+                " value TEXT NOT NULL, stored_at REAL NOT NULL,"
+                " PRIMARY KEY (cache, key))"
+            )
+
+    def _load(self, key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, stored_at FROM cache_entries"
+                    " WHERE cache = ? AND key = ?",
+                    (self.name, key),
+                ).fetchone()
+        except sqlite3.Error as e:
+            log.warning("%s: cache read failed: %s", self.name, e)
+            return _MISSING
+        if row is None:
+            return _MISSING
+        value, stored_at = row
+        if self.ttl is not None and time.time() - stored_at > self.ttl:
+            return _MISSING
+        return json.loads(value), stored_at
+
+    def _store(self, key, value, stored_at):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries"
+                    " (cache, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                    (self.name, key, json.dumps(value), stored_at),
+                )
+        except sqlite3.Error as e:
+            log.warning("%s: cache write failed: %s", self.name, e)
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _remember(self, key, value, stored_at):
+        """Insert into memory and evict the oldest entries (lock held)."""
+        self._data[key] = (value, stored_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry[1]):
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.persist_path and isinstance(key, str):
+            loaded = self._load(key)
+            if loaded is not _MISSING:
+                with self._lock:
+                    self._remember(key, *loaded)
+                    self.hits += 1
+                return loaded[0]
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """Store value under key."""
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, value, stored_at)
+        if self.persist_path and isinstance(key, str):
+            self._store(key, value, stored_at)
+
+    def clear(self):
+        """Drop every in-memory entry (persisted entries are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Hit/miss counters for monitoring."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
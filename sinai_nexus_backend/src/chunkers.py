@@ -0,0 +1,217 @@
+# -------------------------------------------------------------
+# chunkers.py
+# -------------------------------------------------------------
+# Purpose:
+#   Split extracted document text into the chunks that get
+#   embedded and stored in `documents`.
+#
+#   Input is a stream of (text, meta) blocks from ingest.iter_text:
+#     • a PDF page:            meta = {"kind": "page", "page": n}
+#     • an unstructured element: meta = {"kind": "heading" | "text",
+#                                        "page": n or None}
+#   Output is a stream of {"content", "page", "section"} dicts.
+#
+#   CHUNKER picks the strategy:
+#     "structured" (default) — packs whole paragraphs into chunks
+#         of at most CHUNK_MAX_TOKENS, starting a new chunk at a
+#         heading or a page break (unless the current chunk is
+#         still tiny). Over-long paragraphs are split at sentence
+#         ends, and only a single over-long sentence is cut
+#         between words. Each chunk repeats its section heading
+#         on the first line, so the heading is both embedded and
+#         shown to Gemini.
+#     "fixed" — the original 600-character windows with 80
+#         characters of overlap; no page/section metadata.
+# -------------------------------------------------------------
+
+import os
+import re
+
+CHUNKER = os.getenv("CHUNKER", "structured")
+
+# all-MiniLM-L6-v2 reads at most 256 word pieces; words and
+# punctuation marks are a slight under-count, so stay below that
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "40"))
+
+FIXED_CHUNK_SIZE = 600
+FIXED_CHUNK_OVERLAP = 80
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_BULLET = re.compile(r"^(?:[•●▪◦*\-–]|\d+[.)]|[a-z][.)])\s+")
+_NUMBERED_HEADING = re.compile(r"^\d+(?:\.\d+)*\.?\s+\S")
+_SMALL_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with", "vs"}
+
+
+def count_tokens(text):
+    """Cheap token estimate: words + punctuation marks."""
+    return len(_TOKEN.findall(text))
+
+
+# ============================================================
+# Fixed windows (legacy)
+# ============================================================
+def fixed_chunks(blocks, size=FIXED_CHUNK_SIZE, overlap=FIXED_CHUNK_OVERLAP):
+    """
+    Chunk exactly like slicing "\\n".join(texts) every
+    size - overlap characters, but keeping only the
+    not-yet-chunked tail in memory.
+    """
+    step = size - overlap
+    buf = ""
+    first = True
+    for text, _meta in blocks:
+        buf = text if first else buf + "\n" + text
+        first = False
+        while len(buf) >= size:
+            yield {"content": buf[:size], "page": None, "section": None}
+            buf = buf[step:]
+    # The tail: every remaining start offset, as in range(0, len, step)
+    for i in range(0, len(buf), step):
+        yield {"content": buf[i : i + size], "page": None, "section": None}
+
+
+# ============================================================
+# Structure-aware
+# ============================================================
+def _is_heading(line):
+    """Short, unpunctuated, capitalized line → probably a heading."""
+    words = line.split()
+    if not words or len(words) > 10 or len(line) > 80:
+        return False
+    if line[-1] in ".,;!?" or _BULLET.match(line):
+        return False
+    if _NUMBERED_HEADING.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    if letters and all(c.isupper() for c in letters):
+        return True
+    significant = [w for w in words if w.lower() not in _SMALL_WORDS]
+    capitalized = [w for w in significant if w[0].isupper() or not w[0].isalpha()]
+    return bool(significant) and len(capitalized) == len(significant)
+
+
+def _page_paragraphs(text):
+    """
+    Rebuild (kind, text) paragraphs from a PDF page's lines.
+
+    pdfplumber gives one line per visual line: lines are joined
+    back into paragraphs, breaking at blank lines, bullets,
+    headings and lines that end a sentence well short of the
+    page width.
+    """
+    lines = [line.strip() for line in text.split("\n")]
+    widths = sorted(len(line) for line in lines if line)
+    full_width = widths[int(len(widths) * 0.9)] if widths else 0
+
+    para = []
+    for line in lines:
+        if not line:
+            if para:
+                yield "text", " ".join(para)
+                para = []
+            continue
+        if _is_heading(line):
+            if para:
+                yield "text", " ".join(para)
+                para = []
+            yield "heading", line
+            continue
+        if _BULLET.match(line) and para:
+            yield "text", " ".join(para)
+            para = []
+        if para and para[-1].endswith("-"):
+            para[-1] = para[-1][:-1] + line   # re-join a hyphenated word
+        else:
+            para.append(line)
+        if line[-1] in ".!?:" and len(line) < 0.8 * full_width:
+            yield "text", " ".join(para)
+            para = []
+    if para:
+        yield "text", " ".join(para)
+
+
+def _split_long(paragraph, budget):
+    """Yield pieces of a paragraph that each fit the budget, split at sentence ends."""
+    if count_tokens(paragraph) <= budget:
+        yield paragraph
+        return
+    for sentence in _SENTENCE_END.split(paragraph):
+        if count_tokens(sentence) <= budget:
+            yield sentence
+            continue
+        # One huge "sentence" (e.g. a table row dump): cut between words
+        words, piece = sentence.split(), []
+        for word in words:
+            if piece and count_tokens(" ".join(piece + [word])) > budget:
+                yield " ".join(piece)
+                piece = []
+            piece.append(word)
+        if piece:
+            yield " ".join(piece)
+
+
+def structured_chunks(blocks, max_tokens=CHUNK_MAX_TOKENS, min_tokens=CHUNK_MIN_TOKENS):
+    section = None      # latest heading seen
+    parts = []          # paragraphs / sentences in the current chunk
+    tokens = 0
+    chunk_page = None
+    chunk_section = None
+
+    def flush():
+        nonlocal parts, tokens
+        if parts:
+            heading = [chunk_section] if chunk_section and parts[0] != chunk_section else []
+            yield {"content": "\n".join(heading + parts), "page": chunk_page, "section": chunk_section}
+        parts, tokens = [], 0
+
+    for text, meta in blocks:
+        page = meta.get("page")
+        if meta.get("kind") == "page":
+            paragraphs = _page_paragraphs(text)
+        else:
+            paragraphs = [(meta.get("kind", "text"), text.strip())]
+
+        for kind, para in paragraphs:
+            if not para:
+                continue
+            if kind == "heading":
+                # A heading starts a new chunk, unless the current one is
+                # still a fragment (then the heading rides along inside it)
+                if tokens >= min_tokens:
+                    yield from flush()
+                section = para
+                if not parts:
+                    continue
+            budget = max_tokens
+            if section:
+                budget = max(max_tokens - count_tokens(section), 1)
+            for piece in _split_long(para, budget):
+                piece_tokens = count_tokens(piece)
+                if parts and tokens + piece_tokens > budget:
+                    yield from flush()
+                if not parts:
+                    chunk_page, chunk_section = page, section
+                parts.append(piece)
+                tokens += piece_tokens
+
+        # Page break: close the chunk unless it's still tiny
+        if meta.get("kind") == "page" and tokens >= min_tokens:
+            yield from flush()
+
+    yield from flush()
+
+
+CHUNKERS = {
+    "fixed": fixed_chunks,
+    "structured": structured_chunks,
+}
+
+
+def get_chunker(name=None):
+    """The chunking function for name (default: the CHUNKER setting)."""
+    name = name or CHUNKER
+    if name not in CHUNKERS:
+        raise RuntimeError(f"Unknown CHUNKER={name!r}; choose one of {sorted(CHUNKERS)}")
+    return CHUNKERS[name]
@@ -0,0 +1,197 @@
+# -------------------------------------------------------------
+# concurrency.py
+# -------------------------------------------------------------
+# Purpose:
+#   Keep blocking upstream calls (Gemini, HuggingFace, Supabase)
+#   off the event loop and cap how many run at once.
+#
+#   Each upstream gets an UpstreamLimiter:
+#     • at most `max_concurrency` calls in flight
+#     • extra callers wait in line for up to `queue_timeout`
+#       seconds, then fail with UpstreamBusy instead of piling up
+#     • async callers (await limiter.run(...)) run the call in the
+#       limiter's own thread pool and give up after
+#       `queue_timeout + call_timeout` seconds
+#     • sync callers already on a worker thread use
+#       limiter.call(...) and share the same slots
+#     • streaming calls (async for x in limiter.stream(...)) hold
+#       one slot until the stream ends; each item must arrive
+#       within `queue_timeout + call_timeout` seconds
+#
+#   Limits come from env vars, e.g. GEMINI_MAX_CONCURRENCY,
+#   HF_QUEUE_TIMEOUT, SUPABASE_CALL_TIMEOUT.
+#
+#   Work handed to these pools runs in a copy of the caller's
+#   context, so it stays part of the request's trace (see
+#   telemetry.py).
+# -------------------------------------------------------------
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+
+class UpstreamBusy(Exception):
+    """Raised when an upstream is saturated or too slow to answer."""
+
+
+class UpstreamLimiter:
+    """Bounded-concurrency gate (with queueing and timeouts) for one upstream."""
+
+    def __init__(self, name, max_concurrency, queue_timeout, call_timeout):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.call_timeout = call_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Twice the slots, so queued callers don't block running ones
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency * 2, thread_name_prefix=f"{name}-call"
+        )
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the upstream's slots (waits up to queue_timeout)."""
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+        if not acquired:
+            raise UpstreamBusy(f"{self.name} is busy, please try again")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def call(self, fn, *args, **kwargs):
+        """Run a blocking call on the current thread, inside a slot."""
+        with self.slot():
+            return fn(*args, **kwargs)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking call in this limiter's thread pool, inside a slot."""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor,
+            partial(contextvars.copy_context().run, self.call, fn, *args, **kwargs),
+        )
+        try:
+            return await asyncio.wait_for(
+                future, timeout=self.queue_timeout + self.call_timeout
+            )
+        except asyncio.TimeoutError:
+            raise UpstreamBusy(f"{self.name} timed out")
+
+    async def stream(self, fn, *args, **kwargs):
+        """Iterate a blocking iterator-returning call in this limiter's pool, inside a slot."""
+        def produce():
+            with self.slot():
+                yield from fn(*args, **kwargs)
+
+        try:
+            async for item in iterate_in_executor(
+                self._executor, produce, timeout=self.queue_timeout + self.call_timeout
+            ):
+                yield item
+        except asyncio.TimeoutError:
+            raise UpstreamBusy(f"{self.name} timed out")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+            }
+
+
+async def iterate_in_executor(executor, fn, *args, timeout=None, **kwargs):
+    """
+    Run a blocking generator function on executor and yield its
+    items on the event loop as they are produced. Raises
+    asyncio.TimeoutError if the next item takes longer than timeout.
+    If the consumer stops early, the producer stops at its next item.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    end = object()
+
+    def produce():
+        try:
+            for item in fn(*args, **kwargs):
+                if stop.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (end, e))
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, (end, None))
+
+    loop.run_in_executor(executor, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            item, error = await asyncio.wait_for(queue.get(), timeout=timeout)
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _limiter(name, prefix, max_concurrency, queue_timeout, call_timeout):
+    return UpstreamLimiter(
+        name,
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(max_concurrency))),
+        queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", str(queue_timeout))),
+        call_timeout=float(os.getenv(f"{prefix}_CALL_TIMEOUT", str(call_timeout))),
+    )
+
+
+LIMITERS = {
+    "gemini": _limiter("gemini", "GEMINI", 4, 15, 60),
+    "hf": _limiter("hf", "HF", 4, 15, 60),
+    "supabase": _limiter("supabase", "SUPABASE", 8, 10, 30),
+}
+
+# CPU-bound scheduling lookups (fuzzy matching, index lookups) run
+# here so they never block the event loop.
+SCHEDULING_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SCHEDULING_WORKERS", "8")),
+    thread_name_prefix="scheduling",
+)
+
+
+async def run_scheduling(fn, *args):
+    """Run a scheduling function on SCHEDULING_EXECUTOR."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        SCHEDULING_EXECUTOR, partial(contextvars.copy_context().run, fn, *args)
+    )
+
+
+def stream_scheduling(fn, *args):
+    """Iterate a scheduling generator function on SCHEDULING_EXECUTOR."""
+    return iterate_in_executor(SCHEDULING_EXECUTOR, fn, *args)
+
+
+def stats():
+    return {name: limiter.stats() for name, limiter in LIMITERS.items()}
@@ -5,44 +5,382 @@
 #   Load the main scheduling dataset, room mappings, and update
 #   records into memory for other modules to use.
 #
-#   This ensures all data sources are initialized in one place,
-#   so that other modules (like query_handlers) can simply
-#   import df, PREFIX_TO_DEP, and USER_UPDATES directly.
+#   This ensures all data sources are initialized in one place.
+#   Other modules reach the scheduling data through
+#   get_snapshot() (or the get_match_index() / get_schedule_index()
+#   shortcuts) and never keep their own reference to it, so a
+#   new dataset version takes effect without a restart.
+#
+#   The scheduling data is the normalized set of tables described
+#   in schedule_tables.py (procedures, departments, resources and
+#   their links), not one exploded exam × site × room table.
+#
+#   Nothing is loaded at import time (see ensure_loaded()). The
+#   first load never waits on the network: the last downloaded
+#   version is read from the local cache (or the bundled parquet
+#   on a fresh machine) and a background thread checks Supabase
+#   for a newer version published by exams_cleanup.py.
+#
+#   Each version is one DatasetSnapshot: the tables plus, built
+#   once per dataset (see set_dataset()):
+#     • match_index    — normalized exam/site names for the
+#                        fuzzy matchers
+#     • schedule_index — exam/site/room lookup tables for the
+#                        query handlers
+#     • prefix_to_dep  — room prefix → department (mapping.json)
+#
+#   Hot reload — a newer version is swapped in while the server
+#   keeps answering:
+#     • POST /exams_cleanup publishes a new Epic export and
+#       installs it (see exams_cleanup.py)
+#     • DATASET_POLL_SECONDS > 0 checks the bucket for a newly
+#       published version every that many seconds
+#   In both cases the new snapshot is built in a background
+#   thread; requests already running finish on the old one.
 # -------------------------------------------------------------
 
 import pandas as pd
 import json
-from supabase import create_client
+import shutil
+import threading
+import time
 import os
 from io import BytesIO
 from dotenv import load_dotenv
+from src.match_index import build_match_index
+from src.schedule_index import build_schedule_index
+from src.telemetry import log, span
+from src.schedule_tables import (
+    MANIFEST_NAME,
+    TABLE_NAMES,
+    build_manifest,
+    normalize_exploded,
+    read_tables,
+    tables_from_parquet,
+    tables_to_parquet,
+    verify_blobs,
+    write_tables,
+)
 
 load_dotenv()  
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-
 bucket = "epic-scheduling"
-path = "Locations_Rooms/new_scheduling_clean.parquet"
+path = "Locations_Rooms/new_scheduling_clean.parquet"   # old exploded table
+normalized_prefix = "Locations_Rooms/normalized"        # written by exams_cleanup.py
+
+# -------------------------------------------------------------
+# Local cache
+# -------------------------------------------------------------
+# Each downloaded version lives in CACHE_DIR/<version>/ and the
+# CURRENT file names the one to load. Point SCHEDULING_CACHE_DIR
+# at a mounted volume to keep the cache across machine restarts.
+# If there is no cache yet, the bundled parquet is used until the
+# background refresh has fetched the published tables.
+CACHE_DIR = os.getenv("SCHEDULING_CACHE_DIR", "data/cache")
+BUNDLED_PARQUET = "data/new_scheduling_clean.parquet"
+REFRESH_ON_START = os.getenv("SCHEDULING_REFRESH", "1") != "0"
+DATASET_POLL_SECONDS = float(os.getenv("DATASET_POLL_SECONDS", "0"))
+PREFIX_MAP_PATH = "data/mapping.json"
+
+_supabase = None
+
+
+def get_supabase():
+    """Create the Supabase client on first use (not at import)."""
+    global _supabase
+    if _supabase is None:
+        from supabase import create_client
+        _supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    return _supabase
+
+
+def _current_cache_version():
+    try:
+        with open(os.path.join(CACHE_DIR, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_local_tables():
+    """
+    Return (tables, version) from local disk without any network:
+    the cached download if there is one, else the bundled parquet.
+    """
+    version = _current_cache_version()
+    if version:
+        directory = os.path.join(CACHE_DIR, version)
+        try:
+            return read_tables(directory), version
+        except Exception as e:
+            log.warning("Scheduling cache unreadable, using bundled parquet: %s", e)
+
+    bundled = pd.read_parquet(BUNDLED_PARQUET)
+    return normalize_exploded(bundled), "bundled"
+
+
+def download_tables(known_version=None):
+    """
+    Fetch the published scheduling tables from Supabase.
+
+    Returns (blobs, manifest), or None if the published version is
+    already `known_version`. Falls back to the old exploded parquet
+    (normalized in memory) if no manifest has been published yet.
+    """
+    storage = get_supabase().storage.from_(bucket)
+    try:
+        manifest = json.loads(storage.download(f"{normalized_prefix}/{MANIFEST_NAME}"))
+    except Exception as e:
+        log.warning("Scheduling manifest unavailable, using legacy parquet: %s", e)
+        manifest = None
+
+    if manifest is not None:
+        if manifest["version"] == known_version:
+            return None
+        blobs = {
+            name: storage.download(f"{normalized_prefix}/{name}.parquet")
+            for name in TABLE_NAMES
+        }
+        if not verify_blobs(blobs, manifest):
+            raise Exception("Downloaded scheduling tables do not match manifest")
+        return blobs, manifest
+
+    res = storage.download(path)
+    if not res:
+        raise Exception("Unable to download parquet from Supabase")
+    blobs = tables_to_parquet(normalize_exploded(pd.read_parquet(BytesIO(res))))
+    manifest = build_manifest(blobs)
+    if manifest["version"] == known_version:
+        return None
+    return blobs, manifest
+
+
+def _save_to_cache(blobs, manifest):
+    """Write a version into the cache, point CURRENT at it, prune old ones."""
+    version = manifest["version"]
+    write_tables(os.path.join(CACHE_DIR, version), blobs, manifest)
+
+    tmp = os.path.join(CACHE_DIR, "CURRENT.tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(CACHE_DIR, "CURRENT"))
+
+    for entry in os.listdir(CACHE_DIR):
+        full = os.path.join(CACHE_DIR, entry)
+        if entry != version and os.path.isdir(full):
+            shutil.rmtree(full, ignore_errors=True)
+
+
+# One refresh / install at a time (startup check, poller, admin)
+_refresh_lock = threading.Lock()
+
+
+def install_published(blobs, manifest):
+    """
+    Cache a published version on disk and swap it in. Returns the
+    version, or None if it is the one already loaded.
+    """
+    with _refresh_lock:
+        if manifest["version"] == dataset_version():
+            return None
+        _save_to_cache(blobs, manifest)
+        set_dataset(tables_from_parquet(blobs), manifest["version"])
+    log.info("Scheduling data updated to version %s", manifest["version"][:12])
+    return manifest["version"]
+
+
+def refresh_dataset():
+    """
+    Check Supabase for a newer published version; if there is one,
+    cache it on disk and swap it in. Returns the loaded version, or
+    None if we were already current.
+    """
+    result = download_tables(known_version=dataset_version())
+    if result is None:
+        return None
+    return install_published(*result)
+
+
+def _refresh_in_background():
+    try:
+        refresh_dataset()
+    except Exception as e:
+        log.warning("Background scheduling refresh failed (keeping local copy): %s", e)
+
+
+def start_background_refresh():
+    """Run refresh_dataset() in a daemon thread."""
+    thread = threading.Thread(
+        target=_refresh_in_background, name="scheduling-refresh", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+# Admin-triggered reloads (POST /exams_cleanup, POST /dataset/reload)
+RELOAD_STATUS = {"state": "idle"}
+_reload_running = threading.Lock()
+
+
+def start_reload(fetch, source):
+    """
+    Run fetch() → (blobs, manifest) or None, then install the result,
+    in a daemon thread. Progress is kept in RELOAD_STATUS. Returns
+    False (and does nothing) if a reload is already running.
+    """
+    global RELOAD_STATUS
+    if not _reload_running.acquire(blocking=False):
+        return False
+    RELOAD_STATUS = {"state": "running", "source": source, "started_at": time.time()}
+
+    def run():
+        global RELOAD_STATUS
+        try:
+            result = fetch()
+            version = install_published(*result) if result is not None else None
+            RELOAD_STATUS = {
+                **RELOAD_STATUS,
+                "state": "done",
+                "changed": version is not None,
+                "version": dataset_version(),
+                "finished_at": time.time(),
+            }
+        except Exception as e:
+            log.error("Scheduling reload from %s failed (keeping current data): %s", source, e)
+            RELOAD_STATUS = {
+                **RELOAD_STATUS,
+                "state": "failed",
+                "error": str(e),
+                "finished_at": time.time(),
+            }
+        finally:
+            _reload_running.release()
+
+    threading.Thread(target=run, name="scheduling-reload", daemon=True).start()
+    return True
+
+
+def _poll():
+    while True:
+        time.sleep(DATASET_POLL_SECONDS)
+        _refresh_in_background()
+
+
+def start_polling():
+    """Check for a newer published version every DATASET_POLL_SECONDS (0 = never)."""
+    if DATASET_POLL_SECONDS <= 0:
+        return None
+    thread = threading.Thread(target=_poll, name="scheduling-poll", daemon=True)
+    thread.start()
+    return thread
+
+
+# -------------------------------------------------------------
+# Snapshots
+# -------------------------------------------------------------
+def load_prefix_map():
+    """Room-name prefix → department name, from mapping.json."""
+    with open(PREFIX_MAP_PATH) as f:
+        return json.load(f)
+
+
+class DatasetSnapshot:
+    """
+    One version of the scheduling data and everything derived
+    from it. Never modified once built: a new version is a new
+    snapshot, and readers holding the old one keep a consistent
+    view until they finish.
+    """
+
+    def __init__(self, tables, version=None, prefix_to_dep=None):
+        self.tables = tables
+        self.version = version
+        self.prefix_to_dep = prefix_to_dep if prefix_to_dep is not None else load_prefix_map()
+        self.match_index = build_match_index(tables)
+        self.schedule_index = build_schedule_index(tables)
+        self.loaded_at = time.time()
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "rows": {name: len(table) for name, table in self.tables.items()},
+        }
+
+
+def set_dataset(new_tables, version=None):
+    """
+    Install new scheduling tables together with their indexes.
+
+    The snapshot is fully built BEFORE anything is replaced, and
+    swapped in with a single assignment, so readers always see a
+    complete index for either the old or the new data.
+    """
+    global SNAPSHOT
+    SNAPSHOT = DatasetSnapshot(new_tables, version)
+
+
+# -------------------------------------------------------------
+# Lazy loading
+# -------------------------------------------------------------
+# Nothing is loaded at import, so the web server can bind its port
+# first. main.py calls start_warmup() from its lifespan hook; any
+# request that arrives before the warm-up finishes simply waits in
+# ensure_loaded() for it.
+SNAPSHOT = None
+_load_lock = threading.Lock()
+
+
+def is_ready():
+    """True once the scheduling tables and indexes are in memory."""
+    return SNAPSHOT is not None
+
+
+def dataset_version():
+    """Version of the loaded snapshot (None before the first load)."""
+    snapshot = SNAPSHOT
+    return snapshot.version if snapshot is not None else None
+
+
+def ensure_loaded():
+    """Load the local copy (once), then look for a newer one in the background."""
+    if is_ready():
+        return
+    # Requests that arrive during the warm-up wait here
+    with span("dataset.wait"), _load_lock:
+        if is_ready():
+            return
+        set_dataset(*load_local_tables())
+        if REFRESH_ON_START:
+            start_background_refresh()
+
+
+def _warmup():
+    try:
+        ensure_loaded()
+    except Exception as e:
+        log.error("Scheduling data warm-up failed: %s", e)
+
+
+def start_warmup():
+    """Run ensure_loaded() in a daemon thread."""
+    thread = threading.Thread(target=_warmup, name="scheduling-warmup", daemon=True)
+    thread.start()
+    return thread
+
 
-# Download Parquet bytes
-res = supabase.storage.from_(bucket).download(path)
+def get_snapshot():
+    """The current DatasetSnapshot (loading it first if needed)."""
+    ensure_loaded()
+    return SNAPSHOT
 
-if not res:
-    raise Exception("Unable to download parquet from Supabase")
 
-# Read Parquet directly into DataFrame: Loads the cleaned scheduling data
-df = pd.read_parquet(BytesIO(res))
+def get_match_index():
+    return get_snapshot().match_index
 
-# Load prefix-to-department mapping
-with open("data/mapping.json") as f:
-    PREFIX_TO_DEP = json.load(f)
 
-# Load user updates (if file exists)
-try:
-    with open("data/updates.json") as f:
-        USER_UPDATES = json.load(f)
-except FileNotFoundError:
-    USER_UPDATES = {"disabled_exams": []}
\ No newline at end of file
+def get_schedule_index():
+    return get_snapshot().schedule_index
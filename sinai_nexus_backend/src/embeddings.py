@@ -0,0 +1,313 @@
+# -------------------------------------------------------------
+# embeddings.py
+# -------------------------------------------------------------
+# Purpose:
+#   Turn text chunks into 384-dim all-MiniLM-L6-v2 embeddings.
+#
+#   Two interchangeable backends, picked by EMBEDDING_BACKEND:
+#
+#   "remote" (default) — HuggingFace Inference API
+#     - Texts are sent in batches of EMBED_BATCH_SIZE per request,
+#       with up to EMBED_MAX_PARALLEL batches in flight (each one
+#       also takes a slot of the "hf" upstream limiter).
+#     - A failed batch is retried with exponential backoff; if it
+#       still fails, its texts are retried one by one so a single
+#       bad chunk can't sink the whole batch.
+#
+#   "local" — the same model run in-process with ONNX Runtime
+#     - Reads tokenizer.json + an ONNX export of the model from
+#       EMBEDDING_MODEL_DIR, so it works with no network at all.
+#     - Mean pooling + L2 normalization, exactly like the
+#       sentence-transformers pipeline behind the HF API, so the
+#       vectors are compatible with rows already in `documents`.
+#     - Batches run on a small thread pool (EMBED_LOCAL_THREADS).
+#
+#   Either way, texts that fail come back as None. Callers must
+#   skip and report them — we never store a placeholder vector.
+#
+#   Mixing backends: embedding_model_id() names the model + runtime
+#   behind the vectors. The local vector store records it and
+#   refuses to open under a different one (see retrieval.py). The
+#   Supabase `documents` table has no place for it, so before
+#   switching backends on an existing table run
+#     python -m src.embeddings
+#   which embeds PARITY_SAMPLE with both backends and fails if any
+#   pair's cosine similarity is below PARITY_MIN_COSINE.
+# -------------------------------------------------------------
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from dotenv import load_dotenv
+
+from src.concurrency import LIMITERS
+from src.telemetry import EMBEDDING_FAILURES, EMBEDDING_FALLBACKS, EMBEDDING_RETRIES, log, span
+
+load_dotenv()
+
+HF_TOKEN = os.getenv("HF_TOKEN")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_PARALLEL = int(os.getenv("EMBED_MAX_PARALLEL", "2"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "0.5"))
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "remote")
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", "models/all-MiniLM-L6-v2")
+# onnx/model.onnx is the fp32 export (vectors match the HF API);
+# onnx/model_qint8_avx512.onnx etc. are faster, slightly lossy variants
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+EMBED_LOCAL_THREADS = int(os.getenv("EMBED_LOCAL_THREADS", "2"))
+EMBED_MAX_TOKENS = 256   # all-MiniLM-L6-v2 max_seq_length
+
+# Fixed texts for check_parity(): short queries and document-style
+# sentences like the ones /upload and /rag-chat see
+PARITY_SAMPLE = [
+    "Where is CT head without contrast performed?",
+    "How long is an MRI brain visit?",
+    "Patients must not eat or drink for four hours before a CT with IV contrast.",
+    "Metformin should be held for 48 hours after iodinated contrast in patients with reduced kidney function.",
+    "The 1176 5th Ave MRI suite is closed on weekends; reschedule to 1090 Amsterdam Ave.",
+    "Ultrasound pelvis transvaginal",
+]
+PARITY_MIN_COSINE = 0.99
+
+_hf_client = None
+
+
+def get_hf_client():
+    """Create the HuggingFace InferenceClient on first use."""
+    global _hf_client
+    if _hf_client is None:
+        from huggingface_hub import InferenceClient
+        _hf_client = InferenceClient(provider="hf-inference", api_key=HF_TOKEN)
+    return _hf_client
+
+
+# ============================================================
+# Remote backend: HuggingFace Inference API
+# ============================================================
+class RemoteEmbeddingBackend:
+    """Batched, retried calls to the HF Inference API."""
+
+    name = "remote"
+
+    def _request(self, batch):
+        """One HF call for a list of texts → list of 384-float lists."""
+        out = LIMITERS["hf"].call(
+            get_hf_client().feature_extraction,
+            text=batch,
+            model=EMBEDDING_MODEL,
+        )
+        if out.ndim == 1:
+            out = out.reshape(1, -1)
+        if out.shape != (len(batch), EMBEDDING_DIM):
+            raise ValueError(f"unexpected embedding shape {out.shape}")
+        return out.tolist()
+
+    def _request_with_retry(self, batch):
+        """_request() with exponential backoff; re-raises the last error."""
+        for attempt in range(EMBED_MAX_RETRIES):
+            try:
+                return self._request(batch)
+            except Exception as e:
+                if attempt == EMBED_MAX_RETRIES - 1:
+                    raise
+                delay = EMBED_BACKOFF_SECONDS * (2 ** attempt)
+                EMBEDDING_RETRIES.inc(backend=self.name)
+                log.warning("Embedding batch of %d failed (%s); retrying in %.1fs", len(batch), e, delay)
+                time.sleep(delay)
+
+    def _embed_batch(self, batch):
+        """Embed one batch; fall back to per-text requests, None on final failure."""
+        try:
+            return self._request_with_retry(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                log.error("Embedding failed (%s): %s", self.name, e)
+                EMBEDDING_FAILURES.inc(backend=self.name)
+                return [None]
+
+        EMBEDDING_FALLBACKS.inc(backend=self.name)
+        results = []
+        for text in batch:
+            try:
+                results.extend(self._request_with_retry([text]))
+            except Exception as e:
+                log.error("Embedding failed (%s): %s", self.name, e)
+                EMBEDDING_FAILURES.inc(backend=self.name)
+                results.append(None)
+        return results
+
+    def embed(self, texts):
+        batches = _batches(texts, EMBED_BATCH_SIZE)
+        if len(batches) <= 1 or EMBED_MAX_PARALLEL <= 1:
+            results = [self._embed_batch(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=EMBED_MAX_PARALLEL) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+        return [emb for batch in results for emb in batch]
+
+
+# ============================================================
+# Local backend: ONNX Runtime on CPU
+# ============================================================
+class LocalEmbeddingBackend:
+    """all-MiniLM-L6-v2 in-process via ONNX Runtime (optional dependency)."""
+
+    name = "local"
+
+    def __init__(self, model_dir=EMBEDDING_MODEL_DIR, onnx_file=EMBEDDING_ONNX_FILE,
+                 threads=EMBED_LOCAL_THREADS):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=local needs `pip install onnxruntime tokenizers`"
+            ) from e
+
+        model_path = os.path.join(model_dir, onnx_file)
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        if not (os.path.exists(model_path) and os.path.exists(tokenizer_path)):
+            raise RuntimeError(
+                f"Local embedding model not found in {model_dir}. Download it once with:\n"
+                f"  huggingface-cli download {EMBEDDING_MODEL} tokenizer.json {onnx_file}"
+                f" --local-dir {model_dir}"
+            )
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=EMBED_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1   # parallelism comes from the pool below
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.threads = threads
+
+    def _embed_batch(self, batch):
+        encodings = self.tokenizer.encode_batch(batch)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalize
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled = summed / counts
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return (pooled / norms).tolist()
+
+    def _safe_batch(self, batch):
+        try:
+            return self._embed_batch(batch)
+        except Exception as e:
+            log.error("Embedding failed (%s): %s", self.name, e)
+            EMBEDDING_FAILURES.inc(len(batch), backend=self.name)
+            return [None] * len(batch)
+
+    def embed(self, texts):
+        batches = _batches(texts, EMBED_BATCH_SIZE)
+        if len(batches) <= 1 or self.threads <= 1:
+            results = [self._safe_batch(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                results = list(pool.map(self._safe_batch, batches))
+        return [emb for batch in results for emb in batch]
+
+
+# ============================================================
+# Backend selection
+# ============================================================
+def embedding_model_id(backend=EMBEDDING_BACKEND, onnx_file=EMBEDDING_ONNX_FILE):
+    """Name of the model + runtime that produces the vectors."""
+    if backend == "local":
+        return f"{EMBEDDING_MODEL} (onnx {onnx_file})"
+    return EMBEDDING_MODEL
+
+
+BACKENDS = {
+    "remote": RemoteEmbeddingBackend,
+    "local": LocalEmbeddingBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _batches(texts, size):
+    texts = list(texts)
+    return [texts[i : i + size] for i in range(0, len(texts), size)]
+
+
+def get_embedding_backend():
+    """Build the configured backend on first use (loading a local model is slow)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if EMBEDDING_BACKEND not in BACKENDS:
+                    raise RuntimeError(
+                        f"Unknown EMBEDDING_BACKEND={EMBEDDING_BACKEND!r}; "
+                        f"choose one of {sorted(BACKENDS)}"
+                    )
+                _backend = BACKENDS[EMBEDDING_BACKEND]()
+    return _backend
+
+
+def embed_text_list(text_list):
+    """
+    Return one embedding per text, in order.
+
+    An entry is None if that text could not be embedded; the
+    caller decides how to report it.
+    """
+    backend = get_embedding_backend()
+    with span(f"embed.{backend.name}"):
+        return backend.embed(text_list)
+
+
+def check_parity(remote=None, local=None, sample=PARITY_SAMPLE, threshold=PARITY_MIN_COSINE):
+    """
+    Embed `sample` with both backends and return the lowest cosine
+    similarity between the two vectors of a text. Raises RuntimeError
+    if a text fails to embed or the lowest cosine is under `threshold`.
+    """
+    remote = remote or RemoteEmbeddingBackend()
+    local = local or LocalEmbeddingBackend()
+    pairs = list(zip(remote.embed(sample), local.embed(sample)))
+    if any(a is None or b is None for a, b in pairs):
+        raise RuntimeError("Parity check could not embed the whole sample")
+
+    a = np.asarray([p[0] for p in pairs], dtype=np.float32)
+    b = np.asarray([p[1] for p in pairs], dtype=np.float32)
+    cosines = (a * b).sum(axis=1) / np.clip(
+        np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1), 1e-12, None
+    )
+    worst = float(cosines.min())
+    if worst < threshold:
+        text = sample[int(cosines.argmin())]
+        raise RuntimeError(
+            f"{remote.name} and {local.name} embeddings differ: cosine {worst:.4f} "
+            f"< {threshold} for {text!r}; re-index before switching EMBEDDING_BACKEND"
+        )
+    return worst
+
+
+if __name__ == "__main__":
+    worst = check_parity()
+    print(f"✅ Embedding backends agree: lowest cosine {worst:.4f} >= {PARITY_MIN_COSINE}")
@@ -0,0 +1,224 @@
+# -------------------------------------------------------------
+# ingest.py
+# -------------------------------------------------------------
+# Purpose:
+#   Turn an uploaded file into rows of the document store
+#   (Supabase `documents` or the local index, see retrieval.py)
+#   without ever holding the whole document in memory.
+#
+#   upload → spool to disk (SPOOL_BYTES at a time)
+#          → extract text page by page
+#          → chunk as text arrives (see src/chunkers.py)
+#          → embed INGEST_BATCH_SIZE chunks at a time
+#          → insert that batch into the store, then move on
+#
+#   Peak memory is one page plus one batch of chunks and their
+#   embeddings, whatever the document size.
+#
+#   Page/section metadata of each chunk is written to a `metadata`
+#   jsonb column when INGEST_CHUNK_METADATA=1 (add the column to
+#   `documents` first).
+#
+#   Incremental re-indexing:
+#     - Uploads are stored content-addressed (uploads/<sha256><ext>),
+#       so the same bytes are kept once.
+#     - Before embedding, the rows already stored for the file_path
+#       are hashed. A chunk whose text (and priority) is already
+#       there is kept as is; only new chunks are embedded and
+#       inserted, and rows whose text disappeared are deleted.
+#       Re-uploading a lightly edited file costs a few embedding
+#       calls, and re-running an interrupted ingest is harmless.
+# -------------------------------------------------------------
+
+import hashlib
+import json
+import os
+from uuid import uuid4
+
+from src.chunkers import get_chunker
+from src.embeddings import embed_text_list
+from src.retrieval import get_document_store
+from src.telemetry import log
+
+SPOOL_BYTES = 1024 * 1024
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_CHUNK_METADATA = os.getenv("INGEST_CHUNK_METADATA", "0") == "1"
+UPLOAD_DIR = "uploads"
+
+
+async def spool_upload(upload):
+    """
+    Copy an UploadFile to disk one SPOOL_BYTES piece at a time.
+    Returns (local_path, sha256 hex) — the path is content-addressed,
+    so an identical upload reuses the existing copy.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    tmp_path = os.path.join(UPLOAD_DIR, f".tmp-{uuid4()}")
+    digest = hashlib.sha256()
+    with open(tmp_path, "wb") as f:
+        while True:
+            piece = await upload.read(SPOOL_BYTES)
+            if not piece:
+                break
+            digest.update(piece)
+            f.write(piece)
+
+    content_hash = digest.hexdigest()
+    ext = os.path.splitext(upload.filename or "")[1].lower()
+    local_path = os.path.join(UPLOAD_DIR, content_hash + ext)
+    if os.path.exists(local_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, local_path)
+    return local_path, content_hash
+
+
+def iter_text(local_path, filename):
+    """
+    Yield the document as (text, meta) blocks: one per page for
+    PDFs, one per element for everything else. Empty blocks are
+    skipped. See chunkers.py for the meta fields.
+    """
+    # Heavy parsers: imported on first upload, not at startup
+    if filename.lower().endswith(".pdf"):
+        import pdfplumber
+
+        with pdfplumber.open(local_path) as pdf:
+            for number, page in enumerate(pdf.pages, start=1):
+                extracted = page.extract_text()
+                # Drop the page's parsed layout before reading the next one
+                page.close()
+                if extracted:
+                    yield extracted, {"kind": "page", "page": number}
+        return
+
+    # unstructured has no streaming API; the elements are still
+    # chunked and embedded incrementally below
+    from unstructured.partition.auto import partition
+
+    for el in partition(filename=local_path, strategy="text"):
+        if el.text:
+            kind = "heading" if el.category == "Title" else "text"
+            yield el.text, {"kind": kind, "page": getattr(el.metadata, "page_number", None)}
+
+
+def _batches(chunks, size):
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def chunk_hash(content, priority):
+    return hashlib.sha256(f"{priority}\x00{content}".encode("utf-8")).hexdigest()
+
+
+def _existing_chunks(path):
+    """{chunk hash: [row ids]} for the rows already stored under path."""
+    existing = {}
+    for row in get_document_store().rows_for_path(path):
+        h = chunk_hash(row["content"], row.get("priority"))
+        existing.setdefault(h, []).append(row["id"])
+    return existing
+
+
+def _insert_batch(batch, priority, path):
+    """Embed + insert one batch of (index, chunk); returns (rows inserted, failed indexes)."""
+    embeddings = embed_text_list([chunk["content"] for _, chunk in batch])
+
+    rows = []
+    failed = []
+    for (index, chunk), emb in zip(batch, embeddings):
+        # Chunks that failed to embed after retries are reported, not stored
+        if emb is None:
+            failed.append(index)
+            continue
+        row = {
+            "content": chunk["content"],
+            "embedding": emb,
+            "priority": priority,
+            "file_path": path
+        }
+        if INGEST_CHUNK_METADATA:
+            row["metadata"] = {"page": chunk["page"], "section": chunk["section"]}
+        rows.append(row)
+
+    if rows:
+        get_document_store().insert(rows)
+    return len(rows), failed
+
+
+def ingest_file(local_path, filename, priority, path, is_json=False, on_progress=None):
+    """
+    Blocking: parse, chunk, embed and insert a spooled upload,
+    reusing the rows already stored for path. Run it in a worker
+    thread.
+
+    on_progress(progress) is called after each batch lands in
+    the store, with the same counters this function returns.
+    """
+    progress = {
+        "priority": priority,
+        "pages_parsed": 0,
+        "chunks_embedded": 0,
+        "chunks_unchanged": 0,
+        "rows_inserted": 0,
+        "rows_deleted": 0,
+        "failed_chunk_indexes": [],
+    }
+
+    if is_json:
+        # JSON notes: one chunk, always priority 1
+        progress["priority"] = priority = 1
+        with open(local_path, "r") as f:
+            data = json.load(f)
+        text = data.get("content", "")
+        chunks = iter([{"content": text, "page": None, "section": None}] if text else [])
+    else:
+        def pages():
+            for block in iter_text(local_path, filename):
+                progress["pages_parsed"] += 1
+                yield block
+        chunks = get_chunker()(pages())
+
+    existing = _existing_chunks(path)
+
+    def new_chunks():
+        for index, chunk in enumerate(chunks):
+            ids = existing.get(chunk_hash(chunk["content"], priority))
+            if ids:
+                ids.pop()   # this stored row stays
+                progress["chunks_unchanged"] += 1
+                continue
+            yield index, chunk
+
+    for batch in _batches(new_chunks(), INGEST_BATCH_SIZE):
+        n, batch_failed = _insert_batch(batch, priority, path)
+        progress["chunks_embedded"] += len(batch) - len(batch_failed)
+        progress["rows_inserted"] += n
+        progress["failed_chunk_indexes"].extend(batch_failed)
+        log.debug("%s: %d chunks inserted (through chunk %d)", path, progress["rows_inserted"], batch[-1][0] + 1)
+        if on_progress:
+            on_progress(progress)
+
+    # Rows whose text is no longer in the file. Deleted last, so an
+    # interrupted run never leaves the file with fewer chunks than before.
+    stale = [row_id for ids in existing.values() for row_id in ids]
+    if stale:
+        get_document_store().delete_ids(stale)
+        progress["rows_deleted"] = len(stale)
+        if on_progress:
+            on_progress(progress)
+
+    log.info(
+        "%s: %d inserted, %d unchanged, %d deleted",
+        path, progress["rows_inserted"], progress["chunks_unchanged"], len(stale),
+    )
+    failed = progress["failed_chunk_indexes"]
+    if failed:
+        log.warning("%d chunks failed to embed for %s", len(failed), path)
+    return progress
@@ -0,0 +1,307 @@
+# -------------------------------------------------------------
+# jobs.py
+# -------------------------------------------------------------
+# Purpose:
+#   Run document ingestion (parse → chunk → embed → insert) in the
+#   background, so /upload can answer right away with a job id.
+#
+#   - Jobs are rows in a local SQLite file (INGEST_JOBS_DB); no
+#     outside queue service is needed.
+#   - INGEST_WORKERS threads process jobs, oldest first.
+#   - Progress (pages parsed, chunks embedded, rows inserted) is
+#     saved after every batch and served by GET /jobs/{id}.
+#   - On startup, jobs that were queued or still running when the
+#     process stopped are picked up again. Ingestion diffs against
+#     the rows already in Supabase, so an interrupted job only
+#     embeds the chunks it hadn't inserted yet.
+#   - indexed_files remembers the content hash last indexed for
+#     each file_path; uploading the same bytes again is a no-op,
+#     unless another upload of that path is still queued or
+#     running (then the re-upload has to run after it, or the
+#     older upload would end up indexed).
+#   - Jobs for the same file_path run one at a time (two at once
+#     would diff against the same existing rows and both insert
+#     the new chunks). A job that waited behind a newer upload of
+#     the same path that already finished is skipped.
+#
+#   Status: queued → running → done | failed
+#
+#   The queue belongs to one server process: run a single worker
+#   process (or give each its own INGEST_JOBS_DB) so two processes
+#   don't resume the same job.
+# -------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from src import ingest, rag_cache
+from src.telemetry import log
+
+INGEST_JOBS_DB = os.getenv("INGEST_JOBS_DB", "data/jobs.sqlite")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+_COLUMNS = (
+    "id", "status", "local_path", "filename", "is_json", "priority",
+    "file_path", "progress", "error", "created_at", "updated_at",
+    "content_hash",
+)
+
+
+class JobQueue:
+    """SQLite-backed ingestion queue with a bounded worker pool."""
+
+    def __init__(self, db_path=INGEST_JOBS_DB, workers=INGEST_WORKERS):
+        self.db_path = db_path
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = set()   # job ids a worker has claimed in this process
+        self._path_locks = {}  # file_path → [lock, jobs holding or waiting for it]
+        self._init_db()
+
+    # ---------------------------------------------------------
+    # SQLite
+    # ---------------------------------------------------------
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL,"
+                " local_path TEXT NOT NULL, filename TEXT NOT NULL,"
+                " is_json INTEGER NOT NULL, priority INTEGER NOT NULL,"
+                " file_path TEXT NOT NULL, progress TEXT NOT NULL,"
+                " error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL,"
+                " content_hash TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(ingest_jobs)")}
+            if "content_hash" not in columns:
+                conn.execute("ALTER TABLE ingest_jobs ADD COLUMN content_hash TEXT")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS indexed_files ("
+                " file_path TEXT PRIMARY KEY, content_hash TEXT NOT NULL,"
+                " priority INTEGER NOT NULL, indexed_at REAL NOT NULL)"
+            )
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE ingest_jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def get(self, job_id):
+        """The job as a dict, or None if there is no such job."""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM ingest_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job["is_json"] = bool(job["is_json"])
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+    def is_indexed(self, file_path, content_hash, priority, conn=None):
+        """True if exactly these bytes were last indexed under file_path."""
+        if conn is None:
+            with self._connect() as conn:
+                return self.is_indexed(file_path, content_hash, priority, conn)
+        row = conn.execute(
+            "SELECT content_hash, priority FROM indexed_files WHERE file_path = ?",
+            (file_path,),
+        ).fetchone()
+        return row == (content_hash, priority)
+
+    def _mark_indexed(self, file_path, content_hash, priority):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO indexed_files"
+                " (file_path, content_hash, priority, indexed_at) VALUES (?, ?, ?, ?)",
+                (file_path, content_hash, priority, time.time()),
+            )
+
+    def forget(self, file_path):
+        """Call when file_path's rows are deleted, so a re-upload is indexed again."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM indexed_files WHERE file_path = ?", (file_path,))
+
+    # ---------------------------------------------------------
+    # Queue
+    # ---------------------------------------------------------
+    def start(self):
+        """Start the workers and re-queue jobs left over from the last run."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="ingest"
+            )
+        with self._connect() as conn:
+            pending = [
+                job_id for (job_id,) in conn.execute(
+                    "SELECT id FROM ingest_jobs"
+                    " WHERE status IN ('queued', 'running')"
+                    " ORDER BY created_at"
+                )
+            ]
+        if pending:
+            log.info("Resuming %d ingest job(s)", len(pending))
+        for job_id in pending:
+            self._executor.submit(self._run, job_id)
+
+    def enqueue(self, local_path, filename, priority, file_path,
+                is_json=False, content_hash=None):
+        """
+        Record a spooled upload and hand it to a worker; returns
+        (job id, status). Already-indexed content is recorded as a
+        finished job without doing any work, if no other upload of
+        file_path is pending.
+        """
+        self.start()
+        if is_json:
+            priority = 1   # JSON notes are always indexed at priority 1
+        job_id = str(uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            # The pending check and the insert are one transaction, so
+            # a concurrent enqueue can't slip in between them
+            conn.execute("BEGIN IMMEDIATE")
+            pending = conn.execute(
+                "SELECT 1 FROM ingest_jobs"
+                " WHERE file_path = ? AND status IN ('queued', 'running') LIMIT 1",
+                (file_path,),
+            ).fetchone()
+            unchanged = (
+                content_hash is not None and pending is None
+                and self.is_indexed(file_path, content_hash, priority, conn)
+            )
+            status = "done" if unchanged else "queued"
+            conn.execute(
+                f"INSERT INTO ingest_jobs ({', '.join(_COLUMNS)})"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, local_path, filename, int(is_json), priority,
+                 file_path, json.dumps({"unchanged": unchanged}), None, now, now,
+                 content_hash),
+            )
+        if unchanged:
+            log.info("%s: content unchanged, skipping re-index", file_path)
+        else:
+            self._executor.submit(self._run, job_id)
+        return job_id, status
+
+    def _run(self, job_id):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        try:
+            self._process(job_id)
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    @contextmanager
+    def _path_lock(self, file_path):
+        """Hold file_path's lock; dropped once no job holds or waits for it."""
+        with self._lock:
+            entry = self._path_locks.setdefault(file_path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._path_locks[file_path]
+
+    def _newer_done(self, job):
+        """
+        Id of a later upload of the same file_path that was actually
+        ingested (not skipped as unchanged or superseded itself).
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM ingest_jobs"
+                " WHERE file_path = ? AND status = 'done' AND created_at > ?"
+                " AND json_extract(progress, '$.unchanged') IS NOT 1"
+                " AND json_extract(progress, '$.superseded_by') IS NULL"
+                " ORDER BY created_at DESC LIMIT 1",
+                (job["file_path"], job["created_at"]),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _process(self, job_id):
+        job = self.get(job_id)
+        if job is None or job["status"] not in ("queued", "running"):
+            return
+        with self._path_lock(job["file_path"]):
+            newer = self._newer_done(job)
+            if newer is not None:
+                log.info("Ingest job %s: %s already re-indexed by %s, skipping", job_id, job["file_path"], newer)
+                self._update(job_id, status="done", progress={"superseded_by": newer})
+                return
+            self._ingest(job_id, job)
+
+    def _ingest(self, job_id, job):
+        self._update(job_id, status="running")
+
+        def on_progress(progress):
+            self._update(job_id, progress=progress)
+            rag_cache.bump_corpus_version()
+
+        try:
+            progress = ingest.ingest_file(
+                job["local_path"],
+                job["filename"],
+                job["priority"],
+                job["file_path"],
+                is_json=job["is_json"],
+                on_progress=on_progress,
+            )
+        except Exception as e:
+            log.error("Ingest job %s failed: %s", job_id, e)
+            self._update(job_id, status="failed", error=str(e))
+            return
+        self._update(job_id, status="done", progress=progress)
+        # Only a complete, clean run lets the next identical upload skip
+        if job["content_hash"] and not progress["failed_chunk_indexes"]:
+            self._mark_indexed(job["file_path"], job["content_hash"], job["priority"])
+
+    def stats(self):
+        with self._connect() as conn:
+            return dict(conn.execute(
+                "SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status"
+            ).fetchall())
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Open the job database on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
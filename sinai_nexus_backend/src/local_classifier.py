@@ -0,0 +1,152 @@
+# -------------------------------------------------------------
+# local_classifier.py
+# -------------------------------------------------------------
+# Purpose:
+#   Recognize the common, formulaic scheduling questions locally
+#   so they don't need a Gemini round trip.
+#
+# How:
+#   - A question is matched against a short list of phrasing
+#     templates per intent ("how long is X", "where is X done",
+#     "which rooms at Y do X", ...). Each template captures the
+#     exam and/or site text.
+#   - The captured text is matched against the real exam and site
+#     names with the same MatchIndex the handlers use, and the
+#     best match is re-scored with token_sort_ratio. (The matchers
+#     rank with token_set_ratio, which gives 100 whenever one
+#     side's words are a subset of the other's, so "how long is
+#     ct" would look certain.) token_sort_ratio also counts the
+#     words left over on either side.
+#   - Confidence = the lowest of those scores (0–1). If it reaches
+#     LOCAL_INTENT_THRESHOLD the local parse is used; otherwise
+#     query_router falls back to Gemini.
+#
+#   STATS counts how many questions were answered each way.
+# -------------------------------------------------------------
+
+import os
+import re
+import threading
+
+from rapidfuzz import fuzz
+
+import src.data_loader as data_loader
+from src.match_index import normalize_site_query, normalize_text
+
+LOCAL_INTENT_THRESHOLD = float(os.getenv("LOCAL_INTENT_THRESHOLD", "0.85"))
+
+EXAM = r"(?:an? |the )?(?P<exam>.+?)"
+SITE = r"(?P<site>.+?)"
+VERB = r"(?:done|performed|offered|available|scheduled)"
+ROOM_VERB = r"(?:perform|performs|do|does|offer|offers|can do|are used for|for)"
+
+# (intent, template) — tried in order, first match wins
+TEMPLATES = [
+    ("rooms_for_exam_at_site",
+     rf"^(?:which|what) rooms (?:at|in) {SITE} {ROOM_VERB} {EXAM}$"),
+    ("rooms_for_exam_at_site",
+     rf"^(?:which|what) rooms {ROOM_VERB} {EXAM} (?:at|in) {SITE}$"),
+    ("rooms_for_exam_at_site",
+     rf"^rooms (?:for|performing) {EXAM} (?:at|in) {SITE}$"),
+
+    ("rooms_for_exam",
+     rf"^(?:which|what) rooms {ROOM_VERB} {EXAM}$"),
+    ("rooms_for_exam",
+     rf"^rooms (?:for|performing) {EXAM}$"),
+
+    ("exam_duration",
+     rf"^how long (?:is|does|will|would) {EXAM}(?: take| last| visit| appointment)?$"),
+    ("exam_duration",
+     rf"^(?:what is |whats )?(?:the )?(?:duration|visit length|length) (?:of|for) {EXAM}$"),
+
+    ("exam_at_site",
+     rf"^(?:is|are|can) {EXAM}(?: be)? {VERB} (?:at|in) {SITE}$"),
+    ("exam_at_site",
+     rf"^(?:does|do|can) {SITE} (?:do|perform|offer) {EXAM}$"),
+
+    ("locations_for_exam",
+     rf"^where (?:is|are|can i get|can we get|can|do they do|do you do) {EXAM}(?: be)?(?: {VERB})?$"),
+    ("locations_for_exam",
+     rf"^(?:which|what) (?:sites|locations|places|hospitals) (?:do|does|perform|offer|have|can do) {EXAM}$"),
+
+    ("exams_at_site",
+     rf"^(?:which|what) (?:exams|studies|procedures|tests) (?:are |is )?(?:{VERB} )?(?:at|in) {SITE}$"),
+    ("exams_at_site",
+     rf"^(?:which|what) (?:exams|studies|procedures|tests) (?:does|do|can) {SITE} (?:do|perform|offer)$"),
+]
+
+_COMPILED = [(intent, re.compile(pattern)) for intent, pattern in TEMPLATES]
+
+STATS = {"local": 0, "gemini": 0}
+_stats_lock = threading.Lock()
+
+
+def record(source):
+    """Count one question answered by "local" or "gemini"."""
+    with _stats_lock:
+        STATS[source] += 1
+
+
+def stats():
+    """Counters plus the share of questions answered locally."""
+    with _stats_lock:
+        total = STATS["local"] + STATS["gemini"]
+        return {
+            **STATS,
+            "local_share": round(STATS["local"] / total, 4) if total else 0.0,
+            "threshold": LOCAL_INTENT_THRESHOLD,
+        }
+
+
+def _clean(question):
+    s = question.lower().strip()
+    s = re.sub(r"[?!.]+$", "", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _score(query, matches, normalize):
+    """How closely the best match covers the query, as 0–1 (0 if nothing matched)."""
+    if not matches:
+        return 0.0
+    return fuzz.token_sort_ratio(query, normalize(matches[0][0])) / 100
+
+
+def classify_locally(question):
+    """
+    Try to parse a question without Gemini.
+
+    Returns (parsed, confidence), where parsed has the same shape as
+    interpret_scheduling_query()'s result, or (None, 0.0) if no
+    template fits.
+    """
+    if not isinstance(question, str) or not question.strip():
+        return None, 0.0
+    text = _clean(question)
+
+    for intent, pattern in _COMPILED:
+        m = pattern.match(text)
+        if not m:
+            continue
+        groups = m.groupdict()
+        exam = (groups.get("exam") or "").strip() or None
+        site = (groups.get("site") or "").strip() or None
+
+        # A stray " at " means the template split the question wrongly
+        if exam and " at " in f" {exam} ":
+            return None, 0.0
+
+        index = data_loader.get_match_index()
+        scores = []
+        if exam:
+            scores.append(_score(
+                normalize_text(exam), index.match_exams([exam])[0], normalize_text
+            ))
+        if site:
+            scores.append(_score(
+                normalize_site_query(site), index.match_sites([site])[0], str.lower
+            ))
+        confidence = min(scores) if scores else 0.0
+
+        return {"intent": intent, "exam": exam, "site": site}, confidence
+
+    return None, 0.0
@@ -0,0 +1,140 @@
+# -------------------------------------------------------------
+# match_index.py
+# -------------------------------------------------------------
+# Purpose:
+#   Hold the normalized exam and site names that the fuzzy
+#   matchers compare against, built ONCE per dataset instead of
+#   on every question.
+#
+#   data_loader builds a MatchIndex right after it loads the
+#   table; fuzzy_matchers only reads it. When the dataset
+#   changes, a brand-new index is built and swapped in with a
+#   single assignment, so a request never sees a half-built one.
+# -------------------------------------------------------------
+
+import re
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Common abbreviation and cleanup rules
+ABBREV_MAP = {
+    r"\bwo\b": "without",
+    r"\bw/o\b": "without",
+    r"\bw\b": "with",
+    r"\biv\b": "intravenous"
+}
+
+IGNORE_WORDS = ["exam", "study"]
+
+NUMBER_WORDS = {
+    "first": "1st", "second": "2nd", "third": "3rd", "fourth": "4th",
+    "fifth": "5th", "sixth": "6th", "seventh": "7th", "eighth": "8th",
+    "ninth": "9th", "tenth": "10th"
+}
+
+# Same thresholds the matchers have always used
+EXAM_SCORE_CUTOFF = 55
+SITE_SCORE_CUTOFF = 60
+MATCH_LIMIT = 3
+
+
+def normalize_text(s: str):
+    """Simplify text (expand abbreviations, remove filler words)."""
+    s = s.lower()
+    for short, full in ABBREV_MAP.items():
+        s = re.sub(short, full, s)
+    for w in IGNORE_WORDS:
+        s = re.sub(rf"\b{w}\b", "", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def normalize_site_query(s: str):
+    """Lower-case a site query and turn 'fifth' into '5th' etc."""
+    s = s.lower().strip()
+    for word, num in NUMBER_WORDS.items():
+        s = re.sub(rf"\b{word}\b", num, s)
+    return s
+
+
+def _top_matches(queries, choices, originals, cutoff, limit=MATCH_LIMIT, workers=1):
+    """
+    Score every query against every choice in one rapidfuzz call
+    and return, per query, the original names scoring above cutoff.
+
+    Ties keep dataset order, exactly like process.extract.
+    """
+    if not queries:
+        return []
+    if not choices:
+        return [[] for _ in queries]
+
+    scores = process.cdist(
+        queries, choices,
+        scorer=fuzz.token_set_ratio,
+        dtype=np.float64,
+        workers=workers,
+    )
+
+    results = []
+    for row in scores:
+        order = np.argsort(-row, kind="stable")[:limit]
+        results.append([
+            (originals[i], float(row[i])) for i in order if row[i] > cutoff
+        ])
+    return results
+
+
+class MatchIndex:
+    """
+    Prebuilt choice arrays for exam and site matching.
+
+    exam_choices[i] is the normalized form of exam_names[i]
+    (same for sites), so a match position maps straight back
+    to the official name without rebuilding a dict.
+    """
+
+    def __init__(self, exam_choices, exam_names, site_choices, site_names):
+        self.exam_choices = exam_choices
+        self.exam_names = exam_names
+        self.site_choices = site_choices
+        self.site_names = site_names
+
+    def match_exams(self, exam_queries, workers=1):
+        """Return [(official exam, score), ...] for each query."""
+        norm = [normalize_text(q) for q in exam_queries]
+        return _top_matches(
+            norm, self.exam_choices, self.exam_names,
+            EXAM_SCORE_CUTOFF, workers=workers
+        )
+
+    def match_sites(self, site_queries, workers=1):
+        """Return [(official site, score), ...] for each query."""
+        norm = [normalize_site_query(q) for q in site_queries]
+        return _top_matches(
+            norm, self.site_choices, self.site_names,
+            SITE_SCORE_CUTOFF, workers=workers
+        )
+
+
+def build_match_index(tables):
+    """
+    Build a MatchIndex from the normalized scheduling tables.
+
+    The dict step mirrors the old per-query code: names that
+    normalize to the same text collapse onto the LAST original,
+    while keeping the position of the first one.
+    """
+    exams_original = tables["procedures"]["EAP Name"].dropna().unique()
+    exam_map = {normalize_text(e): e for e in exams_original}
+
+    departments = tables["departments"].sort_values("department_id")
+    sites_original = departments["DEP Name"].dropna().unique()
+    site_map = {s.lower(): s for s in sites_original}
+
+    return MatchIndex(
+        exam_choices=list(exam_map.keys()),
+        exam_names=list(exam_map.values()),
+        site_choices=list(site_map.keys()),
+        site_names=list(site_map.values()),
+    )
@@ -0,0 +1,233 @@
+# -------------------------------------------------------------
+# overrides.py
+# -------------------------------------------------------------
+# Purpose:
+#   Temporary scheduling overrides — "exam X is not available at
+#   site Y (until Z)" — shared by every worker process.
+#
+#   - Stored in a SQLite file (OVERRIDES_DB). Each change is one
+#     transaction, so concurrent admin edits can't overwrite each
+#     other the way rewriting updates.json could.
+#   - Every change also bumps a version counter in the same
+#     transaction. Each process keeps the overrides in memory and
+#     re-reads them when that counter moves (checked at most every
+#     OVERRIDES_CHECK_SECONDS), so a change made by one worker
+#     reaches the others within that interval.
+#   - Lookups are dictionary hits on the canonical (exam, site)
+#     pair: case and spacing don't matter.
+#   - An override may carry an expiry time; once it passes, the
+#     override stops applying (and the version changes, so cached
+#     answers built with it are dropped too).
+#   - On first use, the old data/updates.json entries are imported.
+# -------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.telemetry import log
+
+OVERRIDES_DB = os.getenv("OVERRIDES_DB", "data/overrides.sqlite")
+OVERRIDES_CHECK_SECONDS = float(os.getenv("OVERRIDES_CHECK_SECONDS", "1"))
+LEGACY_UPDATES_PATH = "data/updates.json"
+
+
+def canonical(name):
+    """Case- and spacing-insensitive form of an exam or site name."""
+    return " ".join(str(name).split()).upper()
+
+
+class OverridesStore:
+    """SQLite-backed disabled (exam, site) pairs with an in-memory index."""
+
+    def __init__(self, db_path=OVERRIDES_DB, legacy_path=LEGACY_UPDATES_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db_version = None
+        self._generation = 0        # bumped locally when an override expires
+        self._checked_at = 0.0
+        self._next_expiry = None
+        self._pairs = {}            # (exam key, site key) → entry
+        self._by_exam = {}          # exam key → {site key: entry}
+        self._by_site = {}          # site key → {exam key: entry}
+        self._init_db()
+        self._import_legacy(legacy_path)
+        self._refresh(force=True)
+
+    # ---------------------------------------------------------
+    # SQLite
+    # ---------------------------------------------------------
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS disabled_exams ("
+                " exam_key TEXT NOT NULL, site_key TEXT NOT NULL,"
+                " exam TEXT NOT NULL, site TEXT NOT NULL, reason TEXT,"
+                " created_at REAL NOT NULL, expires_at REAL,"
+                " PRIMARY KEY (exam_key, site_key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS overrides_meta ("
+                " name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO overrides_meta (name, value) VALUES ('version', 0)"
+            )
+
+    def _bump(self, conn):
+        conn.execute("UPDATE overrides_meta SET value = value + 1 WHERE name = 'version'")
+
+    def _import_legacy(self, path):
+        """Copy updates.json's disabled exams in, once per database."""
+        with self._connect() as conn:
+            done = conn.execute(
+                "SELECT value FROM overrides_meta WHERE name = 'legacy_imported'"
+            ).fetchone()
+            if done:
+                return
+            try:
+                with open(path) as f:
+                    entries = json.load(f).get("disabled_exams", [])
+            except FileNotFoundError:
+                entries = []
+            for entry in entries:
+                created = time.time()
+                try:
+                    created = time.mktime(time.strptime(entry["timestamp"][:19], "%Y-%m-%dT%H:%M:%S"))
+                except (KeyError, ValueError):
+                    pass
+                conn.execute(
+                    "INSERT OR IGNORE INTO disabled_exams"
+                    " (exam_key, site_key, exam, site, reason, created_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                    (canonical(entry["exam"]), canonical(entry["site"]),
+                     entry["exam"], entry["site"], entry.get("reason"), created),
+                )
+            conn.execute(
+                "INSERT OR IGNORE INTO overrides_meta (name, value) VALUES ('legacy_imported', 1)"
+            )
+            self._bump(conn)
+        if entries:
+            log.info("Imported %d override(s) from %s", len(entries), path)
+
+    # ---------------------------------------------------------
+    # In-memory index
+    # ---------------------------------------------------------
+    def _refresh(self, force=False):
+        """Re-read the overrides if another process changed them or one expired."""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._checked_at < OVERRIDES_CHECK_SECONDS:
+                return
+            self._checked_at = now
+            with self._connect() as conn:
+                (db_version,) = conn.execute(
+                    "SELECT value FROM overrides_meta WHERE name = 'version'"
+                ).fetchone()
+                expired = self._next_expiry is not None and self._next_expiry <= now
+                if not force and db_version == self._db_version and not expired:
+                    return
+                rows = conn.execute(
+                    "SELECT exam_key, site_key, exam, site, reason, created_at, expires_at"
+                    " FROM disabled_exams WHERE expires_at IS NULL OR expires_at > ?",
+                    (now,),
+                ).fetchall()
+
+            pairs, by_exam, by_site = {}, {}, {}
+            next_expiry = None
+            for exam_key, site_key, exam, site, reason, created_at, expires_at in rows:
+                entry = {
+                    "exam": exam, "site": site, "reason": reason,
+                    "created_at": created_at, "expires_at": expires_at,
+                }
+                pairs[(exam_key, site_key)] = entry
+                by_exam.setdefault(exam_key, {})[site_key] = entry
+                by_site.setdefault(site_key, {})[exam_key] = entry
+                if expires_at is not None and (next_expiry is None or expires_at < next_expiry):
+                    next_expiry = expires_at
+
+            self._pairs, self._by_exam, self._by_site = pairs, by_exam, by_site
+            self._next_expiry = next_expiry
+            if expired:
+                self._generation += 1
+            self._db_version = db_version
+
+    # ---------------------------------------------------------
+    # Reads
+    # ---------------------------------------------------------
+    def version(self):
+        """Changes whenever the set of active overrides changes."""
+        self._refresh()
+        return f"{self._db_version}.{self._generation}"
+
+    def disabled(self, exam, site):
+        """The override entry if exam is disabled at site, else None."""
+        self._refresh()
+        return self._pairs.get((canonical(exam), canonical(site)))
+
+    def disabled_sites(self, exam):
+        """{site key: entry} for every site the exam is disabled at."""
+        self._refresh()
+        return self._by_exam.get(canonical(exam), {})
+
+    def disabled_exams(self, site):
+        """{exam key: entry} for every exam disabled at the site."""
+        self._refresh()
+        return self._by_site.get(canonical(site), {})
+
+    def list(self):
+        self._refresh()
+        return sorted(self._pairs.values(), key=lambda e: (e["exam"], e["site"]))
+
+    # ---------------------------------------------------------
+    # Writes
+    # ---------------------------------------------------------
+    def disable(self, exam, site, reason="unspecified", expires_at=None):
+        """Mark exam unavailable at site, optionally until expires_at (epoch seconds)."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO disabled_exams"
+                " (exam_key, site_key, exam, site, reason, created_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (canonical(exam), canonical(site), exam, site, reason, time.time(), expires_at),
+            )
+            self._bump(conn)
+        self._refresh(force=True)
+
+    def enable(self, exam, site):
+        """Remove the override for (exam, site); returns True if there was one."""
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM disabled_exams WHERE exam_key = ? AND site_key = ?",
+                (canonical(exam), canonical(site)),
+            ).rowcount
+            if removed:
+                self._bump(conn)
+        self._refresh(force=True)
+        return bool(removed)
+
+    def stats(self):
+        self._refresh()
+        return {"active": len(self._pairs), "version": self.version()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_overrides():
+    """Open the overrides database on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = OverridesStore()
+    return _store
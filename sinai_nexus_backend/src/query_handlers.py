@@ -3,10 +3,68 @@
 # -------------------------------------------------------------
 # Purpose:
 #   Implement the core logic for each scheduling question type.
+#
+#   Lookups go through the snapshot's schedule index (see
+#   schedule_index.py), so each answer costs time proportional
+#   to the size of the answer, not the size of the table. The
+#   *_resolved variants take the DatasetSnapshot to read, so a
+#   caller that already holds one (answer_cache.lookup_many) gets
+#   its results from that version even if a reload lands
+#   mid-request; without one they use the current snapshot.
+#
+#   Each handler first fuzzy-resolves the user's wording, then
+#   calls its *_resolved variant with the official names. The
+#   router's answer cache (see answer_cache.py) calls the
+#   *_resolved variants directly, keyed on those names.
+#
+#   Temporary overrides (see overrides.py) apply to every intent
+#   except exam_duration: an exam disabled at a site is not
+#   reported there, nor are that site's rooms for the exam.
+#
+#   The *_resolved variants are timed as telemetry stages
+#   (handlers.<name>): index lookups and override filtering,
+#   separate from the fuzzy matching (match.*) before them.
 # -------------------------------------------------------------
 
-from src.data_loader import df, PREFIX_TO_DEP, USER_UPDATES
+import src.data_loader as data_loader
 from src.fuzzy_matchers import best_exam_match, best_site_match
+from src.overrides import canonical, get_overrides
+from src.telemetry import note, timed
+
+
+def _snapshot(snapshot):
+    return snapshot if snapshot is not None else data_loader.get_snapshot()
+
+
+def _room_department(room, prefix_to_dep):
+    """
+    The department a room belongs to, by its mapping.json prefix.
+
+    Prefixes overlap ("RA" / "RA Morningside", "MSB" / "MSBI..."),
+    so the longest one wins, and it must be followed by a space or
+    the end of the name: "RA MORNINGSIDE MRI 1" is 1090 AMST AVE,
+    not 1176 5TH AVE.
+    """
+    name = canonical(room)
+    best = None
+    for prefix, dep in prefix_to_dep.items():
+        key = canonical(prefix)
+        if (name == key or name.startswith(key + " ")) and (best is None or len(key) > len(best[0])):
+            best = (key, dep)
+    return best[1] if best else None
+
+
+def _buildings(sites, prefix_to_dep):
+    """
+    The mapping.json buildings of dataset sites: the building
+    ("1470 MADISON AVE") is the start of the department name
+    ("1470 MADISON AVE RAD CT").
+    """
+    keys = [canonical(site) for site in sites]
+    return {
+        dep for dep in prefix_to_dep.values()
+        if any(key == canonical(dep) or key.startswith(canonical(dep) + " ") for key in keys)
+    }
 
 # -------------------------------------------------------------
 # Question 1: Is exam X done at site Y?
@@ -19,8 +77,8 @@ from src.fuzzy_matchers import best_exam_match, best_site_match
 #   - First, we "guess" the official exam name(s) from the user's wording.
 #   - Then, we "guess" the official site name(s) from the user's wording.
 #   - If we have at least one likely exam and one likely site:
-#       • We check the table for any row that has BOTH that exam and that site.
-#       • If any row exists → True (yes, it’s offered there)
+#       • We check the index for any (exam, site) pair among our guesses.
+#       • If any pair exists → True (yes, it’s offered there)
 #       • If not → False (not found there)
 #   - If we cannot guess either exam or site → False (we don't have enough info)
 #
@@ -33,9 +91,11 @@ from src.fuzzy_matchers import best_exam_match, best_site_match
 # -------------------------------------------------------------
 def exam_at_site(exam_query, site_query):
     # Try to find likely official names for the exam and site
-    exams = best_exam_match(exam_query)
-    sites = best_site_match(site_query)
+    return exam_at_site_resolved(best_exam_match(exam_query), best_site_match(site_query))
+
 
+@timed("handlers.exam_at_site")
+def exam_at_site_resolved(exams, sites, snapshot=None):
     # If we couldn't confidently guess either side, we can't confirm availability
     if not exams or not sites:
         return False
@@ -44,19 +104,13 @@ def exam_at_site(exam_query, site_query):
     exam = exams[0]
 
     # 🧠 Check if this pair is listed as disabled
-    for entry in USER_UPDATES.get("disabled_exams", []):
-        if (
-            entry["exam"].lower() == exam.lower()
-            and entry["site"].lower() == site.lower()
-        ):
-            print(f"⚠️ Note: {exam} at {site} temporarily disabled ({entry['reason']})")
-            return False
-
-    # Filter the table to rows where BOTH the exam and site are among our best guesses
-    subset = df[df["EAP Name"].isin(exams) & df["DEP Name"].isin(sites)]
+    entry = get_overrides().disabled(exam, site)
+    if entry is not None:
+        note(f"{exam} at {site} temporarily disabled ({entry['reason']})")
+        return False
 
-    # If there is at least one row, then yes — that exam is offered at that site
-    return not subset.empty
+    # Is any of our best-guess exams listed at any of our best-guess sites?
+    return _snapshot(snapshot).schedule_index.has_exam_at_site(exams, sites)
 
 
 # -------------------------------------------------------------
@@ -78,8 +132,12 @@ def exam_at_site(exam_query, site_query):
 #   Empty list → exam not found (or couldn't guess it confidently).
 # -------------------------------------------------------------
 def locations_for_exam(exam_query):
-    exams = best_exam_match(exam_query)
-    print("DEBUG – exams matched for locations_for_exam:", exams)
+    return locations_for_exam_resolved(best_exam_match(exam_query))
+
+
+@timed("handlers.locations_for_exam")
+def locations_for_exam_resolved(exams, snapshot=None):
+    note(f"exams matched for locations_for_exam: {exams}")
 
     if not exams:
         return []
@@ -87,11 +145,14 @@ def locations_for_exam(exam_query):
     # Choose the best exam match (first in the list)
     exam = exams[0]
 
-    # All rows that match any of the most likely exam name
-    matches = df[df["EAP Name"] == exam]
+    # Distinct site names for that exam, as a simple Python list
+    sites = _snapshot(snapshot).schedule_index.sites_for_exams([exam])
 
-    # Return distinct site names as a simple Python list
-    return matches["DEP Name"].drop_duplicates().tolist()
+    # Leave out sites where the exam is temporarily disabled
+    disabled = get_overrides().disabled_sites(exam)
+    if disabled:
+        sites = [site for site in sites if canonical(site) not in disabled]
+    return sites
 
 
 # -------------------------------------------------------------
@@ -117,11 +178,34 @@ def exams_at_site(site_query: str):
     Uses the fuzzy site matching function to allow
     flexible wording (e.g. '1176 fifth ave' → '1176 5TH AVE RAD CT').
     """
-    sites = best_site_match(site_query)
+    return exams_at_site_resolved(best_site_match(site_query))
+
+
+@timed("handlers.exams_at_site")
+def exams_at_site_resolved(sites, snapshot=None):
     if not sites:
         return []
-    subset = df[df["DEP Name"].isin(sites)]
-    return subset["EAP Name"].drop_duplicates().tolist()
+    index = _snapshot(snapshot).schedule_index
+    exams = index.exams_for_sites(sites)
+
+    # An exam disabled at a site still counts if another matched
+    # site offers it and isn't disabled
+    overrides = get_overrides()
+    disabled = {}
+    for site in sites:
+        for exam_key in overrides.disabled_exams(site):
+            disabled.setdefault(exam_key, set()).add(canonical(site))
+    if not disabled:
+        return exams
+    return [
+        exam for exam in exams
+        if canonical(exam) not in disabled
+        or any(
+            canonical(site) not in disabled[canonical(exam)]
+            and index.has_exam_at_site([exam], [site])
+            for site in sites
+        )
+    ]
 
 # -------------------------------------------------------------
 # Helper for intent 4: exam_duration
@@ -136,17 +220,16 @@ def exam_duration(exam_query: str):
 
     Uses fuzzy matching so partial or imprecise names still work.
     """
-    exams = best_exam_match(exam_query)
+    return exam_duration_resolved(best_exam_match(exam_query))
+
+
+@timed("handlers.exam_duration")
+def exam_duration_resolved(exams, snapshot=None):
     if not exams:
         return None
 
     # Get all unique durations (in case of duplicates)
-    durations = (
-        df[df["EAP Name"].isin(exams)]["Visit Type Length"]
-        .dropna()
-        .unique()
-        .tolist()
-    )
+    durations = _snapshot(snapshot).schedule_index.durations_for_exams(exams)
 
     if not durations:
         return None
@@ -173,25 +256,33 @@ def rooms_for_exam_at_site(exam_query: str, site_query: str):
     """
 
     # Step 1. Use fuzzy matching to identify the official exam name and site
-    exams = best_exam_match(exam_query)
-    sites = best_site_match(site_query)
+    return rooms_for_exam_at_site_resolved(best_exam_match(exam_query), best_site_match(site_query))
+
+
+@timed("handlers.rooms_for_exam_at_site")
+def rooms_for_exam_at_site_resolved(exams, sites, snapshot=None):
     if not exams or not sites:
         return []
 
+    snapshot = _snapshot(snapshot)
     site = sites[0]  # take the best-matched site
-    matched_prefixes = [p for p, dep in PREFIX_TO_DEP.items() if dep == site]
-
-    if not matched_prefixes:
+    if get_overrides().disabled(exams[0], site) is not None:
+        return []   # temporarily disabled there
+
+    # mapping.json maps room prefixes to buildings; the site is a
+    # department in that building
+    prefix_to_dep = snapshot.prefix_to_dep
+    buildings = _buildings([site], prefix_to_dep)
+    if not buildings:
         return []
 
     # Step 2. Get all room names associated with the given exam
-    subset = df[df["EAP Name"].isin(exams)]
-    all_rooms = subset["Room Name"].dropna().unique().tolist()
+    all_rooms = snapshot.schedule_index.rooms_for_exams(exams)
 
-    # Step 3. Filter those rooms whose prefix matches the site's prefix
+    # Step 3. Keep the rooms whose prefix belongs to that building
     rooms_at_site = [
         room for room in all_rooms
-        if any(room.startswith(prefix) for prefix in matched_prefixes)
+        if _room_department(room, prefix_to_dep) in buildings
     ]
 
     return sorted(rooms_at_site)
@@ -212,16 +303,31 @@ def rooms_for_exam(exam_query: str):
 
     How:
         - Fuzzy match the exam name
-        - Filter the dataframe to those exam(s)
-        - Collect and return the unique room names
+        - Look up the room(s) indexed for those exam(s)
+        - Return the unique room names, sorted
     """
-    exams = best_exam_match(exam_query)
-    if not exams:
-        return []
+    return rooms_for_exam_resolved(best_exam_match(exam_query))
 
-    subset = df[df["EAP Name"].isin(exams)]
 
-    # Drop duplicates, ignore missing values
-    rooms = subset["Room Name"].dropna().unique().tolist()
+@timed("handlers.rooms_for_exam")
+def rooms_for_exam_resolved(exams, snapshot=None):
+    if not exams:
+        return []
 
-    return sorted(rooms)
\ No newline at end of file
+    snapshot = _snapshot(snapshot)
+    rooms = snapshot.schedule_index.rooms_for_exams(exams)
+
+    # Drop the rooms of sites where the best match is disabled.
+    # mapping.json names the building ("1470 MADISON AVE"), the
+    # dataset the department ("1470 MADISON AVE RAD CT").
+    disabled = get_overrides().disabled_sites(exams[0])
+    if disabled:
+        prefix_to_dep = snapshot.prefix_to_dep
+        closed = _buildings(disabled, prefix_to_dep)
+        if closed:
+            rooms = [
+                room for room in rooms
+                if _room_department(room, prefix_to_dep) not in closed
+            ]
+
+    return sorted(rooms)
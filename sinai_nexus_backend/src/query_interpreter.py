@@ -3,19 +3,84 @@
 # -------------------------------------------------------------
 # Uses Gemini to interpret a user's natural-language scheduling
 # question and convert it into structured intent + fields.
+#
+# Parsed results are cached (LRU + TTL) under a normalized form
+# of the question, so repeated questions skip the Gemini call.
+# Set INTENT_CACHE_DB to a file path to keep the cache in SQLite
+# across restarts.
+#
+# interpret_scheduling_queries() parses a whole list of questions
+# (for /agent-chat/batch) with at most one Gemini call.
 # -------------------------------------------------------------
 
 from dotenv import load_dotenv
 import os
 
 import re, json
-import google.generativeai as genai
+
+from src.caching import LRUCache
+from src.concurrency import LIMITERS
+from src.telemetry import LLM_CALLS, span
 
 load_dotenv()
 google_api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=google_api_key)
+
+INTENT_CACHE = LRUCache(
+    maxsize=int(os.getenv("INTENT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("INTENT_CACHE_TTL", str(24 * 3600))),
+    persist_path=os.getenv("INTENT_CACHE_DB") or None,
+    name="intent_cache",
+)
+
+# A parse that found nothing usable
+_EMPTY = {"intent": None, "exam": None, "site": None}
+
+_genai = None
+
+
+def get_genai():
+    """
+    Import and configure the Gemini SDK on first use.
+
+    The SDK is slow to import, so it is kept out of app startup.
+    """
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=google_api_key)
+        _genai = genai
+    return _genai
+
+
+def normalize_question(user_question: str):
+    """
+    Cache key for a question: lower-case, punctuation dropped,
+    whitespace collapsed. "Where is MRI Brain done?" and
+    "where is mri brain done" share one entry.
+    """
+    s = user_question.lower()
+    s = re.sub(r"[^\w\s/]", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
 
 def interpret_scheduling_query(user_question: str):
+    """
+    Same as _interpret_with_gemini(), but answers repeated
+    questions from INTENT_CACHE. Only successful parses (with an
+    intent) are cached, so a bad Gemini reply is retried next time.
+    """
+    key = normalize_question(user_question)
+    cached = INTENT_CACHE.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    parsed = _interpret_with_gemini(user_question)
+    if parsed.get("intent"):
+        INTENT_CACHE.put(key, parsed)
+    return parsed
+
+
+def _interpret_with_gemini(user_question: str):
     """
     Purpose:
         Convert a natural language question (e.g. "Where is CT Head done?")
@@ -58,15 +123,104 @@ def interpret_scheduling_query(user_question: str):
     }}
     """
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
+    model = get_genai().GenerativeModel("gemini-2.5-flash")
+    gemini = LIMITERS["gemini"]
+    LLM_CALLS.inc(purpose="interpret")
+    with span("interpreter.gemini"):
+        response = gemini.call(
+            model.generate_content, prompt,
+            request_options={"timeout": gemini.call_timeout},
+        )
     text = response.text or ""
 
     # Extract JSON safely
     match = re.search(r'\{.*\}', text, re.S)
     if not match:
-        return {"intent": None, "exam": None, "site": None}
+        return dict(_EMPTY)
     try:
         return json.loads(match.group(0))
     except json.JSONDecodeError:
-        return {"intent": None, "exam": None, "site": None}
\ No newline at end of file
+        return dict(_EMPTY)
+
+
+def interpret_scheduling_queries(user_questions):
+    """
+    interpret_scheduling_query() for a list of questions: cached
+    ones come from INTENT_CACHE and all the others share ONE
+    Gemini call. Returns the parses in the same order.
+    """
+    keys = [normalize_question(q) for q in user_questions]
+    parsed = [None] * len(keys)
+    todo = {}   # normalized question → first phrasing seen
+    for i, key in enumerate(keys):
+        cached = INTENT_CACHE.get(key)
+        if cached is not None:
+            parsed[i] = dict(cached)
+        else:
+            todo.setdefault(key, user_questions[i])
+
+    if todo:
+        fresh = dict(zip(todo, _interpret_batch_with_gemini(list(todo.values()))))
+        for key, result in fresh.items():
+            if result.get("intent"):
+                INTENT_CACHE.put(key, result)
+        for i, key in enumerate(keys):
+            if parsed[i] is None:
+                parsed[i] = dict(fresh[key])
+    return parsed
+
+
+def _interpret_batch_with_gemini(user_questions):
+    """Like _interpret_with_gemini(), for many questions in one prompt."""
+    numbered = "\n".join(f'{i}. "{q}"' for i, q in enumerate(user_questions, start=1))
+    prompt = f"""
+    You are a medical scheduling assistant. The user asked these
+    {len(user_questions)} questions:
+
+{numbered}
+
+    For EACH question, identify the user's intent and extract:
+      - "exam" (the test/procedure name, if mentioned)
+      - "site" (the location/department, if mentioned)
+    Possible intents:
+      1. "exam_at_site"       → user asks if an exam is performed at a given site
+      2. "locations_for_exam" → user asks which sites perform a certain exam
+      3. "exams_at_site"      → user asks what exams are offered at a site
+      4. "exam_duration"      → user asks how long an exam or visit takes
+                                (based on 'Visit Type Length' in minutes)
+      5. "rooms_for_exam_at_site" → user asks which rooms at a specific site perform a specific exam
+      6. "rooms_for_exam" → when the user asks which rooms perform an exam, without specifying a site.
+
+    Respond *only* as a compact JSON array with one object per
+    question, in order, where "n" is the question's number:
+    [
+      {{"n": 1, "intent": "...", "exam": "...", "site": "..."}}
+    ]
+    """
+
+    model = get_genai().GenerativeModel("gemini-2.5-flash")
+    gemini = LIMITERS["gemini"]
+    LLM_CALLS.inc(purpose="interpret_batch")
+    with span("interpreter.gemini_batch"):
+        response = gemini.call(
+            model.generate_content, prompt,
+            request_options={"timeout": gemini.call_timeout},
+        )
+    text = response.text or ""
+
+    # Extract JSON safely; questions missing from the reply get no intent
+    results = [dict(_EMPTY) for _ in user_questions]
+    match = re.search(r'\[.*\]', text, re.S)
+    if not match:
+        return results
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return results
+    for position, item in enumerate(items if isinstance(items, list) else []):
+        if not isinstance(item, dict):
+            continue
+        n = item.get("n", position + 1)
+        if isinstance(n, int) and 1 <= n <= len(results):
+            results[n - 1] = {key: item.get(key) for key in ("intent", "exam", "site")}
+    return results
@@ -2,89 +2,198 @@
 # query_router.py
 # -------------------------------------------------------------
 # Purpose:
-#   Connects Gemini intent recognition with the correct
-#   query handler function.
+#   Connects intent recognition with the correct query handler
+#   function. Formulaic questions are recognized locally (see
+#   local_classifier.py); everything else goes to Gemini.
+#   Lookups go through answer_cache.py, keyed on the resolved
+#   exam/site names.
+#
+#   answer_scheduling_batch() answers many questions (or already
+#   structured intent/exam/site items) together: one Gemini call
+#   for the questions the local classifier can't parse, and one
+#   fuzzy-matching pass for all the exam and site names.
+#
+#   Each step is a telemetry span (router.classify,
+#   router.interpret, router.lookup), so a slow answer shows
+#   which one it was; the parse itself is a telemetry note.
 # -------------------------------------------------------------
 
-from src.query_interpreter import interpret_scheduling_query
-from src.query_handlers import (
-    exam_at_site,
-    locations_for_exam,
-    exams_at_site,
-    exam_duration,
-    rooms_for_exam_at_site,
-    rooms_for_exam
-)
+from src import local_classifier
+from src.local_classifier import classify_locally, LOCAL_INTENT_THRESHOLD
+from src.query_interpreter import interpret_scheduling_query, interpret_scheduling_queries
+from src.answer_cache import HANDLERS, lookup, lookup_many
+from src.telemetry import note, span
+
+# Bullets per streamed piece, so long room/site lists arrive in steps
+STREAM_LIST_BATCH = 25
+
+
+def _bulleted(header, items):
+    """Yield "header:\n• a\n• b..." in pieces: the header first, then batches of bullets."""
+    yield f"{header}:\n"
+    for start in range(0, len(items), STREAM_LIST_BATCH):
+        batch = "\n".join([f"• {item}" for item in items[start : start + STREAM_LIST_BATCH]])
+        yield batch if start == 0 else "\n" + batch
+
 
 def answer_scheduling_query(user_input: str):
+    """The whole answer as one string (see stream_scheduling_answer)."""
+    return "".join(stream_scheduling_answer(user_input))
+
+
+def _is_complete(intent, exam, site):
+    """True if the intent is known and has the exam/site it needs."""
+    if intent not in HANDLERS:
+        return False
+    _, uses_exam, uses_site = HANDLERS[intent]
+    return bool((exam or not uses_exam) and (site or not uses_site))
+
+
+def stream_scheduling_answer(user_input: str):
     """
     Purpose:
         Handle any scheduling-related user question by:
-          1. Sending it to Gemini for interpretation
+          1. Interpreting it — locally if the local classifier is
+             confident enough, otherwise with Gemini
           2. Routing it to the correct lookup function
-          3. Returning a clear, human-readable answer
+          3. Yielding a clear, human-readable answer in pieces
+             (header line first, then the list)
     """
-    parsed = interpret_scheduling_query(user_input)
+    with span("router.classify"):
+        parsed, confidence = classify_locally(user_input)
+    if parsed is not None and confidence >= LOCAL_INTENT_THRESHOLD:
+        source = "local"
+    else:
+        with span("router.interpret"):
+            parsed = interpret_scheduling_query(user_input)
+        source = "gemini"
+    local_classifier.record(source)
+
     intent = parsed.get("intent")
     exam = parsed.get("exam")
     site = parsed.get("site")
 
-    print("\n--- Gemini interpretation ---")
-    print(parsed)
-    print("------------------------------\n")
+    note(f"{source} interpretation: {parsed}")
+
+    if not _is_complete(intent, exam, site):
+        yield from render_answer(None, exam, site, None)
+        return
+    with span("router.lookup"):
+        result = lookup(intent, exam=exam, site=site)
+    yield from render_answer(intent, exam, site, result)
 
+
+def render_answer(intent, exam, site, result):
+    """Yield the answer text for a lookup result, in pieces."""
     # Intent 1: "Is [exam] done at [site]?"
-    if intent == "exam_at_site" and exam and site:
-        found = exam_at_site(exam, site)
-        return (
+    if intent == "exam_at_site":
+        yield (
             f"✅ Yes, {exam} is performed at {site}."
-            if found else f"❌ No, {exam} is not listed at {site}."
+            if result else f"❌ No, {exam} is not listed at {site}."
         )
 
     # Intent 2: "Which locations perform [exam]?"
-    elif intent == "locations_for_exam" and exam:
-        locs = locations_for_exam(exam)
-        if locs:
-            formatted = "\n".join([f"• {loc}" for loc in locs])
-            return f"{exam} is performed at:\n{formatted}"
+    elif intent == "locations_for_exam":
+        if result:
+            yield from _bulleted(f"{exam} is performed at", result)
         else:
-            return f"Sorry, I couldn’t find any locations for {exam}."
+            yield f"Sorry, I couldn’t find any locations for {exam}."
 
     # Intent 3: "What exams are offered at [site]?"
-    elif intent == "exams_at_site" and site:
-        exams = exams_at_site(site)
-        if exams:
-            formatted = "\n".join([f"• {e}" for e in exams])
-            return f"Exams offered at {site}:\n{formatted}"
+    elif intent == "exams_at_site":
+        if result:
+            yield from _bulleted(f"Exams offered at {site}", result)
         else:
-            return f"No exams found for {site}."
+            yield f"No exams found for {site}."
 
     # Intent 4: "How long does [exam] take?"
-    elif intent == "exam_duration" and exam:
-        length = exam_duration(exam)
-        return (
-            f"The visit length for {exam} is {length} minutes."
-            if length else f"Sorry, I couldn’t find a visit duration for {exam}."
+    elif intent == "exam_duration":
+        yield (
+            f"The visit length for {exam} is {result} minutes."
+            if result else f"Sorry, I couldn’t find a visit duration for {exam}."
         )
 
     # Intent 5: "Which rooms at [site] perform [exam]?"
-    elif intent == "rooms_for_exam_at_site" and exam and site:
-        rooms = rooms_for_exam_at_site(exam, site)
-        if rooms:
-            formatted = "\n".join([f"• {r}" for r in rooms])
-            return f"Rooms at {site} performing {exam}:\n{formatted}"
+    elif intent == "rooms_for_exam_at_site":
+        if result:
+            yield from _bulleted(f"Rooms at {site} performing {exam}", result)
         else:
-            return f"No matching rooms found for {exam} at {site}."
+            yield f"No matching rooms found for {exam} at {site}."
 
     # Intent 6: "Which rooms perform [exam]?"
-    elif intent == "rooms_for_exam" and exam:
-        rooms = rooms_for_exam(exam)
-        if rooms:
-            formatted = "\n".join([f"• {r}" for r in rooms])
-            return f"Rooms performing {exam}:\n{formatted}"
+    elif intent == "rooms_for_exam":
+        if result:
+            yield from _bulleted(f"Rooms performing {exam}", result)
         else:
-            return f"No matching rooms found for {exam}."
+            yield f"No matching rooms found for {exam}."
 
     # Fallback
     else:
-        return "Sorry, I couldn’t understand that scheduling question."
\ No newline at end of file
+        yield "Sorry, I couldn’t understand that scheduling question."
+
+
+def answer_scheduling_batch(items):
+    """
+    Answer many scheduling questions at once.
+
+    items: dicts with either "question" (natural language) or
+    "intent" plus "exam" / "site" (already structured; no LLM).
+    Returns one dict per item, in order, with the parsed intent,
+    exam and site, the matched official names, the raw lookup
+    result and the answer text.
+    """
+    parsed = [None] * len(items)
+    sources = [None] * len(items)
+
+    # 1. Structured items and locally recognized questions need no LLM
+    pending = []
+    with span("router.classify"):
+        for i, item in enumerate(items):
+            question = item.get("question")
+            if not question:
+                parsed[i] = {key: item.get(key) for key in ("intent", "exam", "site")}
+                sources[i] = "structured"
+                continue
+            local, confidence = classify_locally(question)
+            if local is not None and confidence >= LOCAL_INTENT_THRESHOLD:
+                parsed[i], sources[i] = local, "local"
+            else:
+                pending.append(i)
+
+    # 2. Everything else: one Gemini call (minus INTENT_CACHE hits)
+    if pending:
+        with span("router.interpret"):
+            interpreted = interpret_scheduling_queries([items[i]["question"] for i in pending])
+        for i, result in zip(pending, interpreted):
+            parsed[i], sources[i] = result, "gemini"
+    for source in sources:
+        if source != "structured":
+            local_classifier.record(source)
+
+    # 3. One fuzzy-matching pass and shared lookups for all items
+    complete = [
+        i for i, p in enumerate(parsed)
+        if _is_complete(p.get("intent"), p.get("exam"), p.get("site"))
+    ]
+    with span("router.lookup"):
+        looked_up = dict(zip(complete, lookup_many([
+            (parsed[i]["intent"], parsed[i].get("exam"), parsed[i].get("site")) for i in complete
+        ])))
+
+    answers = []
+    for i, p in enumerate(parsed):
+        intent, exam, site = p.get("intent"), p.get("exam"), p.get("site")
+        result, exams, sites = looked_up.get(i, (None, (), ()))
+        answers.append({
+            "question": items[i].get("question"),
+            "source": sources[i],
+            "intent": intent,
+            "exam": exam,
+            "site": site,
+            "matched_exam": exams[0] if exams else None,
+            "matched_site": sites[0] if sites else None,
+            "result": result,
+            "answer": "".join(render_answer(intent if i in looked_up else None, exam, site, result)),
+        })
+    note(f"batch: {len(items)} items, {len(pending)} parsed by Gemini / intent cache")
+    return answers
@@ -0,0 +1,75 @@
+# -------------------------------------------------------------
+# rag_cache.py
+# -------------------------------------------------------------
+# Purpose:
+#   Let repeat /rag-chat questions skip both the embedding call
+#   and the match_documents RPC.
+#
+#   Two bounded LRU caches:
+#     1. QUERY_EMBEDDINGS: normalized question → query embedding
+#     2. RETRIEVALS: (corpus version, embedding) → ranked context
+#        chunks
+#
+#   The corpus version is bumped by /upload and /delete_file
+#   whenever they change the `documents` table, which empties the
+#   retrieval cache. Embeddings don't depend on the corpus, so
+#   they are kept.
+#
+#   Both caches live in this process only. If several workers
+#   share one Supabase table, RAG_RESULT_CACHE_TTL bounds how long
+#   a worker can serve chunks from before another worker's upload.
+# -------------------------------------------------------------
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from src.caching import LRUCache
+from src.query_interpreter import normalize_question
+
+QUERY_EMBEDDINGS = LRUCache(
+    maxsize=int(os.getenv("RAG_EMBED_CACHE_SIZE", "1024")),
+    ttl=None,
+    name="rag_query_embeddings",
+)
+
+RETRIEVALS = LRUCache(
+    maxsize=int(os.getenv("RAG_RESULT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("RAG_RESULT_CACHE_TTL", "600")),
+    name="rag_retrievals",
+)
+
+_corpus_version = 0
+_version_lock = threading.Lock()
+
+
+def corpus_version():
+    return _corpus_version
+
+
+def bump_corpus_version():
+    """Call after any write to `documents`; drops every cached retrieval."""
+    global _corpus_version
+    with _version_lock:
+        _corpus_version += 1
+        RETRIEVALS.clear()
+
+
+def embedding_key(query):
+    return normalize_question(query)
+
+
+def retrieval_key(embedding, version=None):
+    """Key for an embedding under a corpus version (the current one by default)."""
+    digest = hashlib.sha1(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+    return f"{corpus_version() if version is None else version}:{digest}"
+
+
+def stats():
+    return {
+        "corpus_version": _corpus_version,
+        "query_embeddings": QUERY_EMBEDDINGS.stats(),
+        "retrievals": RETRIEVALS.stats(),
+    }
@@ -0,0 +1,495 @@
+# -------------------------------------------------------------
+# retrieval.py
+# -------------------------------------------------------------
+# Purpose:
+#   One interface for where document chunks live and how they
+#   are searched, so /upload, /delete_file and /rag-chat don't
+#   care which engine is behind it.
+#
+#   RETRIEVAL_BACKEND picks the store:
+#
+#   "supabase" (default) — the `documents` table; search is the
+#       match_documents RPC (one network round trip per query).
+#
+#   "local" — everything in-process, no network:
+#       • vectors: a float32 N×384 matrix in a memory-mapped file
+#         (VECTOR_INDEX_DIR/vectors.f32), L2-normalized on insert
+#       • rows: content / priority / file_path in a SQLite file
+#         next to it, each with the matrix slot of its vector;
+#         deletes are tombstones, and once more than
+#         VECTOR_INDEX_COMPACT_RATIO of the rows are dead, compact()
+#         rewrites the matrix without them (row ids stay the same)
+#       • search: exact brute force (one matrix-vector product —
+#         well under a millisecond for a few thousand chunks), or
+#         an HNSW graph (VECTOR_INDEX_ENGINE=hnsw, needs hnswlib)
+#         rebuilt from the matrix at startup and updated on every
+#         add/delete
+#       Distances are cosine distances (1 - cosine similarity),
+#       the same scale match_documents returns.
+#       The index records embedding_model_id() when it is created
+#       and refuses to open under a different embedding backend or
+#       ONNX file: vectors from two models don't share a space.
+#       Single writer: the in-memory slots and tombstones belong to
+#       one process, so VECTOR_INDEX_DIR is locked (LOCK file) by the
+#       process that opens it. Run one server process with the local
+#       backend, or give each process its own directory.
+#
+#   Every store returns rows as dicts with id, content, priority,
+#   file_path (and distance, for search results).
+# -------------------------------------------------------------
+
+import fcntl
+import os
+import sqlite3
+import threading
+from uuid import uuid4
+
+import numpy as np
+
+from src.concurrency import LIMITERS
+from src.data_loader import get_supabase
+from src.embeddings import EMBEDDING_DIM, embedding_model_id
+from src.telemetry import log
+
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "supabase")
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "data/vector_index")
+VECTOR_INDEX_ENGINE = os.getenv("VECTOR_INDEX_ENGINE", "brute")
+VECTOR_INDEX_COMPACT_RATIO = float(os.getenv("VECTOR_INDEX_COMPACT_RATIO", "0.25"))
+COMPACT_MIN_DEAD = 256   # don't rewrite the matrix for a handful of deletes
+
+SELECT_PAGE = 1000   # Supabase's default max rows per select
+DELETE_BATCH = 500
+
+
+# ============================================================
+# Supabase
+# ============================================================
+class SupabaseStore:
+    """The `documents` table + match_documents RPC."""
+
+    name = "supabase"
+
+    def search(self, embedding, k, min_priority=None, max_priority=None):
+        """
+        Nearest chunks. A priority filter runs inside Postgres via the
+        match_documents_by_priority RPC (see README for its SQL).
+        """
+        if min_priority is None and max_priority is None:
+            rpc, params = "match_documents", {
+                "query_embedding": embedding,
+                "match_count": k
+            }
+        else:
+            rpc, params = "match_documents_by_priority", {
+                "query_embedding": embedding,
+                "match_count": k,
+                "min_priority": min_priority,
+                "max_priority": max_priority,
+            }
+        result = LIMITERS["supabase"].call(
+            lambda: get_supabase().rpc(rpc, params).execute()
+        )
+        return result.data or []
+
+    def rows_for_path(self, path):
+        """Stored rows (id, content, priority) for one file_path."""
+        start = 0
+        while True:
+            result = LIMITERS["supabase"].call(
+                lambda: get_supabase().table("documents")
+                .select("id, content, priority")
+                .eq("file_path", path)
+                .order("id")
+                .range(start, start + SELECT_PAGE - 1)
+                .execute()
+            )
+            rows = result.data or []
+            yield from rows
+            if len(rows) < SELECT_PAGE:
+                return
+            start += SELECT_PAGE
+
+    def insert(self, rows):
+        LIMITERS["supabase"].call(
+            lambda: get_supabase().table("documents").insert(rows).execute()
+        )
+
+    def delete_ids(self, ids):
+        for i in range(0, len(ids), DELETE_BATCH):
+            batch = ids[i : i + DELETE_BATCH]
+            LIMITERS["supabase"].call(
+                lambda: get_supabase().table("documents")
+                .delete()
+                .in_("id", batch)
+                .execute()
+            )
+
+    def delete_path(self, path):
+        """Delete every row for file_path; returns the deleted rows."""
+        response = LIMITERS["supabase"].call(
+            lambda: get_supabase().table("documents")
+            .delete()
+            .eq("file_path", path)
+            .execute()
+        )
+        return response.data or []
+
+
+# ============================================================
+# Local: memory-mapped matrix + SQLite rows
+# ============================================================
+class LocalVectorStore:
+    """In-process vector store: matrix slot per row, stable SQLite ids."""
+
+    name = "local"
+
+    def __init__(self, directory=VECTOR_INDEX_DIR, engine=VECTOR_INDEX_ENGINE,
+                 dim=EMBEDDING_DIM, compact_ratio=VECTOR_INDEX_COMPACT_RATIO,
+                 model_id=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dim = dim
+        self.engine = engine
+        self.compact_ratio = compact_ratio
+        self.model_id = model_id or embedding_model_id()
+        self.db_path = os.path.join(directory, "rows.sqlite")
+        self._lock = threading.RLock()
+        self._hold_writer_lock()
+        self._init_db()
+        try:
+            self._check_model()
+        except RuntimeError:
+            self._lock_file.close()
+            raise
+
+        with self._connect() as conn:
+            self.vectors_path = os.path.join(directory, self._meta(conn, "vectors_file"))
+            rows = conn.execute(
+                "SELECT slot, id, priority, deleted FROM chunks ORDER BY slot"
+            ).fetchall()
+        self._load_rows(rows)
+
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, "wb").close()
+        self._open_matrix(max(self.size, 1024))
+        self._remove_stale_vector_files()
+
+        self._hnsw = None
+        if engine == "hnsw":
+            self._build_hnsw()
+        elif engine != "brute":
+            raise RuntimeError(f"Unknown VECTOR_INDEX_ENGINE={engine!r}; use brute or hnsw")
+        log.info("Local vector store: %d chunks (%s)", int(self.live.sum()), engine)
+        self._maybe_compact()
+
+    # ---------------------------------------------------------
+    # Storage
+    # ---------------------------------------------------------
+    def _hold_writer_lock(self):
+        """One process per index: ids, slots and tombstones live in this process."""
+        self._lock_file = open(os.path.join(self.directory, "LOCK"), "a+")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.seek(0)
+            holder = self._lock_file.read().strip() or "?"
+            self._lock_file.close()
+            raise RuntimeError(
+                f"{self.directory} is already open in another process (pid {holder}); "
+                "the local vector store allows one server process per VECTOR_INDEX_DIR"
+            )
+        self._lock_file.truncate(0)
+        self._lock_file.write(str(os.getpid()))
+        self._lock_file.flush()
+
+    def close(self):
+        """Flush the vectors and let another process open the index."""
+        with self._lock:
+            self.matrix.flush()
+            self._lock_file.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " id INTEGER PRIMARY KEY, content TEXT NOT NULL,"
+                " priority INTEGER NOT NULL, file_path TEXT NOT NULL,"
+                " deleted INTEGER NOT NULL DEFAULT 0, slot INTEGER)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+            if "slot" not in columns:
+                # Before compaction existed, a row's id was its matrix slot
+                conn.execute("ALTER TABLE chunks ADD COLUMN slot INTEGER")
+                conn.execute("UPDATE chunks SET slot = id")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS chunks_file_path ON chunks (file_path)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS store_meta ("
+                " name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO store_meta (name, value) VALUES ('vectors_file', 'vectors.f32')"
+            )
+
+    def _check_model(self):
+        """Refuse vectors from another embedding model; an empty index adopts ours."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM store_meta WHERE name = 'embedding_model'"
+            ).fetchone()
+            if row is not None and row[0] != self.model_id:
+                if conn.execute("SELECT 1 FROM chunks WHERE deleted = 0 LIMIT 1").fetchone():
+                    raise RuntimeError(
+                        f"{self.directory} holds vectors from {row[0]}, but the configured "
+                        f"embedding backend is {self.model_id}; point VECTOR_INDEX_DIR at a "
+                        "new directory and re-upload, or switch EMBEDDING_BACKEND back"
+                    )
+            # Indexes from before this check was added are assumed to match
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (name, value) VALUES ('embedding_model', ?)",
+                (self.model_id,),
+            )
+
+    def _meta(self, conn, name):
+        return conn.execute("SELECT value FROM store_meta WHERE name = ?", (name,)).fetchone()[0]
+
+    def _load_rows(self, rows):
+        """In-memory per-slot arrays from (slot, id, priority, deleted) rows."""
+        self.size = len(rows)
+        self.ids = np.array([r[1] for r in rows], dtype=np.int64)
+        self.priorities = np.array([r[2] for r in rows], dtype=np.int16)
+        self.live = np.array([not r[3] for r in rows], dtype=bool)
+        self._slots = {int(row_id): slot for slot, row_id in enumerate(self.ids)}
+
+    def _open_matrix(self, capacity):
+        """(Re)map the vectors file with room for capacity rows."""
+        needed = capacity * self.dim * 4
+        if os.path.getsize(self.vectors_path) < needed:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(needed)
+        self.capacity = capacity
+        self.matrix = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def _remove_stale_vector_files(self):
+        """Vector files a crashed compaction left behind."""
+        current = os.path.basename(self.vectors_path)
+        for name in os.listdir(self.directory):
+            if name.startswith("vectors") and name.endswith(".f32") and name != current:
+                os.remove(os.path.join(self.directory, name))
+
+    def _build_hnsw(self):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise RuntimeError("VECTOR_INDEX_ENGINE=hnsw needs `pip install hnswlib`") from e
+        index = hnswlib.Index(space="cosine", dim=self.dim)
+        index.init_index(max_elements=self.capacity, ef_construction=200, M=16)
+        live_slots = np.flatnonzero(self.live)
+        if len(live_slots):
+            index.add_items(self.matrix[live_slots], live_slots)
+        index.set_ef(64)
+        self._hnsw = index
+
+    # ---------------------------------------------------------
+    # Compaction
+    # ---------------------------------------------------------
+    def _maybe_compact(self):
+        dead = self.size - int(self.live.sum())
+        if dead >= COMPACT_MIN_DEAD and dead > self.compact_ratio * self.size:
+            self.compact()
+
+    def compact(self):
+        """
+        Drop tombstoned rows: live vectors are copied, in order, into
+        a new file and the rows renumbered to match. The SQLite commit
+        that points store_meta at the new file is the switch-over, so
+        a crash on either side of it leaves a consistent index. Row
+        ids don't change; only matrix slots do.
+        """
+        with self._lock:
+            live_slots = np.flatnonzero(self.live)
+            dropped = self.size - len(live_slots)
+            if not dropped:
+                return 0
+
+            old_path = self.vectors_path
+            new_name = f"vectors-{uuid4().hex[:8]}.f32"
+            new_path = os.path.join(self.directory, new_name)
+            capacity = max(len(live_slots), 1024)
+            with open(new_path, "wb") as f:
+                f.truncate(capacity * self.dim * 4)
+            new_matrix = np.memmap(
+                new_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+            )
+            new_matrix[: len(live_slots)] = self.matrix[live_slots]
+            new_matrix.flush()
+            del new_matrix
+
+            with self._connect() as conn:
+                conn.execute("DELETE FROM chunks WHERE deleted = 1")
+                conn.executemany(
+                    "UPDATE chunks SET slot = ? WHERE id = ?",
+                    [(slot, int(row_id)) for slot, row_id in enumerate(self.ids[live_slots])],
+                )
+                conn.execute(
+                    "UPDATE store_meta SET value = ? WHERE name = 'vectors_file'", (new_name,)
+                )
+                rows = conn.execute(
+                    "SELECT slot, id, priority, deleted FROM chunks ORDER BY slot"
+                ).fetchall()
+
+            self.vectors_path = new_path
+            self._load_rows(rows)
+            self._open_matrix(capacity)
+            if self._hnsw is not None:
+                self._build_hnsw()
+            os.remove(old_path)
+        log.info("Local vector store: compacted %d deleted chunks, %d remain", dropped, len(live_slots))
+        return dropped
+
+    # ---------------------------------------------------------
+    # Store interface
+    # ---------------------------------------------------------
+    def search(self, embedding, k, min_priority=None, max_priority=None):
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+
+        with self._lock:
+            allowed = self.live.copy()
+            if min_priority is not None:
+                allowed &= self.priorities >= min_priority
+            if max_priority is not None:
+                allowed &= self.priorities <= max_priority
+            k = min(k, int(allowed.sum()))
+            if k == 0:
+                return []
+            if self._hnsw is not None:
+                labels, distances = self._hnsw.knn_query(
+                    query, k=k, filter=lambda label: bool(allowed[label])
+                )
+                slots, dists = labels[0], distances[0]
+            else:
+                candidates = np.flatnonzero(allowed)
+                similarity = self.matrix[candidates] @ query
+                top = np.argpartition(-similarity, k - 1)[:k]
+                top = top[np.argsort(-similarity[top], kind="stable")]
+                slots, dists = candidates[top], 1.0 - similarity[top]
+            vectors = np.array(self.matrix[slots])
+            ids = self.ids[slots]
+
+        rows = self._rows(ids.tolist())
+        for row, dist, vector in zip(rows, dists.tolist(), vectors):
+            row["distance"] = dist
+            row["embedding"] = vector   # lets the retrieval policy run MMR
+        return rows
+
+    def _rows(self, ids):
+        if not ids:
+            return []
+        with self._connect() as conn:
+            found = {
+                r[0]: {"id": r[0], "content": r[1], "priority": r[2], "file_path": r[3]}
+                for r in conn.execute(
+                    "SELECT id, content, priority, file_path FROM chunks"
+                    f" WHERE id IN ({', '.join('?' * len(ids))})",
+                    ids,
+                )
+            }
+        return [found[i] for i in ids]
+
+    def rows_for_path(self, path):
+        with self._connect() as conn:
+            for r in conn.execute(
+                "SELECT id, content, priority FROM chunks"
+                " WHERE file_path = ? AND deleted = 0 ORDER BY id",
+                (path,),
+            ):
+                yield {"id": r[0], "content": r[1], "priority": r[2]}
+
+    def insert(self, rows):
+        if not rows:
+            return
+        vectors = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+        with self._lock:
+            start = self.size
+            slots = np.arange(start, start + len(rows))
+            if start + len(rows) > self.capacity:
+                capacity = max(self.capacity * 2, start + len(rows))
+                self.matrix.flush()
+                self._open_matrix(capacity)
+                if self._hnsw is not None:
+                    self._hnsw.resize_index(capacity)
+
+            self.matrix[slots] = vectors
+            self.matrix.flush()
+            with self._connect() as conn:
+                ids = [
+                    conn.execute(
+                        "INSERT INTO chunks (content, priority, file_path, slot) VALUES (?, ?, ?, ?)",
+                        (row["content"], row["priority"], row["file_path"], int(slot)),
+                    ).lastrowid
+                    for slot, row in zip(slots, rows)
+                ]
+            self.ids = np.concatenate([self.ids, np.array(ids, dtype=np.int64)])
+            self.priorities = np.concatenate(
+                [self.priorities, np.array([row["priority"] for row in rows], dtype=np.int16)]
+            )
+            self.live = np.concatenate([self.live, np.ones(len(rows), dtype=bool)])
+            self._slots.update((row_id, int(slot)) for row_id, slot in zip(ids, slots))
+            self.size += len(rows)
+            if self._hnsw is not None:
+                self._hnsw.add_items(vectors, slots)
+
+    def delete_ids(self, ids):
+        with self._lock:
+            ids = [int(i) for i in ids if int(i) in self._slots]
+            if not ids:
+                return
+            with self._connect() as conn:
+                conn.executemany("UPDATE chunks SET deleted = 1 WHERE id = ?", [(i,) for i in ids])
+            for i in ids:
+                slot = self._slots[i]
+                if self.live[slot] and self._hnsw is not None:
+                    self._hnsw.mark_deleted(slot)
+                self.live[slot] = False
+            self._maybe_compact()
+
+    def delete_path(self, path):
+        rows = list(self.rows_for_path(path))
+        self.delete_ids([row["id"] for row in rows])
+        return rows
+
+
+# ============================================================
+# Backend selection
+# ============================================================
+STORES = {
+    "supabase": SupabaseStore,
+    "local": LocalVectorStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store():
+    """Build the configured store on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if RETRIEVAL_BACKEND not in STORES:
+                    raise RuntimeError(
+                        f"Unknown RETRIEVAL_BACKEND={RETRIEVAL_BACKEND!r}; "
+                        f"choose one of {sorted(STORES)}"
+                    )
+                _store = STORES[RETRIEVAL_BACKEND]()
+    return _store
@@ -0,0 +1,204 @@
+# -------------------------------------------------------------
+# retrieval_policy.py
+# -------------------------------------------------------------
+# Purpose:
+#   Decide which retrieved chunks become /rag-chat's context.
+#
+#   1. Candidates come from the document store: either one search
+#      for RAG_CANDIDATES chunks, or (RAG_TARGETED_SEARCH=1) two
+#      searches filtered by priority — notes (priority 1) and docs
+#      (priority > 1) — each fetching only a few per quota slot.
+#   2. Every candidate is scored in one numpy pass:
+#         score = distance * (1 + (priority - 1) * RAG_PRIORITY_WEIGHT)
+#      (lower is better; priority-1 notes get no penalty).
+#   3. Notes and docs are picked separately, up to RAG_NOTES_QUOTA
+#      and RAG_DOCS_QUOTA, best score first. With RAG_MMR_LAMBDA
+#      below 1, each pick also avoids chunks too similar to the
+#      ones already picked (maximal marginal relevance).
+#   4. With RAG_CONTEXT_TOKENS set, chunks are added (notes first)
+#      only while the context stays within that many tokens.
+#
+#   The defaults reproduce the original behaviour exactly: one
+#   search of 20, weight 0.5, 3 notes + 4 docs, no MMR, no budget.
+#
+#   Each decision is summarized as a telemetry note (debug log and
+#   slow-request report); set RAG_POLICY_LOG to a file path to
+#   also append the full ranking as JSON lines.
+# -------------------------------------------------------------
+
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from src.chunkers import count_tokens
+from src.telemetry import note, span
+
+_WORD = re.compile(r"\w+")
+
+
+class RetrievalPolicy:
+    """Candidate fetching, scoring and selection for RAG context."""
+
+    def __init__(self, candidates=20, notes_quota=3, docs_quota=4,
+                 priority_weight=0.5, mmr_lambda=1.0, context_tokens=0,
+                 targeted_search=False, fetch_factor=2, log_path=None):
+        self.candidates = candidates
+        self.notes_quota = notes_quota
+        self.docs_quota = docs_quota
+        self.priority_weight = priority_weight
+        self.mmr_lambda = mmr_lambda
+        self.context_tokens = context_tokens
+        self.targeted_search = targeted_search
+        self.fetch_factor = fetch_factor
+        self.log_path = log_path
+        self._log_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            candidates=int(os.getenv("RAG_CANDIDATES", "20")),
+            notes_quota=int(os.getenv("RAG_NOTES_QUOTA", "3")),
+            docs_quota=int(os.getenv("RAG_DOCS_QUOTA", "4")),
+            priority_weight=float(os.getenv("RAG_PRIORITY_WEIGHT", "0.5")),
+            mmr_lambda=float(os.getenv("RAG_MMR_LAMBDA", "1.0")),
+            context_tokens=int(os.getenv("RAG_CONTEXT_TOKENS", "0")),
+            targeted_search=os.getenv("RAG_TARGETED_SEARCH", "0") == "1",
+            fetch_factor=int(os.getenv("RAG_FETCH_FACTOR", "2")),
+            log_path=os.getenv("RAG_POLICY_LOG") or None,
+        )
+
+    # ---------------------------------------------------------
+    # Candidates
+    # ---------------------------------------------------------
+    def fetch(self, store, embedding):
+        """Candidate rows from the store (blocking)."""
+        if not self.targeted_search:
+            return store.search(embedding, self.candidates)
+        # Two small filtered searches instead of one over-fetch
+        notes = store.search(
+            embedding, self.notes_quota * self.fetch_factor,
+            min_priority=1, max_priority=1,
+        ) if self.notes_quota else []
+        docs = store.search(
+            embedding, self.docs_quota * self.fetch_factor, min_priority=2,
+        ) if self.docs_quota else []
+        return notes + docs
+
+    # ---------------------------------------------------------
+    # Ranking
+    # ---------------------------------------------------------
+    def score(self, rows):
+        """Priority-weighted distances for all rows at once (lower is better)."""
+        distance = np.array([row.get("distance", 1.0) for row in rows], dtype=np.float64)
+        priority = np.array([row.get("priority", 3) for row in rows], dtype=np.float64)
+        return distance * (1.0 + (priority - 1) * self.priority_weight), priority
+
+    def _similarity(self, rows):
+        """Pairwise similarity: cosine of embeddings when rows carry them, else word overlap."""
+        if rows and all(row.get("embedding") is not None for row in rows):
+            vectors = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+            return vectors @ vectors.T
+        words = [set(_WORD.findall(row["content"].lower())) for row in rows]
+        sim = np.zeros((len(rows), len(rows)))
+        for i in range(len(rows)):
+            for j in range(i + 1, len(rows)):
+                union = len(words[i] | words[j])
+                sim[i, j] = sim[j, i] = len(words[i] & words[j]) / union if union else 0.0
+        return sim
+
+    def _pick(self, positions, scores, quota, similarity):
+        """Up to quota positions, best score first (MMR-adjusted if enabled)."""
+        order = positions[np.argsort(scores[positions], kind="stable")]
+        if self.mmr_lambda >= 1.0 or len(order) <= 1:
+            return order[:quota].tolist()
+
+        relevance = -scores
+        picked = []
+        remaining = list(order)
+        while remaining and len(picked) < quota:
+            candidates = np.array(remaining)
+            redundancy = (
+                similarity[np.ix_(candidates, picked)].max(axis=1)
+                if picked else np.zeros(len(candidates))
+            )
+            mmr = self.mmr_lambda * relevance[candidates] - (1 - self.mmr_lambda) * redundancy
+            best = int(candidates[int(np.argmax(mmr))])
+            picked.append(best)
+            remaining.remove(best)
+        return picked
+
+    def select(self, rows, query=None):
+        """Chosen rows, notes first, in ranked order."""
+        if not rows:
+            self._log(query, rows, None, [], 0)
+            return []
+
+        scores, priority = self.score(rows)
+        similarity = self._similarity(rows) if self.mmr_lambda < 1.0 else None
+
+        notes = self._pick(np.flatnonzero(priority == 1), scores, self.notes_quota, similarity)
+        docs = self._pick(np.flatnonzero(priority > 1), scores, self.docs_quota, similarity)
+        chosen = notes + docs
+
+        dropped = 0
+        if self.context_tokens > 0:
+            kept, used = [], 0
+            for i in chosen:
+                tokens = count_tokens(rows[i]["content"])
+                if kept and used + tokens > self.context_tokens:
+                    dropped += 1
+                    continue
+                kept.append(i)
+                used += tokens
+            chosen = kept
+
+        self._log(query, rows, scores, chosen, dropped)
+        return [rows[i] for i in chosen]
+
+    def retrieve(self, store, embedding, query=None):
+        """fetch + select → ordered context chunk texts (blocking)."""
+        with span(f"rag.search.{store.name}"):
+            rows = self.fetch(store, embedding)
+        with span("rag.select"):
+            return [row["content"] for row in self.select(rows, query)]
+
+    # ---------------------------------------------------------
+    # Logging
+    # ---------------------------------------------------------
+    def _log(self, query, rows, scores, chosen, dropped):
+        notes = sum(1 for i in chosen if rows[i].get("priority", 3) == 1)
+        tokens = sum(count_tokens(rows[i]["content"]) for i in chosen)
+        note(
+            f"rag policy: {notes} notes + {len(chosen) - notes} docs "
+            f"from {len(rows)} candidates, {tokens} tokens"
+            + (f", {dropped} dropped for budget" if dropped else "")
+        )
+        if not self.log_path:
+            return
+        entry = {
+            "ts": time.time(),
+            "query": query,
+            "candidates": [
+                {
+                    "id": row.get("id"),
+                    "priority": row.get("priority"),
+                    "distance": row.get("distance"),
+                    "score": float(scores[i]),
+                    "chosen_rank": chosen.index(i) if i in chosen else None,
+                }
+                for i, row in enumerate(rows)
+            ],
+            "dropped_for_budget": dropped,
+            "context_tokens": tokens,
+        }
+        with self._log_lock:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+POLICY = RetrievalPolicy.from_env()
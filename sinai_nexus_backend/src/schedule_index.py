@@ -0,0 +1,193 @@
+# -------------------------------------------------------------
+# schedule_index.py
+# -------------------------------------------------------------
+# Purpose:
+#   Precompute the exam / site / room relationships of the
+#   normalized scheduling tables (see schedule_tables.py) ONCE,
+#   so the query handlers can answer with dictionary lookups
+#   instead of joining or scanning tables per question.
+#
+# How:
+#   - Every exam, site, room and duration gets an integer code
+#     (pd.factorize, in order of first appearance).
+#   - For each (exam, site), (exam, room) and (exam, duration)
+#     pair we keep the link row where it FIRST appears. Link rows
+#     are in export order, so sorting by that row reproduces the
+#     order drop_duplicates()/unique() used to return on the old
+#     exploded table.
+#   - Adjacency maps: exam → sites, site → exams, exam → rooms,
+#     exam → durations.
+#
+#   data_loader builds this next to the MatchIndex whenever the
+#   dataset is (re)loaded.
+# -------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+_EMPTY = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+
+def _first_pairs(keys, values):
+    """Return (keys, values, first_row) for each distinct pair, skipping NaN codes."""
+    pairs = pd.DataFrame({"k": keys, "v": values})
+    pairs = pairs[(pairs["k"] >= 0) & (pairs["v"] >= 0)].drop_duplicates()
+    return (
+        pairs["k"].to_numpy(dtype=np.int64),
+        pairs["v"].to_numpy(dtype=np.int64),
+        pairs.index.to_numpy(dtype=np.int64),
+    )
+
+
+def _link_codes(links, dimension, id_col, name_col, procedure_pos):
+    """
+    Resolve a link table into (procedure positions, dimension codes,
+    dimension names), with codes numbered by first appearance.
+    """
+    names_by_id = dimension.set_index(id_col)[name_col]
+    codes, ids = pd.factorize(links[id_col])
+    names = names_by_id.reindex(ids).tolist()
+    return procedure_pos.get_indexer(links["procedure_id"]), codes, names
+
+
+def _adjacency(keys, values, rows):
+    """Group pairs into {key: (values, first_rows)}, each sorted by first row."""
+    if len(keys) == 0:
+        return {}
+    order = np.lexsort((rows, keys))
+    keys, values, rows = keys[order], values[order], rows[order]
+    bounds = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.r_[0, bounds]
+    ends = np.r_[bounds, len(keys)]
+    return {
+        int(keys[a]): (values[a:b], rows[a:b])
+        for a, b in zip(starts, ends)
+    }
+
+
+def _ordered_union(groups):
+    """
+    Merge several (values, first_rows) groups into one list of value
+    codes, de-duplicated and ordered by earliest first row.
+    """
+    if len(groups) == 1:
+        return groups[0][0].tolist()
+    first = {}
+    for values, rows in groups:
+        for v, r in zip(values.tolist(), rows.tolist()):
+            if v not in first or r < first[v]:
+                first[v] = r
+    return sorted(first, key=first.get)
+
+
+class ScheduleIndex:
+    """Integer-coded lookup tables for the scheduling handlers."""
+
+    def __init__(self, exam_names, site_names, room_names, duration_values,
+                 exam_sites, site_exams, exam_rooms, exam_durations):
+        self.exam_names = exam_names
+        self.site_names = site_names
+        self.room_names = room_names
+        self.duration_values = duration_values
+
+        self.exam_codes = {name: i for i, name in enumerate(exam_names)}
+        self.site_codes = {name: i for i, name in enumerate(site_names)}
+
+        self.exam_sites = exam_sites          # exam → (site codes, rows)
+        self.site_exams = site_exams          # site → (exam codes, rows)
+        self.exam_rooms = exam_rooms          # exam → (room codes, rows)
+        self.exam_durations = exam_durations  # exam → (duration codes, rows)
+
+        self.exam_site_set = {
+            (e, s)
+            for e, (sites, _) in exam_sites.items()
+            for s in sites.tolist()
+        }
+
+    # ---------------------------------------------------------
+    # Helpers
+    # ---------------------------------------------------------
+    def _codes(self, names, lookup):
+        return [lookup[n] for n in names if n in lookup]
+
+    def _groups(self, codes, adjacency):
+        return [adjacency.get(c, _EMPTY) for c in codes]
+
+    # ---------------------------------------------------------
+    # Lookups used by query_handlers
+    # ---------------------------------------------------------
+    def has_exam_at_site(self, exams, sites):
+        """True if any of the exams is listed at any of the sites."""
+        exam_codes = self._codes(exams, self.exam_codes)
+        site_codes = self._codes(sites, self.site_codes)
+        return any(
+            (e, s) in self.exam_site_set
+            for e in exam_codes for s in site_codes
+        )
+
+    def sites_for_exams(self, exams):
+        """Distinct sites for the exams, in dataset order."""
+        codes = self._codes(exams, self.exam_codes)
+        if not codes:
+            return []
+        merged = _ordered_union(self._groups(codes, self.exam_sites))
+        return [self.site_names[s] for s in merged]
+
+    def exams_for_sites(self, sites):
+        """Distinct exams offered at the sites, in dataset order."""
+        codes = self._codes(sites, self.site_codes)
+        if not codes:
+            return []
+        merged = _ordered_union(self._groups(codes, self.site_exams))
+        return [self.exam_names[e] for e in merged]
+
+    def durations_for_exams(self, exams):
+        """Distinct visit lengths for the exams, in dataset order."""
+        codes = self._codes(exams, self.exam_codes)
+        if not codes:
+            return []
+        merged = _ordered_union(self._groups(codes, self.exam_durations))
+        return [self.duration_values[d] for d in merged]
+
+    def rooms_for_exams(self, exams):
+        """Distinct rooms that perform any of the exams (unordered)."""
+        codes = self._codes(exams, self.exam_codes)
+        rooms = set()
+        for rooms_codes, _ in self._groups(codes, self.exam_rooms):
+            rooms.update(rooms_codes.tolist())
+        return [self.room_names[r] for r in rooms]
+
+
+def build_schedule_index(tables):
+    """Build a ScheduleIndex from the normalized scheduling tables."""
+    procedures = tables["procedures"]
+    procedure_pos = pd.Index(procedures["procedure_id"])
+
+    # Per procedure: exam code and duration code
+    exam_codes, exam_names = pd.factorize(procedures["EAP Name"])
+    duration_codes, duration_values = pd.factorize(
+        procedures["Visit Type Length"].astype(object)
+    )
+
+    # Per link row: procedure position and site / room code
+    dep_pos, site_codes, site_names = _link_codes(
+        tables["procedure_departments"], tables["departments"],
+        "department_id", "DEP Name", procedure_pos,
+    )
+    res_pos, room_codes, room_names = _link_codes(
+        tables["procedure_resources"], tables["resources"],
+        "resource_id", "Room Name", procedure_pos,
+    )
+
+    exams, sites, rows = _first_pairs(exam_codes[dep_pos], site_codes)
+
+    return ScheduleIndex(
+        exam_names=exam_names.tolist(),
+        site_names=site_names,
+        room_names=room_names,
+        duration_values=duration_values.tolist(),
+        exam_sites=_adjacency(exams, sites, rows),
+        site_exams=_adjacency(sites, exams, rows),
+        exam_rooms=_adjacency(*_first_pairs(exam_codes[res_pos], room_codes)),
+        exam_durations=_adjacency(*_first_pairs(exam_codes, duration_codes)),
+    )
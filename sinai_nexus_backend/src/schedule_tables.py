@@ -0,0 +1,214 @@
+# -------------------------------------------------------------
+# schedule_tables.py
+# -------------------------------------------------------------
+# Purpose:
+#   Define the normalized scheduling schema that exams_cleanup.py
+#   publishes and data_loader.py reads.
+#
+#   Instead of one exploded table with a row for every
+#   exam × site × room combination, the export is stored as:
+#
+#     procedures             procedure_id | EAP Name | Visit Type Name | Visit Type Length
+#     departments            department_id | DEP Name
+#     resources              resource_id | Room Name
+#     procedure_departments  procedure_id | department_id
+#     procedure_resources    procedure_id | resource_id
+#
+#   The two link tables only hold the pairs that are really in
+#   the Epic export, in the order the export lists them. Ids are
+#   dense and assigned in order of first appearance, so the
+#   indexes built from these tables return answers in the same
+#   order as the old exploded table did.
+#
+#   Next to the tables the ETL publishes manifest.json with a
+#   content hash per table and an overall "version", which the
+#   backend uses to decide whether its local copy is current.
+# -------------------------------------------------------------
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from io import BytesIO
+
+import pandas as pd
+
+TABLE_NAMES = [
+    "procedures",
+    "departments",
+    "resources",
+    "procedure_departments",
+    "procedure_resources",
+]
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _encode(names, id_col, name_col):
+    """Give each distinct name a dense id, in order of first appearance."""
+    codes, uniques = pd.factorize(names)
+    table = pd.DataFrame({
+        id_col: pd.RangeIndex(len(uniques)).astype("int32"),
+        name_col: uniques,
+    })
+    return codes.astype("int32"), table
+
+
+def _links(procedure_ids, names, id_col, name_col):
+    """Build a dimension table plus the (procedure, dimension) link table."""
+    keep = names.notna() & (names != "") & (names != "nan")
+    procedure_ids = procedure_ids[keep.to_numpy()]
+    codes, table = _encode(names[keep], id_col, name_col)
+    links = pd.DataFrame({
+        "procedure_id": procedure_ids.astype("int32"),
+        id_col: codes,
+    }).drop_duplicates(ignore_index=True)
+    return table, links
+
+
+def normalize_export(df):
+    """
+    Build the normalized tables from the renamed Epic export, where
+    "DEP Name" and "Room Name" are LISTS (one entry per department
+    or room listed in the cell).
+    """
+    df = df.reset_index(drop=True)
+    procedures = pd.DataFrame({
+        "procedure_id": pd.RangeIndex(len(df)).astype("int32"),
+        "EAP Name": df["EAP Name"],
+        "Visit Type Name": df["Visit Type Name"].astype("category"),
+        "Visit Type Length": df["Visit Type Length"].astype("category"),
+    })
+
+    deps = df["DEP Name"].explode()
+    rooms = df["Room Name"].explode()
+
+    departments, procedure_departments = _links(
+        deps.index.to_numpy(), deps.str.strip().reset_index(drop=True),
+        "department_id", "DEP Name",
+    )
+    resources, procedure_resources = _links(
+        rooms.index.to_numpy(), rooms.str.strip().reset_index(drop=True),
+        "resource_id", "Room Name",
+    )
+
+    return {
+        "procedures": procedures,
+        "departments": departments,
+        "resources": resources,
+        "procedure_departments": procedure_departments,
+        "procedure_resources": procedure_resources,
+    }
+
+
+def normalize_exploded(df):
+    """
+    Build the normalized tables from the OLD exploded parquet
+    (one exam × site × room per row). Used as a fallback until a
+    normalized export has been published.
+    """
+    df = df.reset_index(drop=True)
+    key = ["EAP Name", "Visit Type Name", "Visit Type Length"]
+    procedure_codes = df.groupby(key, sort=False, dropna=False).ngroup().to_numpy()
+    procedures = df[key].drop_duplicates(ignore_index=True)
+    procedures.insert(0, "procedure_id", pd.RangeIndex(len(procedures)).astype("int32"))
+    for col in ["Visit Type Name", "Visit Type Length"]:
+        procedures[col] = procedures[col].astype("category")
+
+    departments, procedure_departments = _links(
+        procedure_codes, df["DEP Name"], "department_id", "DEP Name",
+    )
+    resources, procedure_resources = _links(
+        procedure_codes, df["Room Name"], "resource_id", "Room Name",
+    )
+
+    return {
+        "procedures": procedures,
+        "departments": departments,
+        "resources": resources,
+        "procedure_departments": procedure_departments,
+        "procedure_resources": procedure_resources,
+    }
+
+
+def tables_to_parquet(tables):
+    """Serialize each table to parquet bytes → {name: bytes}."""
+    out = {}
+    for name in TABLE_NAMES:
+        buffer = BytesIO()
+        tables[name].to_parquet(buffer, index=False, compression="zstd")
+        out[name] = buffer.getvalue()
+    return out
+
+
+def tables_from_parquet(blobs):
+    """Inverse of tables_to_parquet: {name: bytes} → {name: DataFrame}."""
+    return {name: pd.read_parquet(BytesIO(blobs[name])) for name in TABLE_NAMES}
+
+
+def build_manifest(blobs):
+    """
+    Describe a set of serialized tables: sha256 + size per table,
+    and an overall version that changes whenever any table does.
+    """
+    tables = {
+        name: {
+            "sha256": hashlib.sha256(blobs[name]).hexdigest(),
+            "bytes": len(blobs[name]),
+        }
+        for name in TABLE_NAMES
+    }
+    version = hashlib.sha256(
+        "".join(tables[name]["sha256"] for name in TABLE_NAMES).encode()
+    ).hexdigest()
+    return {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "tables": tables,
+    }
+
+
+def verify_blobs(blobs, manifest):
+    """True if every table matches the hash recorded in the manifest."""
+    return all(
+        hashlib.sha256(blobs[name]).hexdigest() == manifest["tables"][name]["sha256"]
+        for name in TABLE_NAMES
+    )
+
+
+def write_tables(directory, blobs, manifest):
+    """
+    Save serialized tables + manifest into <directory>.
+
+    Each file is written to a temp name and renamed into place, and
+    the manifest goes LAST, so a crash mid-write never leaves a
+    manifest pointing at tables from a different version.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = [(f"{name}.parquet", blobs[name]) for name in TABLE_NAMES]
+    files.append((MANIFEST_NAME, json.dumps(manifest, indent=2).encode()))
+    for filename, data in files:
+        target = os.path.join(directory, filename)
+        tmp = f"{target}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+
+
+def read_manifest(directory):
+    """Return the manifest stored in <directory>, or None."""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def read_tables(directory):
+    """Read the normalized tables from <directory>/<name>.parquet."""
+    return {
+        name: pd.read_parquet(os.path.join(directory, f"{name}.parquet"))
+        for name in TABLE_NAMES
+    }
@@ -0,0 +1,348 @@
+# -------------------------------------------------------------
+# telemetry.py
+# -------------------------------------------------------------
+# Purpose:
+#   Show where a request's time goes (LLM, fuzzy matching, index
+#   lookups, embedding, vector search...) without a tracing
+#   service: per-request traces of timed stages, aggregated into
+#   Prometheus metrics served by GET /metrics.
+#
+#   - span("stage") times a block, @timed("stage") a function.
+#     Every span feeds the nexus_stage_seconds histogram; during
+#     a request it is also added to that request's trace.
+#   - TelemetryMiddleware opens one trace per HTTP request and
+#     closes it after the last byte is sent (so streamed answers
+#     are timed to the end), then records nexus_request_seconds
+#     per route. The trace follows the request into worker
+#     threads (run_in_threadpool, and concurrency.py's pools copy
+#     the request's context).
+#   - Counters (LLM_CALLS, EMBEDDING_*) are bumped where the
+#     event happens. Values other modules already keep (cache
+#     hits, upstream limiter queues, local vs Gemini parses) are
+#     read at scrape time through register_collector().
+#   - note("...") records a per-request diagnostic (how a question
+#     was parsed, what RAG context was chosen...) on the trace
+#     instead of stdout. Notes go to the "nexus" logger at DEBUG
+#     level and appear with the stage breakdown of slow requests.
+#   - A request slower than SLOW_REQUEST_MS is logged as a warning
+#     with its stage breakdown; set SLOW_REQUEST_LOG to a file path
+#     to also append it there as a JSON line.
+#   - Everything else the backend reports (job and reload
+#     failures, embedding retries, index lifecycle) goes to the
+#     same "nexus" logger; LOG_LEVEL sets its level (main.py).
+# -------------------------------------------------------------
+
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "2000"))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG") or None
+
+log = logging.getLogger("nexus")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans range from microsecond cache hits to 60 s LLM calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ============================================================
+# Metric types
+# ============================================================
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(zip(self.labels, key))} {_number(value)}"
+
+
+class Histogram:
+    """Bucketed observations (seconds) per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values → [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def lines(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            pairs = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_labels(pairs)} {_number(values[-1])}"
+            yield f"{self.name}_count{_labels(pairs)} {cumulative}"
+
+
+class _Collected:
+    """A metric whose samples are read from elsewhere at scrape time."""
+
+    def __init__(self, name, kind, help, read):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self._read = read
+
+    def lines(self):
+        try:
+            samples = self._read()
+        except Exception as e:
+            log.warning("metrics: collector %s failed: %s", self.name, e)
+            return
+        for labels, value in samples:
+            yield f"{self.name}{_labels(sorted(labels.items()))} {_number(value)}"
+
+
+_METRICS = []
+_metrics_lock = threading.Lock()
+
+
+def _register(metric):
+    with _metrics_lock:
+        _METRICS.append(metric)
+    return metric
+
+
+def register_collector(name, kind, help, read):
+    """Expose read() → [(labels dict, value), ...] as a gauge or counter."""
+    return _register(_Collected(name, kind, help, read))
+
+
+def render():
+    """Every metric in Prometheus text exposition format."""
+    with _metrics_lock:
+        metrics = list(_METRICS)
+    out = []
+    for metric in metrics:
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.lines())
+    return "\n".join(out) + "\n"
+
+
+REQUEST_SECONDS = _register(Histogram(
+    "nexus_request_seconds", "HTTP request latency, to the last byte sent",
+    ("method", "route", "status"),
+))
+STAGE_SECONDS = _register(Histogram(
+    "nexus_stage_seconds", "Time spent in each traced stage", ("stage",),
+))
+LLM_CALLS = _register(Counter(
+    "nexus_llm_calls_total", "Gemini requests, by purpose", ("purpose",),
+))
+EMBEDDING_RETRIES = _register(Counter(
+    "nexus_embedding_retries_total", "Embedding requests retried after an error", ("backend",),
+))
+EMBEDDING_FALLBACKS = _register(Counter(
+    "nexus_embedding_fallbacks_total",
+    "Embedding batches that failed and were re-sent one text at a time", ("backend",),
+))
+EMBEDDING_FAILURES = _register(Counter(
+    "nexus_embedding_failures_total", "Texts left without an embedding", ("backend",),
+))
+SLOW_REQUESTS = _register(Counter(
+    "nexus_slow_requests_total", "Requests slower than SLOW_REQUEST_MS", ("route",),
+))
+
+
+# ============================================================
+# Traces and spans
+# ============================================================
+class Trace:
+    """The stages of one request, in the order they started."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+        self.notes = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, start, seconds):
+        with self._lock:
+            self.spans.append((start - self.started, seconds, stage))
+
+    def add_note(self, message):
+        with self._lock:
+            self.notes.append(message)
+
+    def breakdown(self):
+        """[{stage, start_ms, ms, depth}]; depth = how many spans enclose it."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s[0], -s[1]))
+        out, open_ends = [], []
+        for start, seconds, stage in spans:
+            open_ends = [end for end in open_ends if end > start]
+            out.append({
+                "stage": stage,
+                "start_ms": round(start * 1000, 2),
+                "ms": round(seconds * 1000, 2),
+                "depth": len(open_ends),
+            })
+            open_ends.append(start + seconds)
+        return out
+
+
+_trace = contextvars.ContextVar("telemetry_trace", default=None)
+
+
+@contextmanager
+def span(stage):
+    """Time the block as one stage of the current request (if any)."""
+    trace = _trace.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if trace is not None:
+            trace.add(stage, start, seconds)
+
+
+def note(message):
+    """A diagnostic for the current request: debug log + its trace."""
+    log.debug(message)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add_note(message)
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ============================================================
+# Request middleware
+# ============================================================
+_log_lock = threading.Lock()
+
+
+def _report_slow(trace, route, status, seconds):
+    SLOW_REQUESTS.inc(route=route)
+    stages = trace.breakdown()
+    summary = ", ".join(
+        f"{'  ' * s['depth']}{s['stage']} {s['ms']:.0f}ms" for s in stages
+    ) or "no traced stages"
+    notes = "".join(f"\n   · {message}" for message in trace.notes)
+    log.warning(
+        "slow request %s → %s in %.0f ms: %s%s", trace.name, status, seconds * 1000, summary, notes
+    )
+    if not SLOW_REQUEST_LOG:
+        return
+    entry = {
+        "ts": time.time(),
+        "request": trace.name,
+        "route": route,
+        "status": status,
+        "ms": round(seconds * 1000, 2),
+        "stages": stages,
+        "notes": list(trace.notes),
+    }
+    with _log_lock:
+        with open(SLOW_REQUEST_LOG, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+class TelemetryMiddleware:
+    """ASGI middleware: one Trace per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        token = _trace.set(trace)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _trace.reset(token)
+            seconds = time.perf_counter() - trace.started
+            # Route template, not the raw path, to keep label values bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(seconds, method=scope["method"], route=route, status=status)
+            if seconds * 1000 >= SLOW_REQUEST_MS:
+                _report_slow(trace, route, status, seconds)
@@ -4,33 +4,23 @@
 # Purpose:
 #   Manage temporary user updates (e.g., marking an exam as
 #   unavailable at a site) without touching the main dataset.
+#
+#   The updates live in the shared overrides store (see
+#   overrides.py), so every worker sees them.
 # -------------------------------------------------------------
 
-import json
-import pandas as pd
-from src.data_loader import USER_UPDATES
+import time
 
-def disable_exam(exam, site, reason="unspecified"):
-    """Temporarily mark an exam unavailable at a site."""
-    USER_UPDATES["disabled_exams"].append({
-        "exam": exam,
-        "site": site,
-        "reason": reason,
-        "timestamp": pd.Timestamp.now().isoformat()
-    })
-    with open("data/updates.json", "w") as f:   #FIX ME connect Scheduling_Notes/ jsons here
-        json.dump(USER_UPDATES, f, indent=2)
-    print(f"✅ Marked {exam} at {site} as unavailable ({reason}).")
+from src.overrides import get_overrides
+
+def disable_exam(exam, site, reason="unspecified", hours=None):
+    """Temporarily mark an exam unavailable at a site (for `hours`, or until re-enabled)."""
+    expires_at = time.time() + hours * 3600 if hours else None
+    get_overrides().disable(exam, site, reason, expires_at=expires_at)
+    until = f" for {hours}h" if hours else ""
+    print(f"✅ Marked {exam} at {site} as unavailable{until} ({reason}).")
 
 def enable_exam(exam, site):
     """Re-enable a previously disabled exam at a site."""
-    USER_UPDATES["disabled_exams"] = [
-        e for e in USER_UPDATES["disabled_exams"]
-        if not (
-            e["exam"].lower() == exam.lower()
-            and e["site"].lower() == site.lower()
-        )
-    ]
-    with open("data/updates.json", "w") as f:
-        json.dump(USER_UPDATES, f, indent=2)
-    print(f"✅ Re-enabled {exam} at {site}.")
\ No newline at end of file
+    get_overrides().enable(exam, site)
+    print(f"✅ Re-enabled {exam} at {site}.")
@@ -0,0 +1,39 @@
+# -------------------------------------------------------------
+# conftest.py
+# -------------------------------------------------------------
+# Purpose:
+#   Shared fixtures. Tests run offline from the backend folder
+#   (paths like data/mapping.json are relative to it), against
+#   the bundled scheduling parquet and a throwaway overrides DB.
+# -------------------------------------------------------------
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import src.data_loader as data_loader  # noqa: E402
+import src.overrides as overrides  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    """The bundled scheduling data, loaded once per test run."""
+    bundled = data_loader.pd.read_parquet(data_loader.BUNDLED_PARQUET)
+    data_loader.set_dataset(data_loader.normalize_exploded(bundled), "bundled")
+    return data_loader.get_snapshot()
+
+
+@pytest.fixture
+def override_store(tmp_path, monkeypatch):
+    """An empty overrides store, installed behind get_overrides()."""
+    store = overrides.OverridesStore(
+        db_path=str(tmp_path / "overrides.sqlite"),
+        legacy_path=str(tmp_path / "missing.json"),
+    )
+    monkeypatch.setattr(overrides, "_store", store)
+    return store
@@ -0,0 +1,76 @@
+from fastapi.testclient import TestClient
+
+import main
+from src import query_interpreter
+from src.caching import LRUCache
+
+
+class _FailingGenAI:
+    def GenerativeModel(self, name):
+        return self
+
+    def generate_content(self, *args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+
+def test_batch_failure_returns_error_body(dataset, monkeypatch):
+    monkeypatch.setattr(query_interpreter, "_genai", _FailingGenAI())
+    monkeypatch.setattr(query_interpreter.INTENT_CACHE, "get", lambda key: None)
+    client = TestClient(main.app)
+
+    response = client.post(
+        "/agent-chat/batch", json={"questions": ["tell me something odd about xylophones"]}
+    )
+
+    assert response.status_code == 500
+    assert response.json() == {"error": "Error: quota exceeded"}
+
+
+class _BatchGenAI:
+    """Answers a numbered batch prompt; counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def GenerativeModel(self, name):
+        return self
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        reply = (
+            '[{"n": 1, "intent": "locations_for_exam", "exam": "mri brain wo", "site": ""},'
+            ' {"n": 2, "intent": "exams_at_site", "exam": "", "site": "1090 amsterdam ave"}]'
+        )
+        return type("Response", (), {"text": reply})()
+
+
+def test_batch_mixes_local_structured_and_one_gemini_call(dataset, override_store, monkeypatch):
+    genai = _BatchGenAI()
+    monkeypatch.setattr(query_interpreter, "_genai", genai)
+    monkeypatch.setattr(query_interpreter, "INTENT_CACHE", LRUCache(maxsize=16))
+    client = TestClient(main.app)
+    local_question = "How long is a CT HEAD WO IV CONTRAST?"
+
+    answers = client.post("/agent-chat/batch", json={
+        "questions": [local_question, "where do they scan brains w/o contrast",
+                      "what's on offer up at amsterdam ave"],
+        "items": [{"intent": "exam_duration", "exam": "CT HEAD WO IV CONTRAST"}],
+    }).json()["answers"]
+
+    assert genai.calls == 1
+    assert [a["source"] for a in answers] == ["local", "gemini", "gemini", "structured"]
+    assert answers[0]["answer"] == client.post(
+        "/agent-chat", json={"question": local_question}
+    ).json()["answer"]
+    assert answers[3]["result"] == answers[0]["result"]
+    assert answers[1]["matched_exam"] == "MRI BRAIN WO IV CONTRAST"
+    assert answers[1]["result"]
+    assert answers[2]["matched_site"] == "1090 AMST AVE RAD MRI"
+
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setattr(main, "AGENT_BATCH_MAX", 2)
+    response = TestClient(main.app).post(
+        "/agent-chat/batch", json={"questions": ["a", "b", "c"]}
+    )
+    assert response.status_code == 413
@@ -0,0 +1,65 @@
+import pytest
+
+from src import answer_cache, query_handlers
+from src.caching import LRUCache
+
+EXAM = "CT HEAD WO IV CONTRAST"
+SITE = "1176 5TH AVE RAD CT"
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWERS", LRUCache(maxsize=64))
+    monkeypatch.setattr(answer_cache, "RESOLUTIONS", LRUCache(maxsize=64))
+
+
+@pytest.fixture
+def handler_calls(monkeypatch):
+    calls = []
+    handler, uses_exam, uses_site = answer_cache.HANDLERS["exam_at_site"]
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return handler(*args, **kwargs)
+
+    monkeypatch.setitem(answer_cache.HANDLERS, "exam_at_site", (counted, uses_exam, uses_site))
+    return calls
+
+
+@pytest.mark.parametrize("intent, exam, site", [
+    ("exam_at_site", "ct head wo contrast", "1176 fifth ave ct"),
+    ("locations_for_exam", "mri brain wo", None),
+    ("exams_at_site", None, "1090 amsterdam ave"),
+    ("exam_duration", "ct head wo contrast", None),
+    ("rooms_for_exam_at_site", "mra head wo", "1176 5th ave mri"),
+    ("rooms_for_exam", "mra head wo", None),
+])
+def test_lookup_equals_the_uncached_handler(dataset, override_store, caches, intent, exam, site):
+    uncached = {
+        "exam_at_site": lambda: query_handlers.exam_at_site(exam, site),
+        "locations_for_exam": lambda: query_handlers.locations_for_exam(exam),
+        "exams_at_site": lambda: query_handlers.exams_at_site(site),
+        "exam_duration": lambda: query_handlers.exam_duration(exam),
+        "rooms_for_exam_at_site": lambda: query_handlers.rooms_for_exam_at_site(exam, site),
+        "rooms_for_exam": lambda: query_handlers.rooms_for_exam(exam),
+    }[intent]()
+
+    assert answer_cache.lookup(intent, exam=exam, site=site) == uncached
+    assert answer_cache.lookup(intent, exam=exam, site=site) == uncached   # from the cache
+
+
+def test_phrasings_resolving_alike_share_one_lookup(dataset, override_store, caches, handler_calls):
+    for exam in ["ct head wo contrast", "CT HEAD WO IV CONTRAST", "ct head w/o iv contrast"]:
+        assert answer_cache.lookup("exam_at_site", exam=exam, site=SITE) is True
+    assert len(handler_calls) == 1
+
+
+def test_disabling_an_exam_invalidates_cached_answers(dataset, override_store, caches, handler_calls):
+    assert answer_cache.lookup("exam_at_site", exam=EXAM, site=SITE) is True
+
+    override_store.disable(EXAM, SITE, reason="scanner down")
+    assert answer_cache.lookup("exam_at_site", exam=EXAM, site=SITE) is False
+
+    override_store.enable(EXAM, SITE)
+    assert answer_cache.lookup("exam_at_site", exam=EXAM, site=SITE) is True
+    assert len(handler_calls) == 3
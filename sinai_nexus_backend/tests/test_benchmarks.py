@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(*args):
+    # A subprocess: the runner points the app at its own offline
+    # configuration through os.environ at import time.
+    return subprocess.run(
+        [sys.executable, "benchmarks/run_benchmarks.py", "--repeat", "1", "--stages", "match,router", *args],
+        cwd=BACKEND, capture_output=True, text=True, timeout=300,
+    )
+
+
+def test_quick_run_saves_and_flags_a_regression(tmp_path):
+    baseline_path = tmp_path / "before.json"
+    saved = _run("--save", str(baseline_path))
+    assert saved.returncode == 0, saved.stderr
+
+    baseline = json.loads(baseline_path.read_text())
+    stages = baseline["stages"]
+    assert {"match.best_exam_match", "router.answer_scheduling_batch.cold"} <= set(stages)
+    assert set(stages["match.best_exam_match"]) >= {"calls", "p50_ms", "p95_ms", "peak_kib"}
+
+    # Pretend the slowest stage used to be near-instant
+    slowest = max(stages, key=lambda name: stages[name]["p50_ms"])
+    stages[slowest].update(p50_ms=0.001, p95_ms=0.001)
+    baseline_path.write_text(json.dumps(baseline))
+
+    compared = _run("--compare", str(baseline_path), "--threshold", "100")
+    flagged = [line.split()[0] for line in compared.stdout.splitlines() if "REGRESSION" in line]
+    assert compared.returncode == 1
+    assert flagged == [slowest]
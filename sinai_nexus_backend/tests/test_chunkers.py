@@ -0,0 +1,62 @@
+import pytest
+
+from src.chunkers import count_tokens, fixed_chunks, get_chunker, structured_chunks
+
+PAGE_1 = """CONTRAST POLICY
+Patients with an eGFR below 30 must not receive iodinated
+contrast without a nephrology consult.
+Metformin is held for 48 hours after contrast when the eGFR
+is below 45.
+
+Scheduling Notes
+• Book CT with contrast in 30 minute slots.
+• MRI with sedation needs an anesthesia slot."""
+
+PAGE_2 = """Allergy premedication is prednisone 50 mg at 13, 7 and 1 hour
+before the scan, plus diphenhydramine 50 mg one hour before."""
+
+
+def _pages(*texts):
+    return [(text, {"kind": "page", "page": n}) for n, text in enumerate(texts, start=1)]
+
+
+def test_fixed_chunks_equal_slicing_the_joined_text():
+    texts = ["a" * 500, "b" * 700, "c" * 90]
+    joined = "\n".join(texts)
+    expected = [joined[i : i + 600] for i in range(0, len(joined), 520)]
+    assert [c["content"] for c in fixed_chunks((t, {}) for t in texts)] == expected
+
+
+def test_structured_chunks_follow_headings_and_keep_metadata():
+    chunks = list(structured_chunks(_pages(PAGE_1, PAGE_2), max_tokens=60, min_tokens=5))
+
+    policy, notes = chunks[0], chunks[1]
+    assert policy["section"] == "CONTRAST POLICY" and policy["page"] == 1
+    assert policy["content"].startswith("CONTRAST POLICY\nPatients with an eGFR below 30")
+    assert "without a nephrology consult." in policy["content"]   # lines re-joined
+    assert notes["section"] == "Scheduling Notes"
+    assert "• Book CT with contrast in 30 minute slots." in notes["content"].split("\n")
+    assert chunks[-1]["page"] == 2
+    assert chunks[-1]["content"].startswith("Scheduling Notes\nAllergy premedication")
+
+
+def test_structured_chunks_stay_within_budget():
+    long_paragraph = " ".join(f"Sentence number {n} about contrast safety." for n in range(80))
+    chunks = list(structured_chunks([(long_paragraph, {"kind": "text"})], max_tokens=40))
+
+    assert len(chunks) > 1
+    assert all(count_tokens(c["content"]) <= 40 for c in chunks)
+    assert all(c["content"].endswith(".") for c in chunks)   # split at sentence ends
+
+
+def test_tiny_sections_are_merged():
+    blocks = [("Intro", {"kind": "heading"}), ("Short.", {"kind": "text"}),
+              ("Next", {"kind": "heading"}), ("Also short.", {"kind": "text"})]
+    chunks = list(structured_chunks(blocks, max_tokens=100, min_tokens=20))
+    assert [c["content"] for c in chunks] == ["Intro\nShort.\nNext\nAlso short."]
+
+
+def test_unknown_chunker_is_rejected():
+    assert get_chunker("fixed") is fixed_chunks
+    with pytest.raises(RuntimeError, match="Unknown CHUNKER"):
+        get_chunker("sentences")
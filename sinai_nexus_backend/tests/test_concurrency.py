@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.concurrency import UpstreamBusy, UpstreamLimiter, iterate_in_executor
+
+
+def _limiter(**kwargs):
+    options = {"max_concurrency": 1, "queue_timeout": 0.05, "call_timeout": 1}
+    options.update(kwargs)
+    return UpstreamLimiter("test", **options)
+
+
+def test_saturated_upstream_rejects_after_queue_timeout():
+    limiter = _limiter()
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        entered.set()
+        release.wait(2)
+
+    worker = threading.Thread(target=limiter.call, args=(hold,))
+    worker.start()
+    entered.wait(2)
+    try:
+        assert limiter.stats()["in_flight"] == 1
+        with pytest.raises(UpstreamBusy, match="busy"):
+            limiter.call(lambda: None)
+    finally:
+        release.set()
+        worker.join()
+
+    assert limiter.stats() == {"max_concurrency": 1, "in_flight": 0, "waiting": 0, "rejected": 1}
+    assert limiter.call(lambda: "free again") == "free again"
+
+
+def test_async_calls_leave_the_event_loop_free():
+    limiter = _limiter(max_concurrency=2)
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        results = await asyncio.gather(
+            limiter.run(time.sleep, 0.1), limiter.run(lambda: "done")
+        )
+        ticker.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(main())
+    assert results == [None, "done"]
+    assert ticks >= 5
+
+
+def test_slow_async_call_times_out():
+    limiter = _limiter(call_timeout=0.05)
+    with pytest.raises(UpstreamBusy, match="timed out"):
+        asyncio.run(limiter.run(time.sleep, 0.5))
+
+
+def test_stream_yields_items_and_holds_one_slot():
+    limiter = _limiter()
+    seen_in_flight = []
+
+    def produce(n):
+        for i in range(n):
+            seen_in_flight.append(limiter.stats()["in_flight"])
+            yield i
+
+    async def main():
+        return [item async for item in limiter.stream(produce, 3)]
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert seen_in_flight == [1, 1, 1]
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_producer_errors_reach_the_consumer():
+    def produce():
+        yield 1
+        raise ValueError("boom")
+
+    async def main():
+        items = []
+        with pytest.raises(ValueError, match="boom"):
+            async for item in iterate_in_executor(ThreadPoolExecutor(1), produce):
+                items.append(item)
+        return items
+
+    assert asyncio.run(main()) == [1]
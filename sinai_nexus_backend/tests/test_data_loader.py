@@ -0,0 +1,56 @@
+import pandas as pd
+
+from src import data_loader
+from src.schedule_tables import (
+    TABLE_NAMES,
+    build_manifest,
+    normalize_exploded,
+    read_manifest,
+    read_tables,
+    tables_to_parquet,
+    write_tables,
+)
+
+
+def _bundled_tables():
+    return normalize_exploded(pd.read_parquet(data_loader.BUNDLED_PARQUET))
+
+
+def test_cached_version_reads_back_identical_tables(tmp_path, monkeypatch):
+    tables = _bundled_tables()
+    blobs = tables_to_parquet(tables)
+    manifest = build_manifest(blobs)
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+
+    data_loader._save_to_cache(blobs, manifest)
+    loaded, version = data_loader.load_local_tables()
+
+    assert version == manifest["version"]
+    assert read_manifest(tmp_path / version) == manifest
+    for name in TABLE_NAMES:
+        pd.testing.assert_frame_equal(loaded[name], tables[name])
+
+
+def test_unreadable_cache_falls_back_to_bundled(tmp_path, monkeypatch):
+    tables = _bundled_tables()
+    blobs = tables_to_parquet(tables)
+    blobs["procedures"] = b"not parquet"
+    manifest = build_manifest(blobs)
+    write_tables(str(tmp_path / manifest["version"]), blobs, manifest)
+    (tmp_path / "CURRENT").write_text(manifest["version"])
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+
+    loaded, version = data_loader.load_local_tables()
+
+    assert version == "bundled"
+    pd.testing.assert_frame_equal(loaded["departments"], tables["departments"])
+
+
+def test_read_tables_returns_plain_pandas_columns(tmp_path):
+    blobs = tables_to_parquet(_bundled_tables())
+    write_tables(str(tmp_path), blobs, build_manifest(blobs))
+
+    procedures = read_tables(str(tmp_path))["procedures"]
+
+    assert procedures["procedure_id"].dtype == "int32"
+    assert procedures["EAP Name"].dtype == object
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import embeddings
+
+
+class _Fixed:
+    def __init__(self, name, vectors):
+        self.name = name
+        self.vectors = vectors
+
+    def embed(self, texts):
+        return self.vectors[: len(texts)]
+
+
+def _unit(*values):
+    v = np.asarray(values, dtype=np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+def test_parity_passes_for_matching_vectors():
+    vectors = [_unit(1, 0, 0), _unit(0, 1, 0)]
+    worst = embeddings.check_parity(
+        _Fixed("remote", vectors), _Fixed("local", vectors), sample=["a", "b"]
+    )
+    assert worst == pytest.approx(1.0)
+
+
+def test_parity_fails_below_threshold():
+    remote = _Fixed("remote", [_unit(1, 0, 0), _unit(0, 1, 0)])
+    local = _Fixed("local", [_unit(1, 0, 0), _unit(0, 1, 0.5)])   # cosine ≈ 0.89
+    with pytest.raises(RuntimeError, match="for 'b'"):
+        embeddings.check_parity(remote, local, sample=["a", "b"], threshold=0.99)
+
+
+def test_parity_fails_when_a_text_is_not_embedded():
+    remote = _Fixed("remote", [_unit(1, 0, 0)])
+    local = _Fixed("local", [None])
+    with pytest.raises(RuntimeError, match="whole sample"):
+        embeddings.check_parity(remote, local, sample=["a"])
+
+
+def test_model_id_tells_backends_and_onnx_files_apart():
+    ids = {
+        embeddings.embedding_model_id("remote"),
+        embeddings.embedding_model_id("local", "onnx/model.onnx"),
+        embeddings.embedding_model_id("local", "onnx/model_qint8_avx512.onnx"),
+    }
+    assert len(ids) == 3
+
+
+def test_local_backend_matches_hf_api():
+    """Real parity on PARITY_SAMPLE; needs the ONNX model and an HF token."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    model = os.path.join(embeddings.EMBEDDING_MODEL_DIR, embeddings.EMBEDDING_ONNX_FILE)
+    if not os.path.exists(model) or not embeddings.HF_TOKEN:
+        pytest.skip("local ONNX model or HF_TOKEN not available")
+    assert embeddings.check_parity() >= embeddings.PARITY_MIN_COSINE
+
+
+class _FlakyRemote(embeddings.RemoteEmbeddingBackend):
+    """HF API stand-in: fails `failures` times per batch, always fails on "bad"."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def _request(self, batch):
+        self.calls.append(list(batch))
+        if "bad" in batch or self.calls.count(list(batch)) <= self.failures:
+            raise RuntimeError("503")
+        return [[float(len(text))] * embeddings.EMBEDDING_DIM for text in batch]
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBED_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(embeddings, "EMBED_BATCH_SIZE", 2)
+    monkeypatch.setattr(embeddings, "EMBED_MAX_RETRIES", 3)
+
+
+def test_remote_batches_and_retries(fast_retries):
+    backend = _FlakyRemote(failures=2)
+    vectors = backend.embed(["a", "bb", "ccc"])
+
+    assert [v[0] for v in vectors] == [1.0, 2.0, 3.0]
+    assert sorted(map(tuple, backend.calls)) == [("a", "bb")] * 3 + [("ccc",)] * 3
+
+
+def test_remote_isolates_a_bad_text(fast_retries):
+    backend = _FlakyRemote()
+    vectors = backend.embed(["a", "bad", "ccc"])
+
+    assert vectors[0][0] == 1.0 and vectors[2][0] == 3.0
+    assert vectors[1] is None
+    assert ["a"] in backend.calls   # the batch fell back to one text per request
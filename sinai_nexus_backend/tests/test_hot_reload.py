@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import exams_cleanup
+import main
+from src import data_loader, query_handlers
+from src.schedule_tables import build_manifest, tables_to_parquet
+
+NEW_EXPORT = pd.DataFrame({
+    "Procedure Name": ["CT HEAD WO IV CONTRAST"],
+    "Procedure Category": ["CT"],
+    "Visit Type Name": ["CT"],
+    "Visit Type Length": [25],
+    "Department Name": ["NEW SITE RAD CT"],
+    "Resource Name": ["NEW CT 1"],
+})
+
+
+@pytest.fixture
+def reloadable(dataset, override_store, tmp_path, monkeypatch):
+    """The bundled snapshot, restored (with RELOAD_STATUS) after the test."""
+    monkeypatch.setattr(data_loader, "SNAPSHOT", dataset)
+    monkeypatch.setattr(data_loader, "RELOAD_STATUS", {"state": "idle"})
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+    return dataset
+
+
+def _published():
+    blobs = tables_to_parquet(exams_cleanup.clean_export(NEW_EXPORT.copy()))
+    return blobs, build_manifest(blobs)
+
+
+def _finished():
+    deadline = time.time() + 5
+    while time.time() < deadline and data_loader.RELOAD_STATUS["state"] == "running":
+        time.sleep(0.01)
+    return data_loader.RELOAD_STATUS
+
+
+def test_reload_swaps_in_a_new_snapshot(reloadable):
+    old = reloadable
+    assert data_loader.start_reload(_published, "test")
+    status = _finished()
+
+    assert status["state"] == "done" and status["changed"] is True
+    new = data_loader.get_snapshot()
+    assert new is not old and new.version == status["version"] != old.version
+    assert query_handlers.locations_for_exam_resolved(["CT HEAD WO IV CONTRAST"]) == ["NEW SITE RAD CT"]
+    # A request still holding the old snapshot keeps a consistent view
+    assert "NEW SITE RAD CT" not in query_handlers.locations_for_exam_resolved(
+        ["CT HEAD WO IV CONTRAST"], snapshot=old
+    )
+
+    # The same version again is not re-installed
+    assert data_loader.start_reload(_published, "test")
+    assert _finished()["changed"] is False
+    assert data_loader.get_snapshot() is new
+
+
+def test_failed_reload_keeps_the_current_snapshot(reloadable):
+    def broken():
+        raise ValueError("bad export")
+
+    assert data_loader.start_reload(broken, "test")
+    status = _finished()
+
+    assert status["state"] == "failed" and status["error"] == "bad export"
+    assert data_loader.get_snapshot() is reloadable
+
+
+def test_second_reload_is_refused_while_one_runs(reloadable, monkeypatch):
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return None
+
+    monkeypatch.setattr(data_loader, "download_tables", lambda known_version=None: slow())
+    client = TestClient(main.app)
+
+    assert client.post("/dataset/reload").status_code == 202
+    refused = client.post("/dataset/reload")
+    assert refused.status_code == 409
+    assert refused.json()["reload"]["state"] == "running"
+
+    release.set()
+    assert _finished()["changed"] is False
+    assert client.get("/dataset").json()["snapshot"]["version"] == reloadable.version
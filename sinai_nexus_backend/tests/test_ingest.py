@@ -0,0 +1,153 @@
+import asyncio
+import io
+import os
+
+import pytest
+
+from src import ingest
+
+
+class _Store:
+    """Document store stand-in that records every call."""
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+        self.inserts = []
+
+    def rows_for_path(self, path):
+        return [dict(row, id=i) for i, row in self.rows.items() if row["file_path"] == path]
+
+    def insert(self, rows):
+        self.inserts.append(len(rows))
+        for row in rows:
+            self.rows[self.next_id] = row
+            self.next_id += 1
+
+    def delete_ids(self, ids):
+        for i in ids:
+            del self.rows[i]
+
+
+class _Upload:
+    def __init__(self, data, filename):
+        self.file = io.BytesIO(data)
+        self.filename = filename
+
+    async def read(self, size):
+        return self.file.read(size)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """One chunk per page; embeddings fail for pages containing "bad"."""
+    store = _Store()
+    embedded = []
+
+    def embed(texts):
+        embedded.extend(texts)
+        return [None if "bad" in t else [float(len(t))] for t in texts]
+
+    def chunker():
+        return lambda blocks: (
+            {"content": text, "page": meta["page"], "section": None} for text, meta in blocks
+        )
+
+    monkeypatch.setattr(ingest, "get_document_store", lambda: store)
+    monkeypatch.setattr(ingest, "embed_text_list", embed)
+    monkeypatch.setattr(ingest, "get_chunker", chunker)
+    monkeypatch.setattr(ingest, "INGEST_BATCH_SIZE", 2)
+    return store, embedded
+
+
+def _pages(monkeypatch, texts):
+    def iter_text(local_path, filename):
+        for number, text in enumerate(texts, start=1):
+            yield text, {"kind": "page", "page": number}
+    monkeypatch.setattr(ingest, "iter_text", iter_text)
+
+
+def test_batches_land_before_the_document_is_fully_parsed(pipeline, monkeypatch):
+    store, _ = pipeline
+    _pages(monkeypatch, [f"page {n}" for n in range(1, 6)])
+    parsed_at_insert = []
+
+    progress = ingest.ingest_file(
+        "doc.pdf", "doc.pdf", 2, "doc.pdf",
+        on_progress=lambda p: parsed_at_insert.append(p["pages_parsed"]),
+    )
+
+    assert store.inserts == [2, 2, 1]
+    assert parsed_at_insert[0] < 5
+    assert progress["rows_inserted"] == progress["chunks_embedded"] == 5
+    assert sorted(row["content"] for row in store.rows.values()) == [f"page {n}" for n in range(1, 6)]
+
+
+def test_failed_chunks_are_reported_not_stored(pipeline, monkeypatch):
+    store, _ = pipeline
+    _pages(monkeypatch, ["page 1", "bad page", "page 3"])
+
+    progress = ingest.ingest_file("doc.pdf", "doc.pdf", 2, "doc.pdf")
+
+    assert progress["failed_chunk_indexes"] == [1]
+    assert progress["rows_inserted"] == 2
+    assert all("bad" not in row["content"] for row in store.rows.values())
+
+
+def test_json_note_is_one_priority_1_chunk(pipeline, tmp_path):
+    store, _ = pipeline
+    note = tmp_path / "note.json"
+    note.write_text('{"content": "MRI at 1176 5th Ave closed Friday"}')
+
+    progress = ingest.ingest_file(str(note), "note.json", 3, "notes/closure", is_json=True)
+
+    assert progress["priority"] == 1
+    assert [row["priority"] for row in store.rows.values()] == [1]
+
+
+def test_spooled_uploads_are_content_addressed(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(ingest, "SPOOL_BYTES", 4)
+    data = b"the same bytes, uploaded twice"
+
+    first = asyncio.run(ingest.spool_upload(_Upload(data, "Policy.PDF")))
+    second = asyncio.run(ingest.spool_upload(_Upload(data, "copy.pdf")))
+
+    assert first == second
+    assert first[0].endswith(".pdf")
+    assert os.listdir(tmp_path) == [os.path.basename(first[0])]
+    with open(first[0], "rb") as f:
+        assert f.read() == data
+
+
+def test_reupload_embeds_only_changed_chunks(pipeline, monkeypatch):
+    store, embedded = pipeline
+    _pages(monkeypatch, ["page 1", "page 2", "page 3"])
+    ingest.ingest_file("v1.pdf", "doc.pdf", 2, "doc.pdf")
+    kept = {i for i, row in store.rows.items() if row["content"] != "page 2"}
+    embedded.clear()
+
+    _pages(monkeypatch, ["page 1", "page 2, edited", "page 3"])
+    progress = ingest.ingest_file("v2.pdf", "doc.pdf", 2, "doc.pdf")
+
+    assert embedded == ["page 2, edited"]
+    assert (progress["chunks_unchanged"], progress["rows_inserted"], progress["rows_deleted"]) == (2, 1, 1)
+    assert kept <= set(store.rows)
+    assert sorted(row["content"] for row in store.rows.values()) == ["page 1", "page 2, edited", "page 3"]
+
+    embedded.clear()
+    again = ingest.ingest_file("v2.pdf", "doc.pdf", 2, "doc.pdf")   # interrupted run, retried
+    assert embedded == [] and again["rows_inserted"] == 0 and len(store.rows) == 3
+
+
+def test_priority_change_reindexes_every_chunk(pipeline, monkeypatch):
+    store, embedded = pipeline
+    _pages(monkeypatch, ["page 1", "page 2"])
+    ingest.ingest_file("v1.pdf", "doc.pdf", 2, "doc.pdf")
+    embedded.clear()
+
+    progress = ingest.ingest_file("v1.pdf", "doc.pdf", 1, "doc.pdf")
+
+    assert embedded == ["page 1", "page 2"]
+    assert progress["rows_deleted"] == 2
+    assert {row["priority"] for row in store.rows.values()} == {1}
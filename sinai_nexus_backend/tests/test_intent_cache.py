@@ -0,0 +1,68 @@
+import pytest
+
+from src import query_interpreter
+from src.caching import LRUCache
+
+PARSE = {"intent": "locations_for_exam", "exam": "MRI BRAIN", "site": ""}
+
+
+@pytest.fixture
+def intent_cache(monkeypatch):
+    cache = LRUCache(maxsize=16, name="intent-test")
+    monkeypatch.setattr(query_interpreter, "INTENT_CACHE", cache)
+    return cache
+
+
+@pytest.fixture
+def gemini_calls(monkeypatch):
+    calls = []
+
+    def fake(question):
+        calls.append(question)
+        return dict(PARSE) if "brain" in question.lower() else {"intent": None}
+
+    monkeypatch.setattr(query_interpreter, "_interpret_with_gemini", fake)
+    return calls
+
+
+def test_rephrasings_share_one_parse(intent_cache, gemini_calls):
+    first = query_interpreter.interpret_scheduling_query("Where is MRI Brain done?")
+    again = query_interpreter.interpret_scheduling_query("  where is mri   brain done ")
+
+    assert first == again == PARSE
+    assert gemini_calls == ["Where is MRI Brain done?"]
+
+    again["exam"] = "changed by a caller"   # cached parse is copied out
+    assert query_interpreter.interpret_scheduling_query("where is mri brain done")["exam"] == "MRI BRAIN"
+
+
+def test_failed_parse_is_not_cached(intent_cache, gemini_calls):
+    query_interpreter.interpret_scheduling_query("hello?")
+    query_interpreter.interpret_scheduling_query("hello")
+    assert gemini_calls == ["hello?", "hello"]
+
+
+def test_lru_evicts_and_expires(monkeypatch):
+    cache = LRUCache(maxsize=2, ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr("src.caching.time.time", lambda: now[0])
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)   # "b" is the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_persisted_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "intents.sqlite")
+    LRUCache(persist_path=path, name="intents").put("where is mri brain done", PARSE)
+
+    restarted = LRUCache(persist_path=path, name="intents")
+    assert restarted.get("where is mri brain done") == PARSE
+    assert LRUCache(persist_path=path, name="other").get("where is mri brain done") is None
@@ -0,0 +1,146 @@
+import threading
+import time
+
+from src import jobs
+
+
+def test_jobs_for_same_path_run_one_at_a_time(tmp_path, monkeypatch):
+    running, overlaps, lock = set(), [], threading.Lock()
+
+    def fake_ingest(local_path, filename, priority, file_path, is_json=False, on_progress=None):
+        with lock:
+            if file_path in running:
+                overlaps.append(file_path)
+            running.add(file_path)
+        time.sleep(0.05)
+        with lock:
+            running.discard(file_path)
+        return {"failed_chunk_indexes": []}
+
+    monkeypatch.setattr(jobs.ingest, "ingest_file", fake_ingest)
+    queue = jobs.JobQueue(db_path=str(tmp_path / "jobs.sqlite"), workers=4)
+    ids = [
+        queue.enqueue(f"/tmp/upload-{n}", "a.pdf", 2, "docs/a.pdf")[0] for n in range(3)
+    ] + [queue.enqueue("/tmp/upload-b", "b.pdf", 2, "docs/b.pdf")[0]]
+
+    deadline = time.time() + 5
+    while time.time() < deadline and any(queue.get(i)["status"] != "done" for i in ids):
+        time.sleep(0.01)
+
+    assert [queue.get(i)["status"] for i in ids] == ["done"] * 4
+    assert overlaps == []
+    assert queue._path_locks == {}
+
+
+def test_reupload_of_indexed_version_runs_after_pending_upload(tmp_path, monkeypatch):
+    ingested, b_started, release_b = [], threading.Event(), threading.Event()
+
+    def fake_ingest(local_path, filename, priority, file_path, is_json=False, on_progress=None):
+        if local_path == "/tmp/upload-b":
+            b_started.set()
+            release_b.wait(5)
+        ingested.append(local_path)
+        return {"failed_chunk_indexes": []}
+
+    def wait_done(queue, job_id):
+        deadline = time.time() + 5
+        while time.time() < deadline and queue.get(job_id)["status"] not in ("done", "failed"):
+            time.sleep(0.01)
+        return queue.get(job_id)
+
+    monkeypatch.setattr(jobs.ingest, "ingest_file", fake_ingest)
+    queue = jobs.JobQueue(db_path=str(tmp_path / "jobs.sqlite"), workers=2)
+
+    a, _ = queue.enqueue("/tmp/upload-a", "a.pdf", 2, "docs/a.pdf", content_hash="hash-a")
+    assert wait_done(queue, a)["status"] == "done"
+
+    b, _ = queue.enqueue("/tmp/upload-b", "a.pdf", 2, "docs/a.pdf", content_hash="hash-b")
+    assert b_started.wait(5)
+    a_again, status = queue.enqueue("/tmp/upload-a2", "a.pdf", 2, "docs/a.pdf", content_hash="hash-a")
+    assert status == "queued"   # B is running: the re-upload must not be skipped
+
+    release_b.set()
+    assert wait_done(queue, b)["status"] == "done"
+    assert wait_done(queue, a_again)["status"] == "done"
+    assert ingested == ["/tmp/upload-a", "/tmp/upload-b", "/tmp/upload-a2"]
+    assert queue.is_indexed("docs/a.pdf", "hash-a", 2)
+
+
+def test_unchanged_skip_does_not_supersede_older_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        jobs.ingest, "ingest_file",
+        lambda *args, **kwargs: {"failed_chunk_indexes": []},
+    )
+    queue = jobs.JobQueue(db_path=str(tmp_path / "jobs.sqlite"), workers=1)
+    now = time.time()
+    with queue._connect() as conn:
+        for job_id, created, progress in [
+            ("older", now, '{"unchanged": false}'),
+            ("skipped", now + 1, '{"unchanged": true}'),
+        ]:
+            conn.execute(
+                "INSERT INTO ingest_jobs (id, status, local_path, filename, is_json, priority,"
+                " file_path, progress, error, created_at, updated_at, content_hash)"
+                " VALUES (?, ?, '/tmp/x', 'x.pdf', 0, 2, 'docs/x.pdf', ?, NULL, ?, ?, NULL)",
+                (job_id, "queued" if job_id == "older" else "done", progress, created, created),
+            )
+
+    assert queue._newer_done(queue.get("older")) is None
+
+
+def _wait(queue, job_id):
+    deadline = time.time() + 5
+    while time.time() < deadline and queue.get(job_id)["status"] not in ("done", "failed"):
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_progress_is_saved_per_batch_and_failures_recorded(tmp_path, monkeypatch):
+    seen, enqueued = [], threading.Event()
+
+    def fake_ingest(local_path, filename, priority, file_path, is_json=False, on_progress=None):
+        if local_path == "/tmp/broken":
+            raise ValueError("not a PDF")
+        enqueued.wait(5)   # until job_id below is assigned
+        for inserted in (64, 100):
+            on_progress({"rows_inserted": inserted, "failed_chunk_indexes": []})
+            seen.append(queue.get(job_id)["progress"]["rows_inserted"])
+        return {"rows_inserted": 100, "failed_chunk_indexes": []}
+
+    monkeypatch.setattr(jobs.ingest, "ingest_file", fake_ingest)
+    queue = jobs.JobQueue(db_path=str(tmp_path / "jobs.sqlite"), workers=1)
+
+    job_id, status = queue.enqueue("/tmp/upload", "a.pdf", 2, "docs/a.pdf")
+    enqueued.set()
+    assert status == "queued"
+    assert _wait(queue, job_id)["progress"]["rows_inserted"] == 100
+    assert seen == [64, 100]
+
+    broken, _ = queue.enqueue("/tmp/broken", "b.pdf", 2, "docs/b.pdf")
+    job = _wait(queue, broken)
+    assert job["status"] == "failed"
+    assert job["error"] == "not a PDF"
+
+
+def test_jobs_left_running_resume_on_start(tmp_path, monkeypatch):
+    ingested = []
+    monkeypatch.setattr(
+        jobs.ingest, "ingest_file",
+        lambda local_path, *args, **kwargs: ingested.append(local_path) or {"failed_chunk_indexes": []},
+    )
+    db_path = str(tmp_path / "jobs.sqlite")
+    crashed = jobs.JobQueue(db_path=db_path, workers=1)   # never started
+    with crashed._connect() as conn:
+        conn.execute(
+            "INSERT INTO ingest_jobs (id, status, local_path, filename, is_json, priority,"
+            " file_path, progress, error, created_at, updated_at, content_hash)"
+            " VALUES ('left-over', 'running', '/tmp/upload', 'a.pdf', 0, 2, 'docs/a.pdf',"
+            " '{}', NULL, 1, 1, 'hash-a')"
+        )
+
+    restarted = jobs.JobQueue(db_path=db_path, workers=1)
+    restarted.start()
+
+    assert _wait(restarted, "left-over")["status"] == "done"
+    assert ingested == ["/tmp/upload"]
+    assert restarted.is_indexed("docs/a.pdf", "hash-a", 2)
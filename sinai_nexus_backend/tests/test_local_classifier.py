@@ -0,0 +1,30 @@
+import pytest
+
+from src.local_classifier import LOCAL_INTENT_THRESHOLD, classify_locally
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("How long is a CT HEAD WO IV CONTRAST?", "exam_duration"),
+    ("Is CT HEAD WO IV CONTRAST done at 1176 5TH AVE RAD CT?", "exam_at_site"),
+    ("Which rooms perform MRA HEAD WO IV CONTRAST", "rooms_for_exam"),
+    ("What exams are done at 1470 MADISON AVE RAD MRI?", "exams_at_site"),
+])
+def test_exact_names_are_answered_locally(dataset, question, intent):
+    parsed, confidence = classify_locally(question)
+    assert parsed["intent"] == intent
+    assert confidence >= LOCAL_INTENT_THRESHOLD
+
+
+@pytest.mark.parametrize("question", [
+    "How long is ct?",
+    "How long is an ultrasound?",
+    "Where is a scan done?",
+    "Where is mri brain done?",
+    "Where is mammo done?",
+    "What exams are done at madison?",
+    "Does msb do ct head?",
+])
+def test_near_misses_fall_through_to_gemini(dataset, question):
+    parsed, confidence = classify_locally(question)
+    assert parsed is not None   # a template fits...
+    assert confidence < LOCAL_INTENT_THRESHOLD   # ...but the names are too vague
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from rapidfuzz import fuzz, process
+
+from src import data_loader
+from src.fuzzy_matchers import best_exam_match, best_site_match
+from src.match_index import normalize_site_query, normalize_text
+
+EXAM_QUERIES = ["ct head wo contrast", "MRI brain w/o", "us pelvis", "xr chest 2 views", "  "]
+SITE_QUERIES = ["1176 fifth ave mri", "1090 amsterdam ave", "msbi ct", "nowhere at all"]
+
+
+@pytest.fixture(scope="module")
+def exploded():
+    return pd.read_parquet(data_loader.BUNDLED_PARQUET)
+
+
+def _per_query(query, originals, normalize, cutoff):
+    """What the matchers did before the index: rebuild the choices per question."""
+    norm_map = {normalize(o): o for o in originals}
+    matches = process.extract(
+        normalize(query), list(norm_map), scorer=fuzz.token_set_ratio, limit=3
+    )
+    return [norm_map[m] for m, score, _ in matches if score > cutoff]
+
+
+@pytest.mark.parametrize("query", [q for q in EXAM_QUERIES if q.strip()])
+def test_exam_matches_equal_the_per_query_scan(dataset, exploded, query):
+    expected = _per_query(query, exploded["EAP Name"].dropna().unique(), normalize_text, 55)
+    assert best_exam_match(query) == expected
+
+
+@pytest.mark.parametrize("query", SITE_QUERIES)
+def test_site_matches_equal_the_per_query_scan(dataset, exploded, query):
+    expected = _per_query(
+        normalize_site_query(query), exploded["DEP Name"].dropna().unique(), str.lower, 60
+    )
+    assert best_site_match(query) == expected
+
+
+def test_blank_queries_match_nothing(dataset):
+    assert best_exam_match("  ") == []
+    assert best_site_match("") == []
+    assert best_exam_match(None) == []
+
+
+def test_batch_matching_equals_one_at_a_time(dataset):
+    index = dataset.match_index
+    batched = index.match_exams(EXAM_QUERIES)
+    assert batched == [index.match_exams([q])[0] for q in EXAM_QUERIES]
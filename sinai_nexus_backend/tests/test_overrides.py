@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from src import overrides, query_handlers
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Two workers' stores on one database, re-checking it on every read."""
+    monkeypatch.setattr(overrides, "OVERRIDES_CHECK_SECONDS", 0)
+    db_path = str(tmp_path / "overrides.sqlite")
+    missing = str(tmp_path / "missing.json")
+    return (
+        overrides.OverridesStore(db_path=db_path, legacy_path=missing),
+        overrides.OverridesStore(db_path=db_path, legacy_path=missing),
+    )
+
+
+def test_matching_ignores_case_and_spacing(stores):
+    store, _ = stores
+    store.disable("CT HEAD WO IV CONTRAST", "1176 5TH AVE RAD CT", reason="scanner down")
+
+    entry = store.disabled("ct head  wo iv contrast", " 1176 5th ave rad ct")
+    assert entry["reason"] == "scanner down"
+    assert list(store.disabled_sites("CT HEAD WO IV CONTRAST")) == ["1176 5TH AVE RAD CT"]
+    assert list(store.disabled_exams("1176 5TH AVE RAD CT")) == ["CT HEAD WO IV CONTRAST"]
+
+
+def test_changes_reach_other_workers(stores):
+    first, second = stores
+    before = second.version()
+
+    first.disable("MRI BRAIN", "1090 AMST AVE RAD MRI")
+    assert second.disabled("MRI BRAIN", "1090 AMST AVE RAD MRI") is not None
+    assert second.version() != before
+
+    assert first.enable("MRI BRAIN", "1090 AMST AVE RAD MRI") is True
+    assert second.disabled("MRI BRAIN", "1090 AMST AVE RAD MRI") is None
+    assert first.enable("MRI BRAIN", "1090 AMST AVE RAD MRI") is False
+
+
+def test_expired_override_lifts_and_changes_version(stores, monkeypatch):
+    store, _ = stores
+    now = [1_000_000.0]
+    monkeypatch.setattr(overrides.time, "time", lambda: now[0])
+    store.disable("MRI BRAIN", "1090 AMST AVE RAD MRI", expires_at=now[0] + 60)
+    version = store.version()
+
+    now[0] += 61
+    assert store.disabled("MRI BRAIN", "1090 AMST AVE RAD MRI") is None
+    assert store.version() != version
+
+
+def test_legacy_updates_are_imported_once(tmp_path):
+    legacy = tmp_path / "updates.json"
+    legacy.write_text(json.dumps({"disabled_exams": [{
+        "exam": "CT HEAD WO IV CONTRAST", "site": "1176 5TH AVE RAD CT",
+        "reason": "old outage", "timestamp": "2025-01-02T03:04:05",
+    }]}))
+    db_path = str(tmp_path / "overrides.sqlite")
+
+    store = overrides.OverridesStore(db_path=db_path, legacy_path=str(legacy))
+    assert store.disabled("CT HEAD WO IV CONTRAST", "1176 5TH AVE RAD CT")["reason"] == "old outage"
+
+    store.enable("CT HEAD WO IV CONTRAST", "1176 5TH AVE RAD CT")
+    reopened = overrides.OverridesStore(db_path=db_path, legacy_path=str(legacy))
+    assert reopened.list() == []   # not imported a second time
+
+
+def test_handlers_skip_disabled_pairs(dataset, override_store):
+    exam, site = "CT HEAD WO IV CONTRAST", "1176 5TH AVE RAD CT"
+    assert site in query_handlers.locations_for_exam_resolved([exam])
+    assert exam in query_handlers.exams_at_site_resolved([site])
+
+    override_store.disable(exam, site, reason="scanner down")
+
+    assert query_handlers.exam_at_site_resolved([exam], [site]) is False
+    assert site not in query_handlers.locations_for_exam_resolved([exam])
+    assert exam not in query_handlers.exams_at_site_resolved([site])
+    assert query_handlers.rooms_for_exam_at_site_resolved([exam], [site]) == []
+    assert query_handlers.exam_duration_resolved([exam]) is not None   # durations ignore overrides
@@ -0,0 +1,42 @@
+from src import query_handlers
+
+EXAM = "MRA HEAD WO IV CONTRAST"
+
+
+def test_room_department_prefers_longest_prefix():
+    prefix_to_dep = {"RA": "1176 5TH AVE", "RA Morningside": "1090 AMST AVE", "MSB": "MSB"}
+    assert query_handlers._room_department("RA MRI 1", prefix_to_dep) == "1176 5TH AVE"
+    assert query_handlers._room_department("RA MORNINGSIDE MRI 1", prefix_to_dep) == "1090 AMST AVE"
+    assert query_handlers._room_department("MSB CT 1", prefix_to_dep) == "MSB"
+    assert query_handlers._room_department("MSBI CT 1", prefix_to_dep) is None
+
+
+def test_disabled_building_keeps_rooms_of_overlapping_prefix(dataset, override_store):
+    rooms = query_handlers.rooms_for_exam_resolved([EXAM])
+    assert "RA MORNINGSIDE MRI 1" in rooms
+    assert any(room.startswith("RA MRI") for room in rooms)
+
+    override_store.disable(EXAM, "1176 5TH AVE RAD MRI", reason="test")
+    rooms = query_handlers.rooms_for_exam_resolved([EXAM])
+
+    assert "RA MORNINGSIDE MRI 1" in rooms
+    assert not any(room.startswith("RA MRI") for room in rooms)
+
+
+def test_rooms_at_site_excludes_overlapping_prefix(dataset, override_store):
+    rooms = query_handlers.rooms_for_exam_at_site_resolved([EXAM], ["1176 5TH AVE RAD MRI"])
+    assert rooms
+    assert all(room.startswith("RA ") for room in rooms)
+    assert "RA MORNINGSIDE MRI 1" not in rooms
+
+    rooms = query_handlers.rooms_for_exam_at_site_resolved([EXAM], ["1090 AMST AVE RAD MRI"])
+    assert rooms == ["RA MORNINGSIDE MRI 1"]
+
+
+def test_rooms_at_site_for_dataset_site_names(dataset, override_store):
+    everywhere = query_handlers.rooms_for_exam("CT HEAD WO IV CONTRAST")
+    rooms = query_handlers.rooms_for_exam_at_site("CT HEAD WO IV CONTRAST", "1176 5TH AVE RAD CT")
+
+    assert rooms
+    assert set(rooms) <= set(everywhere)
+    assert all(room.startswith("RA ") for room in rooms)
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import main
+from src import rag_cache
+from src.caching import LRUCache
+
+
+class _Policy:
+    def __init__(self):
+        self.searches = 0
+
+    def retrieve(self, store, embedding, query=None):
+        self.searches += 1
+        return [f"context #{self.searches}"]
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    embeds = []
+
+    def embed(texts):
+        embeds.extend(texts)
+        return [[0.1, 0.2, 0.3] for _ in texts]
+
+    policy = _Policy()
+    monkeypatch.setattr(main, "embed_text_list", embed)
+    monkeypatch.setattr(main, "get_document_store", lambda: None)
+    monkeypatch.setattr(main, "POLICY", policy)
+    monkeypatch.setattr(rag_cache, "QUERY_EMBEDDINGS", LRUCache(maxsize=8))
+    monkeypatch.setattr(rag_cache, "RETRIEVALS", LRUCache(maxsize=8))
+    return embeds, policy
+
+
+def _prompt(query):
+    return asyncio.run(main._rag_prompt(query))[1]
+
+
+def test_repeat_question_skips_embedding_and_search(rag):
+    embeds, policy = rag
+
+    first = _prompt("What is the contrast policy?")
+    again = _prompt("what is the contrast policy")
+
+    assert embeds == ["What is the contrast policy?"]
+    assert policy.searches == 1
+    assert "context #1" in first and "context #1" in again
+
+
+def test_corpus_change_drops_retrievals_but_keeps_embeddings(rag):
+    embeds, policy = rag
+
+    _prompt("What is the contrast policy?")
+    rag_cache.bump_corpus_version()   # as /upload and /delete_file do
+    refreshed = _prompt("What is the contrast policy?")
+
+    assert len(embeds) == 1
+    assert policy.searches == 2
+    assert "context #2" in refreshed
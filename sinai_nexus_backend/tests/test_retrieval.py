@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from src import retrieval
+
+DIM = 8
+
+
+def _rows(path, count, start=0):
+    rows = []
+    for n in range(start, start + count):
+        vector = np.zeros(DIM, dtype=np.float32)
+        vector[n % DIM] = 1.0
+        vector[(n + 1) % DIM] = 0.1 * (n // DIM + 1)
+        rows.append({"content": f"{path} chunk {n}", "priority": 2,
+                     "file_path": path, "embedding": vector})
+    return rows
+
+
+def test_reindexing_compacts_dead_rows_and_keeps_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "COMPACT_MIN_DEAD", 4)
+    store = retrieval.LocalVectorStore(str(tmp_path), dim=DIM, compact_ratio=0.25)
+    store.insert(_rows("keep.pdf", 10))
+    kept = {row["id"]: row["content"] for row in store.rows_for_path("keep.pdf")}
+
+    for _ in range(5):   # re-index the same file again and again
+        store.delete_path("changing.pdf")
+        store.insert(_rows("changing.pdf", 10, start=100))
+
+    assert store.size <= 20 + 10   # live rows + at most one batch of tombstones
+    assert {row["id"]: row["content"] for row in store.rows_for_path("keep.pdf")} == kept
+
+    query = _rows("q", 1, start=3)[0]["embedding"]
+    best = store.search(query, k=1)[0]
+    assert best["content"] == "keep.pdf chunk 3"
+    assert best["id"] in kept
+
+    store.close()
+    reopened = retrieval.LocalVectorStore(str(tmp_path), dim=DIM)
+    assert reopened.search(query, k=1)[0]["id"] == best["id"]
+    assert int(reopened.live.sum()) == 20
+    reopened.close()
+
+
+def test_second_process_cannot_open_index(tmp_path):
+    store = retrieval.LocalVectorStore(str(tmp_path), dim=DIM)
+    with pytest.raises(RuntimeError, match="already open"):
+        retrieval.LocalVectorStore(str(tmp_path), dim=DIM)
+    store.close()
+
+
+def test_index_refuses_vectors_from_another_embedding_model(tmp_path):
+    store = retrieval.LocalVectorStore(str(tmp_path), dim=DIM, model_id="model-a")
+    store.insert(_rows("doc.pdf", 3))
+    store.close()
+
+    with pytest.raises(RuntimeError, match="holds vectors from model-a"):
+        retrieval.LocalVectorStore(str(tmp_path), dim=DIM, model_id="model-b")
+
+    # The refused open released the lock; the right model still opens it
+    reopened = retrieval.LocalVectorStore(str(tmp_path), dim=DIM, model_id="model-a")
+    reopened.delete_path("doc.pdf")
+    reopened.close()
+
+    # Once nothing live is left, another model may take the index over
+    retrieval.LocalVectorStore(str(tmp_path), dim=DIM, model_id="model-b").close()
+
+
+def test_priority_filter_and_cosine_distance(tmp_path):
+    store = retrieval.LocalVectorStore(str(tmp_path), dim=DIM)
+    notes = [dict(row, priority=1) for row in _rows("note.json", 2)]
+    store.insert(notes + _rows("doc.pdf", 8))
+
+    query = _rows("q", 1)[0]["embedding"]
+    best = store.search(query, k=1)[0]
+    assert best["distance"] == pytest.approx(0.0, abs=1e-6)
+
+    found = store.search(query, k=5, max_priority=1)
+    assert {row["file_path"] for row in found} == {"note.json"}
+    assert len(found) == 2
+    assert all(row["priority"] >= 2 for row in store.search(query, k=5, min_priority=2))
+    store.close()
+
+
+def test_hnsw_matches_brute_force(tmp_path):
+    pytest.importorskip("hnswlib")
+    rows = _rows("doc.pdf", 40)
+    brute = retrieval.LocalVectorStore(str(tmp_path / "brute"), dim=DIM)
+    hnsw = retrieval.LocalVectorStore(str(tmp_path / "hnsw"), engine="hnsw", dim=DIM)
+    brute.insert(rows)
+    hnsw.insert(rows)
+
+    for query in _rows("q", 5, start=7):
+        expected = [row["content"] for row in brute.search(query["embedding"], k=3)]
+        assert [row["content"] for row in hnsw.search(query["embedding"], k=3)] == expected
+    brute.close()
+    hnsw.close()
@@ -0,0 +1,89 @@
+import json
+import random
+
+from src.retrieval_policy import RetrievalPolicy
+
+
+def _candidates(seed=0, count=20):
+    rng = random.Random(seed)
+    return [
+        {"id": n, "content": f"chunk {n}", "priority": rng.choice([1, 2, 3, 3]),
+         "distance": round(rng.uniform(0.1, 0.9), 3)}
+        for n in range(count)
+    ]
+
+
+def _original(items):
+    """The re-ranking /rag-chat did inline before the policy existed."""
+    scored = sorted(
+        ((row.get("distance", 1.0) * (1.0 + (row.get("priority", 3) - 1) * 0.5), row) for row in items),
+        key=lambda x: x[0],
+    )
+    notes = [row for score, row in scored if row["priority"] == 1][:3]
+    docs = [row for score, row in scored if row["priority"] > 1][:4]
+    return [r["content"] for r in notes] + [r["content"] for r in docs]
+
+
+class _Store:
+    name = "fake"
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.searches = []
+
+    def search(self, embedding, k, min_priority=None, max_priority=None):
+        self.searches.append((k, min_priority, max_priority))
+        rows = [
+            r for r in self.rows
+            if (min_priority is None or r["priority"] >= min_priority)
+            and (max_priority is None or r["priority"] <= max_priority)
+        ]
+        return sorted(rows, key=lambda r: r["distance"])[:k]
+
+
+def test_defaults_reproduce_the_original_ranking():
+    policy = RetrievalPolicy()
+    for seed in range(20):
+        rows = _candidates(seed)
+        assert [r["content"] for r in policy.select(rows)] == _original(rows)
+
+
+def test_targeted_search_fetches_notes_and_docs_separately():
+    store = _Store(_candidates(3, count=40))
+    policy = RetrievalPolicy(targeted_search=True, fetch_factor=2)
+
+    chunks = policy.retrieve(store, [0.0])
+
+    assert store.searches == [(6, 1, 1), (8, 2, None)]
+    assert len(chunks) == 7
+
+
+def test_context_budget_keeps_notes_first():
+    rows = [
+        {"content": "note " + "word " * 10, "priority": 1, "distance": 0.5},
+        {"content": "doc " + "word " * 10, "priority": 2, "distance": 0.1},
+        {"content": "doc " + "word " * 30, "priority": 2, "distance": 0.2},
+    ]
+    chosen = RetrievalPolicy(context_tokens=25).select(rows)
+    assert [r["content"].split()[0] for r in chosen] == ["note", "doc"]
+    assert len(chosen) == 2
+
+
+def test_mmr_skips_near_duplicates():
+    rows = [
+        {"content": "a", "priority": 2, "distance": 0.10, "embedding": [1.0, 0.0]},
+        {"content": "a copy", "priority": 2, "distance": 0.11, "embedding": [1.0, 0.01]},
+        {"content": "b", "priority": 2, "distance": 0.30, "embedding": [0.0, 1.0]},
+    ]
+    assert [r["content"] for r in RetrievalPolicy(docs_quota=2).select(rows)] == ["a", "a copy"]
+    assert [r["content"] for r in RetrievalPolicy(docs_quota=2, mmr_lambda=0.5).select(rows)] == ["a", "b"]
+
+
+def test_decisions_are_logged(tmp_path):
+    log_path = tmp_path / "policy.jsonl"
+    RetrievalPolicy(log_path=str(log_path)).select(_candidates(1), query="contrast?")
+
+    entry = json.loads(log_path.read_text().splitlines()[0])
+    assert entry["query"] == "contrast?"
+    assert len(entry["candidates"]) == 20
+    assert sum(c["chosen_rank"] is not None for c in entry["candidates"]) == 7
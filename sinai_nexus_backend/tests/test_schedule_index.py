@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+from src import data_loader, query_handlers
+
+
+@pytest.fixture(scope="module")
+def exploded():
+    """The old exploded table; blank cells were written out as the string "nan"."""
+    df = pd.read_parquet(data_loader.BUNDLED_PARQUET)
+    return df.replace({"DEP Name": {"nan": None}, "Room Name": {"nan": None}})
+
+
+@pytest.fixture(scope="module")
+def samples(exploded):
+    """Every 25th exam and every 10th site, plus a few multi-name lists."""
+    exams = exploded["EAP Name"].dropna().unique().tolist()[::25]
+    sites = exploded["DEP Name"].dropna().unique().tolist()[::10]
+    return exams, sites
+
+
+def test_exam_at_site_matches_table_scan(dataset, override_store, exploded, samples):
+    exams, sites = samples
+    pairs = set(zip(exploded["EAP Name"], exploded["DEP Name"]))
+    for exam in exams:
+        for site in sites:
+            assert query_handlers.exam_at_site_resolved([exam], [site]) == ((exam, site) in pairs)
+
+
+def test_locations_for_exam_matches_table_scan(dataset, override_store, exploded, samples):
+    by_exam = exploded.groupby("EAP Name", sort=False)
+    for exam in samples[0]:
+        expected = by_exam.get_group(exam)["DEP Name"].dropna().drop_duplicates().tolist()
+        assert query_handlers.locations_for_exam_resolved([exam]) == expected
+
+
+def test_exams_at_site_matches_table_scan(dataset, override_store, exploded, samples):
+    sites = samples[1]
+    for group in [[site] for site in sites] + [sites[:3], sites[3:5]]:
+        expected = exploded[exploded["DEP Name"].isin(group)]["EAP Name"].drop_duplicates().tolist()
+        assert query_handlers.exams_at_site_resolved(group) == expected
+
+
+def test_exam_duration_matches_table_scan(dataset, exploded, samples):
+    exams = samples[0]
+    for group in [[exam] for exam in exams] + [exams[:3]]:
+        durations = (
+            exploded[exploded["EAP Name"].isin(group)]["Visit Type Length"]
+            .dropna().unique().tolist()
+        )
+        expected = ", ".join(str(d) for d in durations) if durations else None
+        assert query_handlers.exam_duration_resolved(group) == expected
+
+
+def test_rooms_for_exam_matches_table_scan(dataset, override_store, exploded, samples):
+    exams = samples[0]
+    for group in [[exam] for exam in exams] + [exams[:3]]:
+        expected = sorted(
+            exploded[exploded["EAP Name"].isin(group)]["Room Name"].dropna().unique()
+        )
+        assert query_handlers.rooms_for_exam_resolved(group) == expected
+
+
+def test_rooms_for_exam_at_site_are_a_subset_of_rooms_for_exam(dataset, override_store, exploded):
+    offered = exploded.drop_duplicates(["EAP Name", "DEP Name"]).head(200)
+    answered = 0
+    for exam, site in zip(offered["EAP Name"], offered["DEP Name"]):
+        rooms = query_handlers.rooms_for_exam_at_site_resolved([exam], [site])
+        assert set(rooms) <= set(query_handlers.rooms_for_exam_resolved([exam]))
+        answered += bool(rooms)
+    assert answered   # real sites resolve to rooms
+
+
+def test_unknown_names_give_empty_answers(dataset, override_store):
+    assert query_handlers.exam_at_site_resolved(["NO SUCH EXAM"], ["NO SUCH SITE"]) is False
+    assert query_handlers.locations_for_exam_resolved(["NO SUCH EXAM"]) == []
+    assert query_handlers.exams_at_site_resolved(["NO SUCH SITE"]) == []
+    assert query_handlers.exam_duration_resolved(["NO SUCH EXAM"]) is None
+    assert query_handlers.rooms_for_exam_resolved(["NO SUCH EXAM"]) == []
+    assert query_handlers.rooms_for_exam_at_site_resolved(["NO SUCH EXAM"], ["NO SUCH SITE"]) == []
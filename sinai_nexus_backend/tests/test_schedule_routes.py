@@ -0,0 +1,54 @@
+import copy
+
+from fastapi.testclient import TestClient
+
+import main
+import routes.schedule as schedule
+import src.data_loader as data_loader
+
+EXAM = "CT HEAD WO IV CONTRAST"
+
+
+class _UnreadSnapshot:
+    """A reloaded snapshot the in-flight request must not read."""
+
+    version = "reloaded"
+
+    def __getattr__(self, name):
+        raise AssertionError(f"request read {name} from the reloaded snapshot")
+
+
+def test_reload_mid_request_keeps_etag_body_and_items_on_one_snapshot(
+    dataset, override_store, monkeypatch
+):
+    client = TestClient(main.app)
+    lookup = schedule._lookup
+
+    async def reload_during_lookup(*args, **kwargs):
+        monkeypatch.setattr(data_loader, "SNAPSHOT", _UnreadSnapshot())
+        return await lookup(*args, **kwargs)
+
+    monkeypatch.setattr(schedule, "_lookup", reload_during_lookup)
+    first = client.get("/schedule/rooms", params={"exam": EXAM})
+    assert first.status_code == 200
+    assert first.json()["dataset_version"] == dataset.version
+    assert first.json()["items"]
+
+    # Once the reload is visible the old ETag no longer matches
+    reloaded = copy.copy(dataset)
+    reloaded.version = "reloaded"
+    monkeypatch.setattr(data_loader, "SNAPSHOT", reloaded)
+    monkeypatch.setattr(schedule, "_lookup", lookup)
+    second = client.get(
+        "/schedule/rooms", params={"exam": EXAM},
+        headers={"If-None-Match": first.headers["ETag"]},
+    )
+    assert second.status_code == 200
+    assert second.json()["dataset_version"] == "reloaded"
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+    third = client.get(
+        "/schedule/rooms", params={"exam": EXAM},
+        headers={"If-None-Match": second.headers["ETag"]},
+    )
+    assert third.status_code == 304
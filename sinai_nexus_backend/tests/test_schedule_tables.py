@@ -0,0 +1,58 @@
+import pandas as pd
+
+import exams_cleanup
+from src.schedule_index import build_schedule_index
+from src.schedule_tables import (
+    build_manifest,
+    tables_from_parquet,
+    tables_to_parquet,
+    verify_blobs,
+)
+
+EXPORT = pd.DataFrame({
+    "Procedure Name": ["CT HEAD WO IV CONTRAST", "MRI BRAIN WO IV CONTRAST"],
+    "Procedure Category": ["CT", "MRI"],
+    "Visit Type Name": ["CT", "MRI"],
+    "Visit Type Length": [20, 45],
+    "Department Name": [
+        "1470 MADISON AVE RAD CT\n1176 5TH AVE RAD CT",
+        "1176 5TH AVE RAD MRI",
+    ],
+    "Resource Name": ["HESS CT ROOM 6\nRA CT ROOM 5\n", "RA MRI 1"],
+})
+
+
+def test_clean_export_keeps_only_listed_pairs():
+    tables = exams_cleanup.clean_export(EXPORT.copy())
+
+    assert tables["departments"]["DEP Name"].tolist() == [
+        "1470 MADISON AVE RAD CT", "1176 5TH AVE RAD CT", "1176 5TH AVE RAD MRI",
+    ]
+    assert tables["resources"]["Room Name"].tolist() == [
+        "HESS CT ROOM 6", "RA CT ROOM 5", "RA MRI 1",   # empty trailing line dropped
+    ]
+    assert tables["procedure_departments"].values.tolist() == [[0, 0], [0, 1], [1, 2]]
+    assert tables["procedure_resources"].values.tolist() == [[0, 0], [0, 1], [1, 2]]
+
+    index = build_schedule_index(tables)
+    assert index.sites_for_exams(["MRI BRAIN WO IV CONTRAST"]) == ["1176 5TH AVE RAD MRI"]
+    assert not index.has_exam_at_site(["MRI BRAIN WO IV CONTRAST"], ["1470 MADISON AVE RAD CT"])
+
+
+def test_manifest_round_trip_and_tamper_check():
+    tables = exams_cleanup.clean_export(EXPORT.copy())
+    blobs = tables_to_parquet(tables)
+    manifest = build_manifest(blobs)
+
+    assert verify_blobs(blobs, manifest)
+    assert build_manifest(blobs)["version"] == manifest["version"]
+    for name, table in tables_from_parquet(blobs).items():
+        # Integer categories come back as plain ints; the values are what matter
+        assert table.columns.tolist() == tables[name].columns.tolist()
+        assert table.astype(object).values.tolist() == tables[name].astype(object).values.tolist()
+
+    tampered = dict(blobs, resources=tables_to_parquet(
+        exams_cleanup.clean_export(EXPORT.iloc[:1].copy())
+    )["resources"])
+    assert not verify_blobs(tampered, manifest)
+    assert build_manifest(tampered)["version"] != manifest["version"]
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+# Run in a fresh interpreter: the rest of the suite has already
+# loaded the dataset and imported half the dependencies
+IMPORT_MAIN = """
+import json, sys
+import main
+from fastapi.testclient import TestClient
+from src import data_loader
+
+heavy = ["pdfplumber", "unstructured.partition.auto", "google.generativeai",
+         "huggingface_hub", "supabase"]
+client = TestClient(main.app)   # no `with`: the warm-up lifespan does not run
+print(json.dumps({
+    "loaded": data_loader.SNAPSHOT is not None,
+    "imported": [m for m in heavy if m in sys.modules],
+    "healthz": client.get("/healthz").json(),
+    "readyz": client.get("/readyz").status_code,
+}))
+"""
+
+
+def test_importing_main_loads_nothing_slow():
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_MAIN],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, "SCHEDULING_REFRESH": "0"},
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result["loaded"] is False
+    assert result["imported"] == []
+    assert result["healthz"] == {"status": "ok", "ready": False, "dataset_version": None}
+    assert result["readyz"] == 503
+
+
+def test_ready_once_dataset_is_loaded(dataset):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    assert client.get("/readyz").json() == {"ready": True, "dataset_version": dataset.version}
+    assert client.get("/healthz").json()["ready"] is True
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from src import query_interpreter
+
+
+def _events(response):
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return [
+        json.loads(line[len("data: "):])
+        for line in response.text.split("\n\n") if line.startswith("data: ")
+    ]
+
+
+@pytest.fixture
+def no_gemini(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError("Gemini must not be called")
+    monkeypatch.setattr(query_interpreter, "_interpret_with_gemini", refuse)
+
+
+@pytest.mark.parametrize("question", [
+    "Which rooms perform MRA HEAD WO IV CONTRAST",
+    "How long is a CT HEAD WO IV CONTRAST?",
+])
+def test_agent_stream_adds_up_to_the_json_answer(dataset, override_store, no_gemini, question):
+    client = TestClient(main.app)
+    answer = client.post("/agent-chat", json={"question": question}).json()["answer"]
+
+    events = _events(client.post("/agent-chat/stream", json={"question": question}))
+
+    assert events[-1] == {"done": True}
+    assert "".join(e["delta"] for e in events[:-1]) == answer
+
+
+def test_rag_stream_forwards_gemini_pieces(monkeypatch):
+    async def prompt(query):
+        return None, f"prompt for {query}"
+
+    monkeypatch.setattr(main, "_rag_prompt", prompt)
+    monkeypatch.setattr(main, "_gemini_text_stream", lambda prompt, timeout: iter(["  ", " Hold", " metformin."]))
+
+    events = _events(TestClient(main.app).post("/rag-chat/stream", data={"query": "contrast?"}))
+
+    assert events == [{"delta": "Hold"}, {"delta": " metformin."}, {"done": True}]
+
+
+def test_rag_stream_reports_errors_then_ends(monkeypatch):
+    async def prompt(query):
+        return None, "prompt"
+
+    def failing(prompt, timeout):
+        yield "Partial"
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(main, "_rag_prompt", prompt)
+    monkeypatch.setattr(main, "_gemini_text_stream", failing)
+
+    events = _events(TestClient(main.app).post("/rag-chat/stream", data={"query": "contrast?"}))
+
+    assert events == [{"delta": "Partial"}, {"delta": "Error: connection reset"}, {"done": True}]
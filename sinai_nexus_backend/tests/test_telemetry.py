@@ -0,0 +1,29 @@
+import logging
+
+from src import telemetry
+
+
+def test_note_goes_to_trace_and_debug_log(caplog, capsys):
+    trace = telemetry.Trace("GET /test")
+    token = telemetry._trace.set(trace)
+    try:
+        with caplog.at_level(logging.DEBUG, logger="nexus"):
+            telemetry.note("local interpretation: {}")
+    finally:
+        telemetry._trace.reset(token)
+
+    assert trace.notes == ["local interpretation: {}"]
+    assert "local interpretation: {}" in caplog.text
+    assert capsys.readouterr().out == ""
+
+
+def test_slow_request_is_logged_not_printed(caplog, capsys):
+    trace = telemetry.Trace("GET /slow")
+    trace.notes.append("answer cache miss")
+
+    with caplog.at_level(logging.WARNING, logger="nexus"):
+        telemetry._report_slow(trace, "/slow", 200, 2.5)
+
+    assert "slow request GET /slow → 200 in 2500 ms" in caplog.text
+    assert "answer cache miss" in caplog.text
+    assert capsys.readouterr().out == ""